@@ -0,0 +1,71 @@
+#! /usr/bin/python3
+##-------------------------------------------------------------------------------\
+#   nanoVNA_python (nvnapython)
+#   './examples/plotting_live_view.py'
+#   Fast live S11 trace + waterfall using the library's blitted LiveView.
+#   Acquisition runs as a stream_scan pipeline; the window redraws at --fps
+#   independently of the sweep rate. Close the window to stop.
+#   Requires the [plotting] extra (numpy + matplotlib):
+#       pip install -e ".[plotting]"
+#       python examples/plotting_live_view.py --start 1e9 --stop 3e9 --points 201
+#
+##-------------------------------------------------------------------------------\
+
+import sys
+import os
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from nvnapython import nanoVNA          # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Blitted live S11 view.")
+    ap.add_argument("--port", default=None, help="serial port. Omit to autoconnect.")
+    ap.add_argument("--start", type=float, default=1e9, help="start Hz")
+    ap.add_argument("--stop", type=float, default=3e9, help="stop Hz")
+    ap.add_argument("--points", type=int, default=201, help="points (<=201 on F V2)")
+    ap.add_argument("--history", type=int, default=200, help="waterfall rows")
+    ap.add_argument("--fps", type=float, default=20, help="max window refresh rate")
+    args = ap.parse_args()
+
+    try:
+        from nvnapython.liveview import LiveView
+        import matplotlib  # noqa: F401
+    except ImportError:
+        print('plotting extra not installed: pip install -e ".[plotting]"')
+        return 1
+
+    nvna = nanoVNA()
+    nvna.set_verbose(True)
+    nvna.set_error_byte_return(True)
+
+    if args.port:
+        connected = nvna.connect(args.port)
+    else:
+        _found, connected = nvna.autoconnect()
+    if not connected:
+        print("ERROR: no NanoVNA connected. Pass --port, free the port, or replug.")
+        return 1
+
+    try:
+        nvna.pause()
+        view = LiveView(history=args.history, fps=args.fps)
+        view.attach()
+        pipe = nvna.stream_scan(int(args.start), int(args.stop), args.points, 2,
+                                stages=[view])
+        view.run(pipe)      # blocks until the window is closed
+        print(f"{view.sweeps_received} sweeps received, {view.frames_drawn} frames drawn")
+    except KeyboardInterrupt:
+        print("\nmeasurement interrupted by user")
+    finally:
+        try:
+            nvna.resume()
+        finally:
+            nvna.disconnect()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
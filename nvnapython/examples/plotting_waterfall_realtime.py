@@ -19,7 +19,6 @@ import time
 import argparse
 import threading
 import queue
-from collections import deque
 from datetime import datetime
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
@@ -69,11 +68,11 @@ class LiveS11Plotter:
         self.pts = pts
         self.max_history = max_history
 
+        # preallocated ring buffer: O(1) insert, and the ordered history is a
+        # view, so redraw cost doesn't grow with max_history
+        from nvnapython.waterfall import WaterfallBuffer
         self.freq_arr = None
-        self.magnitude_history = deque(maxlen=max_history)
-        self.real_history = deque(maxlen=max_history)
-        self.imag_history = deque(maxlen=max_history)
-        self.timestamps = deque(maxlen=max_history)
+        self.magnitude_history = WaterfallBuffer(max_history, pts)
 
         self.data_queue = queue.Queue()
         self.running = False
@@ -94,7 +93,7 @@ class LiveS11Plotter:
                 self.data_queue.put({
                     "freq": freq_arr, "real": real_arr, "imag": imag_arr,
                     "magnitude": mag_arr, "phase": phase_arr,
-                    "timestamp": datetime.now(),
+                    "timestamp": time.time(),
                 })
                 # ~0.15s paces the animation / keeps the UI responsive; tune for
                 # your point count and refresh rate (see module docstring).
@@ -122,16 +121,14 @@ class LiveS11Plotter:
                 data = self.data_queue.get_nowait()
             except queue.Empty:
                 break
-            if self.freq_arr is None:
-                self.freq_arr = data["freq"]
+            self.freq_arr = data["freq"]
             self.current_magnitude = data["magnitude"]
             self.current_phase = data["phase"]
             self.current_real = data["real"]
             self.current_imag = data["imag"]
-            self.magnitude_history.append(data["magnitude"])
-            self.real_history.append(data["real"])
-            self.imag_history.append(data["imag"])
-            self.timestamps.append(data["timestamp"])
+            if len(data["magnitude"]) != self.pts:
+                continue    # truncated scan; keep it out of the history
+            self.magnitude_history.append(data["magnitude"], data["timestamp"])
 
         for ax in axes:
             ax.clear()
@@ -145,19 +142,13 @@ class LiveS11Plotter:
             ax2.set_xlabel("Frequency (GHz)"); ax2.set_ylabel("Phase (deg)")
             ax2.set_title("Live S11 phase"); ax2.grid(True, alpha=0.3)
 
-            if len(self.magnitude_history) > 1:
-                # all history rows share the freq axis length (same pts); guard
-                # against a ragged row from a truncated scan by trimming to min.
-                rows = list(self.magnitude_history)
-                width = min(len(r) for r in rows)
-                if width > 0:
-                    mat = np.array([r[:width] for r in rows])
-                    fa = self.freq_arr[:width]
-                    time_arr = np.arange(mat.shape[0])
-                    fm, tm = np.meshgrid(fa, time_arr)
-                    ax3.pcolormesh(fm / 1e9, tm, mat, shading="nearest", cmap="viridis")
-                    ax3.set_xlabel("Frequency (GHz)"); ax3.set_ylabel("scans ago")
-                    ax3.set_title("S11 magnitude history")
+            if len(self.magnitude_history) > 1 and len(self.freq_arr) == self.pts:
+                # newest row first, straight from the ring (no restacking)
+                mat = self.magnitude_history.view(newest_first=True)
+                ax3.pcolormesh(self.freq_arr / 1e9, np.arange(mat.shape[0]), mat,
+                               shading="nearest", cmap="viridis")
+                ax3.set_xlabel("Frequency (GHz)"); ax3.set_ylabel("scans ago")
+                ax3.set_title("S11 magnitude history")
 
             ax4.scatter(self.current_real, self.current_imag,
                         c=self.freq_arr / 1e9, cmap="plasma", s=10, alpha=0.7)
@@ -165,9 +156,9 @@ class LiveS11Plotter:
             ax4.set_title("S11 complex plane"); ax4.grid(True, alpha=0.3)
             ax4.axis("equal")
 
-        if self.timestamps:
-            fig.suptitle(f"Live S11 - {self.timestamps[-1].strftime('%H:%M:%S')}",
-                         fontsize=14)
+        if len(self.magnitude_history):
+            last = datetime.fromtimestamp(self.magnitude_history.timestamps()[-1])
+            fig.suptitle(f"Live S11 - {last.strftime('%H:%M:%S')}", fontsize=14)
 
 
 def main():
@@ -8,6 +8,9 @@
 #       python examples/robust_acquisition_loop.py
 #       python examples/robust_acquisition_loop.py --iterations 50 --retries 2
 #
+#   For one wide sweep split into many segments, use nanoVNA.wide_scan() instead:
+#   it validates each segment and re-requests only the ones that failed.
+#
 #   pause() once up front, resume() once at the end; clean teardown via finally.
 #   Requires only the library (a tiny stdlib parser, no numpy).
 #
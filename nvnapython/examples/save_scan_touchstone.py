@@ -0,0 +1,71 @@
+#! /usr/bin/python3
+##-------------------------------------------------------------------------------\
+#   nanoVNA_python (nvnapython)
+#   './examples/save_scan_touchstone.py'
+#   Scan and save a Touchstone file for downstream RF tools: .s1p (S11) by
+#   default, or .s2p (S11 + S21; S12/S22 written as 0) with --two-port.
+#   Requires numpy (the [analysis] extra).
+#       python examples/save_scan_touchstone.py
+#       python examples/save_scan_touchstone.py --two-port --out dut.s2p
+#
+##-------------------------------------------------------------------------------\
+
+import sys
+import os
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from nvnapython import nanoVNA          # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Save a NanoVNA scan as Touchstone.")
+    ap.add_argument("--port", default=None, help="serial port. Omit to autoconnect.")
+    ap.add_argument("--start", type=float, default=1e9, help="start Hz")
+    ap.add_argument("--stop", type=float, default=3e9, help="stop Hz")
+    ap.add_argument("--points", type=int, default=201, help="points (<=201 on F V2)")
+    ap.add_argument("--two-port", action="store_true", help="write S11+S21 as .s2p")
+    ap.add_argument("--out", default=None, help="output path (.s1p or .s2p)")
+    args = ap.parse_args()
+
+    try:
+        from nvnapython.touchstone import write_touchstone
+    except ImportError:
+        print('numpy not installed: pip install -e ".[analysis]"')
+        return 1
+
+    out = args.out or ("scan.s2p" if args.two_port else "scan.s1p")
+    outmask = 6 if args.two_port else 2
+
+    nvna = nanoVNA()
+    nvna.set_verbose(True)
+    nvna.set_error_byte_return(True)
+
+    if args.port:
+        connected = nvna.connect(args.port)
+    else:
+        _found, connected = nvna.autoconnect()
+    if not connected:
+        print("ERROR: no NanoVNA connected. Pass --port, free the port, or replug.")
+        return 1
+
+    try:
+        nvna.pause()
+        sweep = nvna.scan_sweep(int(args.start), int(args.stop), args.points, outmask)
+        nvna.resume()
+    finally:
+        nvna.disconnect()
+
+    if sweep is None:
+        print("no usable scan data returned. Check the range and that points "
+              "<= the model max.")
+        return 1
+
+    write_touchstone(out, sweep)
+    print(f"saved {len(sweep)} points to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -37,7 +37,9 @@ class DisplayUIMixin:
 
     def beep_time(self, val):
         # beep on, wait val seconds, beep off.
-        # NOTE: this BLOCKS for val seconds (uses time.sleep).
+        # NOTE: this BLOCKS for val seconds (uses time.sleep). The time the
+        # 'beep on' exchange took counts toward val, so the beep lasts val
+        # seconds rather than val plus a command round trip.
         try:
             seconds = float(val)
         except (TypeError, ValueError):
@@ -45,8 +47,9 @@ class DisplayUIMixin:
             return self.error_byte_return()
 
         import time
+        started = time.time()
         self.beep(val='on')
-        time.sleep(seconds)
+        time.sleep(max(seconds - (time.time() - started), 0.0))
         return self.beep(val='off')
 
     def capture(self, width=None, height=None):
@@ -81,7 +84,11 @@ class DisplayUIMixin:
 
         self.ser.reset_input_buffer()
         self.ser.reset_output_buffer()
+        stats = self._stats
+        requested = time.time()
         self.ser.write(bytes('capture\r\n', 'utf-8'))
+        first_at = last_at = None
+        chunks = 0
 
         # Read the whole response in BULK (echo + image + trailing prompt) the
         # same way the standalone diagnostic that succeeded did -- read all of
@@ -93,8 +100,9 @@ class DisplayUIMixin:
         # the echo length up front (it's "capture\r\n" = 9 bytes, but read it
         # rather than assume), so the target is "first '\r\n' seen, then expected
         # image bytes after it". Bound by a generous absolute timeout only -- a
-        # brief idle mid-stream is normal and must not stop the read.
-        timeout_s = self.serialTimeout * 6
+        # brief idle mid-stream is normal and must not stop the read. Both
+        # limits come from _binary_timeouts (the adaptive budget if enabled).
+        start_timeout_s, timeout_s = self._binary_timeouts(expected)
         buffer = bytearray()
         img_start = None                      # index just after the echo's \r\n
         start = time.time()
@@ -104,6 +112,11 @@ class DisplayUIMixin:
             if waiting:
                 buffer += self.ser.read(waiting)
                 got_started = True
+                if stats is not None:
+                    chunks += 1
+                    last_at = time.time()
+                    if first_at is None:
+                        first_at = last_at
                 if img_start is None:
                     nl = buffer.find(b"\r\n")
                     if nl != -1:
@@ -113,10 +126,10 @@ class DisplayUIMixin:
                     break
             else:
                 elapsed = time.time() - start
-                if not got_started and elapsed > self.serialTimeout:
+                if not got_started and elapsed > start_timeout_s:
                     self.print_message(
                         "WARNING: capture() got no data within " +
-                        str(self.serialTimeout) + "s (device not streaming? "
+                        str(start_timeout_s) + "s (device not streaming? "
                         "power-cycle if it became unresponsive)")
                     break
                 if elapsed > timeout_s:
@@ -125,6 +138,10 @@ class DisplayUIMixin:
                         "s with " + str(len(buffer)) + " raw bytes")
                     break
                 time.sleep(self.serialPollInterval)
+        if self._timeouts is not None:
+            self._timeouts.observe_binary(expected, time.time() - start,
+                                          img_start is not None and
+                                          len(buffer) - img_start >= expected)
 
         # split off the echo; what remains (trimmed to expected) is the image.
         if img_start is None:
@@ -136,6 +153,7 @@ class DisplayUIMixin:
 
         # drain any trailing prompt bytes so the next command isn't fed stale
         # data (otherwise a following capture/command can stall).
+        drain_start = time.time()
         try:
             drain_deadline = time.time() + max(self.serialPollInterval * 10, 0.1)
             while time.time() < drain_deadline:
@@ -148,6 +166,10 @@ class DisplayUIMixin:
                     time.sleep(self.serialPollInterval)
         except Exception:
             pass
+        if stats is not None:
+            self._record_binary_read(stats, "capture", requested, start, first_at, last_at,
+                                     len(buffer), chunks, len(msgbytes) < expected,
+                                     time.time() - drain_start)
 
         if len(msgbytes) < expected:
             self.print_message(
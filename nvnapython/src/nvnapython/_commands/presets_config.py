@@ -36,8 +36,10 @@ class PresetsConfigMixin:
         # NOT send the 'ch>' prompt back for it (confirmed on hardware: 'save 0'
         # returns only its echo, no prompt, even after 30 s). Waiting for the
         # prompt would always hit the serial timeout and could leave the port
-        # blocked, so we send 'save' fire-and-forget: write, settle for the flash
-        # write, drain, and return without awaiting a prompt.
+        # blocked, so we send 'save' fire-and-forget: write, probe until the
+        # console answers again (the flash write is done), drain, and return
+        # without awaiting a prompt. get_last_flash_write_time() has the
+        # measured write time.
         #
         # Because the device does not acknowledge, the return is NOT a reliable
         # success signal. To confirm a save persisted, power-cycle the device and
@@ -0,0 +1,455 @@
+#! /usr/bin/python3
+
+##------------------------------------------------------------------------------------------------\
+#   nanoVNA_python (nvnapython)
+#   'src/nvnapython/_commands/streaming.py'
+#   UNOFFICIAL Python API for the NanoVNA series of vector network analyzers.
+#
+#   Part of the nvnapython package. This module is a mixin for the nanoVNA class in core.py;
+#   it is not intended to be instantiated on its own.
+#
+#   Parsed and pipelined acquisition built on scan(). Unlike the per-command
+#   mixins, these methods return NumPy-backed SweepResult objects (see sweep.py)
+#   rather than raw bytes, so they need numpy installed (the [analysis] extra).
+#   numpy is imported lazily, inside the methods, so the core library keeps
+#   working with pyserial alone.
+#
+#   Author(s): Lauren Linkous
+##--------------------------------------------------------------------------------------------------\
+
+from .._bounds import check_point_count, check_in_set
+from ..constants import SCAN_OUTMASK_VALUES
+
+
+class StreamingMixin:
+    def _check_scan_args(self, caller, start, stop, pts, outmask):
+        # Shared scan() argument validation for the parsed/streamed paths.
+        # Returns True if OK; prints the reason and returns False otherwise.
+        try:
+            if int(start) >= int(stop):
+                self.print_message("ERROR: " + caller + "() requires start frequency "
+                                   "less than stop frequency")
+                return False
+        except (TypeError, ValueError):
+            self.print_message("ERROR: " + caller + "() requires start and stop "
+                               "frequencies as integers")
+            return False
+        ok, msg = check_point_count(pts, self.maxPoints, self.pointEndInclusive)
+        if not ok:
+            self.print_message("ERROR: " + caller + "() " + msg)
+            return False
+        ok, msg = check_in_set(outmask, SCAN_OUTMASK_VALUES, "outmask")
+        if not ok:
+            self.print_message("ERROR: " + caller + "() " + msg)
+            return False
+        return True
+
+    def scan_sweep(self, start, stop, pts, outmask=2):
+        # scan() + parse: run one scan and return a SweepResult (NumPy arrays),
+        # or None if the arguments are invalid or the reply was malformed.
+        # example return: SweepResult(201 pts, s11)
+        if not self._check_scan_args("scan_sweep", start, stop, pts, outmask):
+            return None
+        import time
+        from ..sweep import parse_scan
+        raw = self.scan(start, stop, pts, outmask)
+        parsing = time.time()
+        sweep = parse_scan(raw, start, stop, pts, outmask)
+        if self._stats is not None:
+            self._stats.record_phase("scan", "parse", time.time() - parsing)
+        if sweep is None:
+            self.print_message("WARNING: scan_sweep() reply was empty or malformed")
+        return sweep
+
+    def stream_scan(self, start, stop, pts, outmask=2, count=None, stages=None,
+                    depth=2, avg=None, avg_mode="mean"):
+        # Repeated, double-buffered scan. Returns a ScanPipeline (see
+        # streaming.py) that yields SweepResults while overlapping the device
+        # sweep with host-side parsing and `stages` processing.
+        #   count    - number of scans to issue (None = until close()/break)
+        #   stages   - list of callables applied to each parsed sweep in the
+        #              worker thread; a stage returning None swallows the sweep
+        #   depth    - sweeps buffered between the acquisition and worker threads
+        #   avg      - if set, average every `avg` scans (a SweepAverager runs as
+        #              the first stage); count still counts device scans
+        #   avg_mode - 'mean', 'ema', 'median' or 'sigma' (see averaging.py)
+        #
+        # Pause the device's own sweep first (pause()), as for scan().
+        # Returns an empty iterator if the arguments are invalid.
+        #
+        # usage:
+        #   with nvna.stream_scan(int(1e9), int(2e9), 201, 2, count=100) as stream:
+        #       for sweep in stream:
+        #           print(sweep.timestamp, abs(sweep.s11).min())
+        if not self._check_scan_args("stream_scan", start, stop, pts, outmask):
+            return iter(())
+        if avg is not None and not self._check_avg_args("stream_scan", avg, avg_mode):
+            return iter(())
+        from ..streaming import ScanPipeline
+        stages = list(stages) if stages else []
+        if avg is not None:
+            from ..averaging import SweepAverager
+            stages.insert(0, SweepAverager(avg, mode=avg_mode))
+        self.print_message("starting scan stream")
+        return ScanPipeline(self, start, stop, pts, outmask, count=count,
+                            stages=stages, depth=depth)
+
+    def scan_averaged(self, start, stop, pts, outmask=2, avg=16, mode="mean",
+                      retries=None):
+        # Average `avg` cleanly parsed sweeps from pipelined scans and return
+        # them as one SweepResult (cache["averages"] holds how many sweeps went
+        # in), or None on invalid arguments / if `avg` sweeps didn't parse.
+        # mode: 'mean', 'ema', 'median' or 'sigma' (see averaging.py)
+        # A malformed reply doesn't count towards `avg`: it is replaced by
+        # another scan, up to `retries` extra scans in all (default: avg).
+        if not self._check_scan_args("scan_averaged", start, stop, pts, outmask):
+            return None
+        if not self._check_avg_args("scan_averaged", avg, mode):
+            return None
+        from ..averaging import SweepAverager
+        from ..streaming import ScanPipeline
+        avg = int(avg)
+        budget = avg + (avg if retries is None else max(0, int(retries)))
+        averager = SweepAverager(avg, mode=mode)      # keeps its state across top-ups
+        result, parsed, issued = None, 0, 0
+        while parsed < avg and issued < budget:
+            stream = ScanPipeline(self, start, stop, pts, outmask,
+                                  count=min(avg - parsed, budget - issued),
+                                  stages=[averager])
+            for sweep in stream:
+                result = sweep
+            if stream.issued == 0:
+                break
+            parsed += stream.parsed
+            issued += stream.issued
+        if parsed < avg:
+            self.print_message("WARNING: scan_averaged() got " + str(parsed) + " of " +
+                               str(avg) + " sweeps in " + str(issued) + " scans")
+            return None
+        return result
+
+    def _check_avg_args(self, caller, avg, mode):
+        from ..averaging import AVERAGING_MODES
+        try:
+            if int(avg) < 1:
+                raise ValueError
+        except (TypeError, ValueError):
+            self.print_message("ERROR: " + caller + "() avg must be an integer >= 1")
+            return False
+        ok, msg = check_in_set(mode, AVERAGING_MODES, "avg mode")
+        if not ok:
+            self.print_message("ERROR: " + caller + "() " + msg)
+            return False
+        return True
+
+    def adaptive_scan(self, start, stop, pts=None, outmask=2, param=None,
+                      zoom_pts=None, max_zooms=4, kinds=("null", "peak", "phase"),
+                      prominence_db=3.0, slope_factor=4.0, span_steps=1):
+        # Coarse scan of start..stop, then dense scans around the strongest
+        # features found in it (nulls, peaks, steep phase; see adaptive.py),
+        # all merged into one non-uniform SweepResult. Returns None on invalid
+        # arguments or if the coarse scan fails; a failed zoom scan is skipped.
+        #   pts       - coarse points (default: the model's maxPoints)
+        #   zoom_pts  - points per zoom scan (default: the model's maxPoints)
+        #   param     - 's11' / 's21' to search (default: s11 if in outmask)
+        #   max_zooms - at most this many zoom scans
+        # cache["adaptive"] holds the features, the zoom windows and how many
+        # scans went in.
+        #
+        # usage:
+        #   sweep = nvna.adaptive_scan(int(1e6), int(900e6))
+        #   sweep.freq       # dense around the resonances, coarse elsewhere
+        top = self._top_point_count()
+        pts = top if pts is None else pts
+        zoom_pts = top if zoom_pts is None else zoom_pts
+        if not self._check_scan_args("adaptive_scan", start, stop, pts, outmask):
+            return None
+        ok, msg = check_point_count(zoom_pts, self.maxPoints, self.pointEndInclusive, 2)
+        if not ok:
+            self.print_message("ERROR: adaptive_scan() zoom " + msg)
+            return None
+        if param is None:
+            param = "s11" if int(outmask) & 2 else "s21"
+        bit = {"s11": 2, "s21": 4}.get(str(param).lower())
+        if bit is None or not int(outmask) & bit:
+            self.print_message("ERROR: adaptive_scan() outmask must include the "
+                               "searched parameter (" + str(param) + ")")
+            return None
+
+        from ..adaptive import find_features, zoom_windows
+        from ..sweep import merge_sweeps
+        coarse = self.scan_sweep(start, stop, pts, outmask)
+        if coarse is None:
+            return None
+        features = find_features(coarse.freq, coarse.get(param), kinds,
+                                 prominence_db, slope_factor)
+        windows = zoom_windows(coarse.freq, features, max_zooms, span_steps)
+        sweeps = [coarse]
+        for lo, hi in windows:
+            # the device takes whole Hz; a window narrower than zoom_pts Hz
+            # gets one point per Hz
+            lo, hi = int(lo), int(round(hi))
+            n = min(int(zoom_pts), hi - lo + 1)
+            if n < 2:
+                continue
+            zoom = self.scan_sweep(lo, hi, n, outmask)
+            if zoom is None:
+                self.print_message("WARNING: adaptive_scan() zoom " + str(lo) + "-" +
+                                   str(hi) + " Hz failed; skipped")
+                continue
+            sweeps.append(zoom)
+        merged = merge_sweeps(sweeps)
+        merged.cache["adaptive"] = {"features": features, "windows": windows,
+                                    "scans": len(sweeps)}
+        self.print_message("adaptive scan: " + str(len(sweeps) - 1) + " zoom scans, " +
+                           str(len(merged)) + " points")
+        return merged
+
+    def open_sweep_archive(self, path, start, stop, pts, outmask=2,
+                           dtype="complex64", compress=False, precision=1e-6,
+                           keyframe_interval=64):
+        # Open (or create) an append-only binary sweep archive (see archive.py)
+        # stamped with this device's model preset and serial number. The
+        # returned writer can be passed straight into stream_scan(stages=[...]).
+        # compress=True writes the keyframe + delta format from codec.py
+        # instead (dtype is then unused; values are kept to `precision`).
+        # Asks the device for its SN, so call it before starting a stream.
+        # example return: SweepArchiveWriter or CompressedSweepArchiveWriter
+        serial = self._serial_number()
+        self.print_message("opening sweep archive " + str(path))
+        if compress:
+            from ..codec import CompressedSweepArchiveWriter
+            return CompressedSweepArchiveWriter(
+                path, start, stop, pts, outmask, model=self.deviceModel,
+                serial=serial, precision=precision,
+                keyframe_interval=keyframe_interval)
+        from ..archive import SweepArchiveWriter
+        return SweepArchiveWriter(path, start, stop, pts, outmask,
+                                  model=self.deviceModel, serial=serial,
+                                  dtype=dtype)
+
+    def _serial_number(self):
+        # the device's SN as a str (one 'SN' round trip)
+        return bytes(self.SN()).decode("utf-8", errors="replace").strip()
+
+    def _top_point_count(self):
+        # largest point count one scan accepts on this model
+        return self.maxPoints if self.pointEndInclusive else self.maxPoints - 1
+
+    def sweep_cost_model(self, measure=False):
+        # The scan cost model for the sweep planner (see planner.py): the one
+        # calibrated earlier this session for this device's serial if there
+        # is one, else the constants.MODELS defaults for the selected model.
+        # measure=True runs calibrate_sweep_costs() first if nothing is cached.
+        # example return: SweepCostModel(overhead_s=0.03, ..., defaults)
+        from ..constants import MODELS
+        from ..planner import SweepCostModel, cached_cost_model
+        cost = cached_cost_model(self.deviceModel, self._serial_number())
+        if cost is not None:
+            return cost
+        if measure:
+            cost = self.calibrate_sweep_costs()
+            if cost is not None:
+                return cost
+        return SweepCostModel.from_model(MODELS[self.deviceModel])
+
+    def calibrate_sweep_costs(self, start=None, stop=None, sizes=None, repeats=2):
+        # Time real scans on the connected device at two point counts (default
+        # a quarter of and the full maxPoints) and two outmasks (2 and 7), fit
+        # the planner's cost model to them and cache it for this serial.
+        # Scans whose reply doesn't parse are left out of the timing fit and
+        # set the model's point_error instead. Returns the fitted
+        # SweepCostModel, or None if no scan succeeded.
+        # Pause the device's own sweep first (pause()), as for scan().
+        import time
+        from ..constants import MODELS
+        from ..planner import SweepCostModel, point_error_rate, remember_cost_model
+        from ..sweep import parse_scan
+        start = int(self.minVNADeviceFreq if start is None else start)
+        stop = int(self.maxVNADeviceFreq if stop is None else stop)
+        top = self._top_point_count()
+        sizes = (max(11, top // 4), top) if sizes is None else tuple(sizes)
+        samples = []
+        outcomes = []
+        for pts in sizes:
+            if not self._check_scan_args("calibrate_sweep_costs", start, stop, pts, 7):
+                return None
+            for outmask in (2, 7):
+                for _ in range(int(repeats)):
+                    t0 = time.perf_counter()
+                    raw = self.scan(start, stop, pts, outmask)
+                    ok = parse_scan(raw, start, stop, pts, outmask) is not None
+                    elapsed = time.perf_counter() - t0
+                    outcomes.append((pts, ok))
+                    if ok:
+                        samples.append((pts, outmask, elapsed))
+        if not samples:
+            self.print_message("WARNING: calibrate_sweep_costs() got no clean scans")
+            return None
+        cost = SweepCostModel.fit(samples, SweepCostModel.from_model(MODELS[self.deviceModel]))
+        cost.point_error = point_error_rate(outcomes)
+        remember_cost_model(self.deviceModel, self._serial_number(), cost)
+        self.print_message("sweep cost model: " + repr(cost))
+        return cost
+
+    def plan_wide_scan(self, start, stop, pts=None, resolution_hz=None,
+                       params=("s11",), cost=None):
+        # Plan a segmented sweep for wide_scan(): `pts` points in total (or a
+        # step of at most `resolution_hz`), split into scans of at most this
+        # model's maxPoints (and no fewer than its minPoints) with the
+        # cheapest outmask for `params`. cost
+        # defaults to sweep_cost_model(). Returns a SweepPlan, or None on
+        # invalid arguments.
+        # example return: SweepPlan(2001 pts in 3 x <=667, outmask 2, ~2.10 s)
+        from ..planner import plan_sweep
+        if cost is None:
+            cost = self.sweep_cost_model()
+        try:
+            return plan_sweep(start, stop, pts, resolution_hz, params,
+                              self._top_point_count(), cost, self.minPoints)
+        except (TypeError, ValueError) as err:
+            self.print_message("ERROR: plan_wide_scan() " + str(err))
+            return None
+
+    def wide_scan(self, start, stop, pts=None, resolution_hz=None,
+                  params=("s11",), plan=None, retries=2, backoff_s=0.05,
+                  max_backoff_s=1.0, avg=1, journal=None):
+        # Sweep start..stop at more points than one scan allows: run the
+        # segments of `plan` (default plan_wide_scan(...)) `avg` times each
+        # and merge the per-segment averages into one SweepResult on the
+        # plan's grid.
+        #
+        # Each scan is validated on its own (see planner.check_segment).
+        # After the first pass only the scans that failed are re-requested,
+        # up to `retries` more passes, waiting backoff_s, 2*backoff_s, ...
+        # (capped at max_backoff_s) before each. A segment with no valid scan
+        # at all is filled with NaN. cache["segments"] holds one dict per
+        # segment (start, stop, points, attempts, averages, status -- see
+        # planner.SEGMENT_STATUS); cache["wide_scan"] holds the plan, the
+        # measured wall time and the retried / failed / resumed counts.
+        #
+        # journal - path of a checkpoint file (see journal.py). Every valid
+        #           scan is written to it as soon as it arrives; calling
+        #           wide_scan again with the same sweep, avg and journal on the
+        #           same device (e.g. after a USB drop and reconnect, or from a
+        #           new process) scans only what is missing. Without an
+        #           explicit plan, the segments are taken from the journal, so
+        #           a cost model that differs from the first run's doesn't
+        #           matter.
+        # Returns None on invalid arguments, a journal for another plan or
+        # device, or if every segment failed.
+        #
+        # usage:
+        #   sweep = nvna.wide_scan(int(1e6), int(3e9), resolution_hz=150e3, avg=100,
+        #                          journal="band.nvjr")
+        #   [s for s in sweep.cache["segments"] if s["status"] == "failed"]
+        import time
+        import numpy as np
+        from ..archive import archive_params
+        from ..planner import check_segment, failed_segment
+        from ..sweep import SweepResult, merge_sweeps, sweep_frequencies
+        planned = plan is None
+        if planned:
+            plan = self.plan_wide_scan(start, stop, pts, resolution_hz, params)
+            if plan is None:
+                return None
+        try:
+            avg = int(avg)
+            if avg < 1:
+                raise ValueError
+        except (TypeError, ValueError):
+            self.print_message("ERROR: wide_scan() avg must be an integer >= 1")
+            return None
+        jr = None
+        if journal is not None:
+            from ..journal import SweepJournal, journal_plan
+            try:
+                if planned:
+                    stored_plan = journal_plan(journal, plan.cost)
+                    # resume with the segments the campaign started with
+                    if stored_plan is not None and \
+                            (stored_plan.start, stored_plan.stop, stored_plan.pts,
+                             stored_plan.outmask) == (plan.start, plan.stop, plan.pts,
+                                                      plan.outmask):
+                        plan = stored_plan
+                jr = SweepJournal(journal, plan, avg, self.deviceModel,
+                                  self._serial_number())
+            except ValueError as err:
+                self.print_message("ERROR: wide_scan() " + str(err))
+                return None
+
+        t0 = time.perf_counter()
+        stored = archive_params(plan.outmask)
+        units = {} if jr is None else jr.units()
+        attempts = {}
+        pending = [(seg, rep) for rep in range(avg) for seg in range(len(plan))
+                   if (seg, rep) not in units]
+        try:
+            for attempt in range(int(retries) + 1):
+                if not pending:
+                    break
+                if attempt:
+                    time.sleep(min(backoff_s * 2 ** (attempt - 1), max_backoff_s))
+                    self.print_message("wide_scan() retrying " + str(len(pending)) +
+                                       " scan(s)")
+                failed = []
+                for seg, rep in pending:
+                    seg_start, seg_stop, n = plan.segments[seg]
+                    sweep = self.scan_sweep(seg_start, seg_stop, n, plan.outmask)
+                    attempts[(seg, rep)] = attempts.get((seg, rep), 0) + 1
+                    status = check_segment(sweep, self.maxVNADeviceFreq)
+                    if status in ("malformed", "zero"):
+                        failed.append((seg, rep))
+                        continue
+                    units[(seg, rep)] = (status, sweep.timestamp,
+                                         {p: sweep.get(p) for p in stored})
+                    if jr is not None:
+                        jr.record(seg, rep, sweep, status)
+                pending = failed
+        finally:
+            if jr is not None:
+                jr.close()
+
+        sweeps = []
+        flags = []
+        for seg, (seg_start, seg_stop, n) in enumerate(plan.segments):
+            done = [units[(seg, rep)] for rep in range(avg) if (seg, rep) in units]
+            tries = [attempts.get((seg, rep), 0) for rep in range(avg)]
+            flag = {"start": seg_start, "stop": seg_stop, "points": n,
+                    "attempts": sum(tries), "averages": len(done)}
+            if not done:
+                sweeps.append(failed_segment(seg_start, seg_stop, n, plan.outmask))
+                flag["status"] = "failed"
+                self.print_message("ERROR: wide_scan() segment " + str(seg_start) + "-" +
+                                   str(seg_stop) + " Hz failed after " +
+                                   str(flag["attempts"]) + " attempts")
+            else:
+                data = {p: np.mean([d[2][p] for d in done], axis=0) for p in stored}
+                sweeps.append(SweepResult(sweep_frequencies(seg_start, seg_stop, n),
+                                          s11=data.get("s11"), s21=data.get("s21"),
+                                          start=seg_start, stop=seg_stop, points=n,
+                                          outmask=plan.outmask,
+                                          timestamp=max(d[1] for d in done)))
+                if any(d[0] == "above_ceiling" for d in done):
+                    flag["status"] = "above_ceiling"
+                elif max(tries) > 1:
+                    flag["status"] = "retried"
+                else:
+                    flag["status"] = "ok"
+            flags.append(flag)
+        n_failed = sum(f["status"] == "failed" for f in flags)
+        if n_failed == len(plan):
+            return None
+        merged = merge_sweeps(sweeps)
+        merged.cache["segments"] = flags
+        merged.cache["wide_scan"] = {
+            "plan": plan,
+            "averages": avg,
+            "elapsed_s": time.perf_counter() - t0,
+            "scans": sum(attempts.values()),
+            "resumed": 0 if jr is None else jr.resumed,
+            "retried": sum(f["status"] == "retried" for f in flags),
+            "failed": n_failed,
+        }
+        self.print_message("wide scan: " + repr(plan))
+        return merged
@@ -0,0 +1,121 @@
+#! /usr/bin/python3
+
+##------------------------------------------------------------------------------------------------\
+#   nanoVNA_python (nvnapython)
+#   'src/nvnapython/adaptive.py'
+#
+#   Planning for adaptive (coarse-then-zoom) sweeps.
+#
+#   A uniform sweep wide enough to see a whole band is far too coarse to
+#   resolve a narrow resonance, and one dense enough to resolve it spends
+#   nearly all its points on featureless spectrum. The adaptive scan
+#   (nanoVNA.adaptive_scan) instead does one coarse sweep, looks for features
+#   in it, and re-sweeps only small windows around them at full point count.
+#
+#   This module is the host-side half of that, vectorized over the coarse
+#   sweep:
+#
+#       find_features  nulls and peaks of |S| (dB) that stand out from the
+#                      sweep's median level by `prominence_db`, and points
+#                      where the phase turns unusually fast (|group delay|
+#                      above `slope_factor` x its median)
+#       zoom_windows   the frequency windows to re-sweep around the strongest
+#                      features, overlapping windows merged
+#
+#   The sweeps are combined with sweep.merge_sweeps into one non-uniform
+#   SweepResult.
+#
+#   Author(s): Lauren Linkous
+##--------------------------------------------------------------------------------------------------\
+
+import numpy as np
+
+from .metrics import compute_metrics
+
+
+FEATURE_KINDS = ("null", "peak", "phase")
+
+
+def _local_extrema(values, kind):
+    # interior indices that are local minima ('min') or maxima ('max');
+    # a flat run is reported once, at its first sample
+    a, b, c = values[:-2], values[1:-1], values[2:]
+    if kind == "min":
+        hit = (b < a) & (b <= c)
+    else:
+        hit = (b > a) & (b >= c)
+    return np.nonzero(hit)[0] + 1
+
+
+def find_features(freq, data, kinds=FEATURE_KINDS, prominence_db=3.0,
+                  slope_factor=4.0):
+    """
+    Features of one complex sweep `data` on `freq` worth zooming into.
+
+    kinds         : any of 'null', 'peak', 'phase'
+    prominence_db : how far a null (peak) must lie below (above) the
+                    sweep's median |S| in dB
+    slope_factor  : how many times the median |group delay| a phase slope
+                    must reach
+
+    Returns a list of dicts {kind, index, freq, score}, strongest first.
+    score is the feature's strength in units of its threshold (>= 1), so the
+    different kinds rank against each other.
+    """
+    for kind in kinds:
+        if kind not in FEATURE_KINDS:
+            raise ValueError("unknown feature kind '" + str(kind) + "'; choose from " +
+                             ", ".join(FEATURE_KINDS))
+    freq = np.asarray(freq, dtype=np.float64)
+    data = np.asarray(data)
+    if len(freq) < 3:
+        return []
+    m = compute_metrics(freq, data, ("db", "group_delay"))
+    db = m["db"]
+    found = []
+
+    level = np.nanmedian(db)
+    if "null" in kinds:
+        idx = _local_extrema(db, "min")
+        depth = level - db[idx]
+        for i, d in zip(idx, depth):
+            if d >= prominence_db:
+                found.append(("null", i, d / prominence_db))
+    if "peak" in kinds:
+        idx = _local_extrema(db, "max")
+        height = db[idx] - level
+        for i, h in zip(idx, height):
+            if h >= prominence_db:
+                found.append(("peak", i, h / prominence_db))
+    if "phase" in kinds:
+        slope = np.abs(m["group_delay"])
+        floor = slope_factor * max(float(np.nanmedian(slope)), np.finfo(float).tiny)
+        idx = _local_extrema(slope, "max")
+        for i in idx[slope[idx] >= floor]:
+            found.append(("phase", i, slope[i] / floor))
+
+    found.sort(key=lambda f: -f[2])
+    return [{"kind": k, "index": int(i), "freq": float(freq[i]), "score": float(s)}
+            for k, i, s in found]
+
+
+def zoom_windows(freq, features, max_zooms=4, span_steps=1):
+    """
+    Frequency windows (f_lo, f_hi) to re-sweep for the `max_zooms` strongest
+    `features` (as returned by find_features). Each window reaches
+    `span_steps` coarse points either side of its feature -- with the default
+    of 1 it is exactly the interval the true extreme must lie in. Overlapping
+    windows are merged; the list is in frequency order.
+    """
+    freq = np.asarray(freq, dtype=np.float64)
+    last = len(freq) - 1
+    k = max(1, int(span_steps))
+    spans = sorted((freq[max(f["index"] - k, 0)], freq[min(f["index"] + k, last)])
+                   for f in features[:max(0, int(max_zooms))])
+    windows = []
+    for lo, hi in spans:
+        if windows and lo <= windows[-1][1]:
+            windows[-1] = (windows[-1][0], max(windows[-1][1], hi))
+        else:
+            windows.append((lo, hi))
+    return [(float(lo), float(hi)) for lo, hi in windows]
@@ -0,0 +1,274 @@
+#! /usr/bin/python3
+
+##------------------------------------------------------------------------------------------------\
+#   nanoVNA_python (nvnapython)
+#   'src/nvnapython/archive.py'
+#
+#   Append-only, memory-mapped binary sweep archive for long campaigns.
+#
+#   FILE LAYOUT (little-endian):
+#       [ fixed header, 128 bytes ]
+#           magic 'NVNASWP1', version, data offset, model, serial number,
+#           start/stop Hz, points, outmask, sample dtype, record size
+#       [ frequency table: float64 x points ]
+#       [ padding to a 64-byte boundary ]
+#       [ record 0 ][ record 1 ] ... [ record N-1 ]
+#
+#   Every record is the same size:
+#       timestamp float64, then one complex array per S-parameter in the
+#       outmask (s11 first, then s21), complex64 or complex128 x points.
+#
+#   Because records are fixed-size, sweep N lives at a computable offset: the
+#   reader maps the record region as a NumPy structured array and indexing is
+#   O(1) with no parsing at all. The record count is derived from the FILE
+#   SIZE, rounded down to whole records, so a reader can map the file while a
+#   writer is still appending -- a half-written trailing record is simply not
+#   counted until it is complete. Call refresh() on the reader to pick up
+#   records appended since it was opened.
+#
+#   Author(s): Lauren Linkous
+##--------------------------------------------------------------------------------------------------\
+
+import os
+import struct
+import time
+
+import numpy as np
+
+from .sweep import SweepResult, sweep_frequencies, OUTMASK_S11, OUTMASK_S21
+
+
+ARCHIVE_MAGIC = b"NVNASWP1"
+ARCHIVE_VERSION = 1
+
+# magic, version, flags, data_offset, model, serial, start, stop, points,
+# outmask, dtype code, param count, record size
+_HEADER = struct.Struct("<8sHHI32s32sddIIBBxxI")
+_HEADER_SIZE = 128
+_DATA_ALIGN = 64
+
+_DTYPE_CODES = {"complex64": 0, "complex128": 1}
+_DTYPE_NAMES = {v: k for k, v in _DTYPE_CODES.items()}
+
+
+def archive_params(outmask):
+    # the S-parameters stored per record for an outmask, in record order
+    params = []
+    if int(outmask) & OUTMASK_S11:
+        params.append("s11")
+    if int(outmask) & OUTMASK_S21:
+        params.append("s21")
+    return tuple(params)
+
+
+def record_dtype(points, outmask, dtype="complex64"):
+    # NumPy structured dtype of one archive record
+    sample = np.dtype(dtype).newbyteorder("<")
+    fields = [("timestamp", "<f8")]
+    fields += [(p, sample, (int(points),)) for p in archive_params(outmask)]
+    return np.dtype(fields)
+
+
+class _ArchiveHeader:
+    # Parsed / to-be-written archive header. Internal to this module.
+
+    def __init__(self, model, serial, start, stop, points, outmask, dtype,
+                 freq=None):
+        if dtype not in _DTYPE_CODES:
+            raise ValueError("dtype must be one of " + ", ".join(_DTYPE_CODES))
+        if not archive_params(outmask):
+            raise ValueError("outmask must include S11 (2) and/or S21 (4) data")
+        self.model = str(model or "")
+        self.serial = str(serial or "")
+        self.start = float(start)
+        self.stop = float(stop)
+        self.points = int(points)
+        self.outmask = int(outmask)
+        self.dtype = dtype
+        self.params = archive_params(outmask)
+        self.freq = (sweep_frequencies(start, stop, points) if freq is None
+                     else np.asarray(freq, dtype="<f8"))
+        self.record_dtype = record_dtype(self.points, self.outmask, dtype)
+        self.record_size = self.record_dtype.itemsize
+        table_end = _HEADER_SIZE + 8 * self.points
+        self.data_offset = -(-table_end // _DATA_ALIGN) * _DATA_ALIGN
+
+    def pack(self):
+        fixed = _HEADER.pack(
+            ARCHIVE_MAGIC, ARCHIVE_VERSION, 0, self.data_offset,
+            self.model.encode("utf-8")[:32], self.serial.encode("utf-8")[:32],
+            self.start, self.stop, self.points, self.outmask,
+            _DTYPE_CODES[self.dtype], len(self.params), self.record_size)
+        out = bytearray(self.data_offset)
+        out[:len(fixed)] = fixed
+        out[_HEADER_SIZE:_HEADER_SIZE + 8 * self.points] = self.freq.tobytes()
+        return bytes(out)
+
+    @classmethod
+    def read(cls, fh):
+        raw = fh.read(_HEADER_SIZE)
+        if len(raw) < _HEADER_SIZE or raw[:8] != ARCHIVE_MAGIC:
+            raise ValueError("not an nvnapython sweep archive")
+        (_magic, version, _flags, data_offset, model, serial, start, stop,
+         points, outmask, dtype_code, _nparams, record_size) = \
+            _HEADER.unpack_from(raw)
+        if version != ARCHIVE_VERSION:
+            raise ValueError("unsupported sweep archive version " + str(version))
+        freq = np.frombuffer(fh.read(8 * points), dtype="<f8")
+        header = cls(model.rstrip(b"\0").decode("utf-8"),
+                     serial.rstrip(b"\0").decode("utf-8"), start, stop, points,
+                     outmask, _DTYPE_NAMES[dtype_code], freq=freq)
+        if header.data_offset != data_offset or header.record_size != record_size:
+            raise ValueError("sweep archive header is inconsistent")
+        return header
+
+    def matches(self, other):
+        return (self.points == other.points and self.outmask == other.outmask
+                and self.dtype == other.dtype and self.start == other.start
+                and self.stop == other.stop)
+
+
+class SweepArchiveWriter:
+    """Appends sweeps to an archive file.
+
+    Creates the file (writing the header) if it doesn't exist or is empty;
+    otherwise opens it for append after checking the existing header describes
+    the same sweep plan (raises ValueError if not).
+
+        with SweepArchiveWriter("soak.nvsa", int(1e9), int(2e9), 201, 2,
+                                model="NANOVNA_F_V2", serial=sn) as arc:
+            for sweep in nvna.stream_scan(..., stages=[arc]):
+                ...
+
+    The writer is also a stream stage: calling it appends the sweep and passes
+    it through unchanged.
+    """
+
+    def __init__(self, path, start, stop, points, outmask=2, model="",
+                 serial="", dtype="complex64", freq=None, auto_flush=True):
+        self.path = path
+        self.header = _ArchiveHeader(model, serial, start, stop, points,
+                                     outmask, dtype, freq=freq)
+        self.auto_flush = auto_flush
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as fh:
+                existing = _ArchiveHeader.read(fh)
+            if not existing.matches(self.header):
+                raise ValueError("existing archive " + str(path) +
+                                 " holds a different sweep plan")
+            self.header = existing
+            self._fh = open(path, "r+b")
+            # drop a torn trailing record left by a crash mid-append
+            size = os.path.getsize(path)
+            whole = (size - existing.data_offset) // existing.record_size
+            self._fh.truncate(existing.data_offset + whole * existing.record_size)
+            self._fh.seek(0, os.SEEK_END)
+        else:
+            self._fh = open(path, "wb")
+            self._fh.write(self.header.pack())
+            self._fh.flush()
+        self._record = np.zeros(1, dtype=self.header.record_dtype)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def __call__(self, sweep):
+        self.append(sweep)
+        return sweep
+
+    def __len__(self):
+        return ((self._fh.tell() - self.header.data_offset) //
+                self.header.record_size)
+
+    def append(self, sweep):
+        # append one SweepResult (its timestamp and stored parameters)
+        self.append_arrays(sweep.timestamp,
+                           **{p: sweep.get(p) for p in self.header.params})
+
+    def append_arrays(self, timestamp=None, **arrays):
+        # append one record from raw arrays, e.g. append_arrays(t, s11=arr)
+        rec = self._record
+        rec["timestamp"] = time.time() if timestamp is None else timestamp
+        for p in self.header.params:
+            rec[p] = arrays[p]
+        self._fh.write(rec.tobytes())
+        if self.auto_flush:
+            self._fh.flush()
+
+    def flush(self):
+        self._fh.flush()
+
+    def close(self):
+        if self._fh is not None and not self._fh.closed:
+            self._fh.flush()
+            self._fh.close()
+
+
+class SweepArchive:
+    """Read-only, memory-mapped view of an archive file.
+
+        arc = SweepArchive("soak.nvsa")
+        len(arc)              # whole records on disk right now
+        arc[1234]             # SweepResult whose arrays are views into the map
+        arc.array("s11")      # (sweeps x points) view, no copy
+        arc.timestamps        # (sweeps,) float64 view
+        arc.refresh()         # pick up records a writer appended since
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as fh:
+            self.header = _ArchiveHeader.read(fh)
+        self.model = self.header.model
+        self.serial = self.header.serial
+        self.start = self.header.start
+        self.stop = self.header.stop
+        self.points = self.header.points
+        self.outmask = self.header.outmask
+        self.dtype = self.header.dtype
+        self.params = self.header.params
+        self.freq = self.header.freq
+        self.records = np.zeros(0, dtype=self.header.record_dtype)
+        self.refresh()
+
+    def refresh(self):
+        # Re-map the file if a writer has appended whole records since the
+        # last call. Returns the current record count.
+        size = os.path.getsize(self.path)
+        count = max(0, (size - self.header.data_offset) // self.header.record_size)
+        if count != len(self.records):
+            if count == 0:
+                self.records = np.zeros(0, dtype=self.header.record_dtype)
+            else:
+                self.records = np.memmap(self.path, dtype=self.header.record_dtype,
+                                         mode="r", offset=self.header.data_offset,
+                                         shape=(count,))
+        return count
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, n):
+        rec = self.records[n]
+        return SweepResult(self.freq,
+                           s11=rec["s11"] if "s11" in self.params else None,
+                           s21=rec["s21"] if "s21" in self.params else None,
+                           start=self.start, stop=self.stop, points=self.points,
+                           outmask=self.outmask, timestamp=float(rec["timestamp"]))
+
+    def __iter__(self):
+        for n in range(len(self.records)):
+            yield self[n]
+
+    @property
+    def timestamps(self):
+        return self.records["timestamp"]
+
+    def array(self, param="s11"):
+        # (sweeps x points) view of one stored parameter
+        return self.records[param]
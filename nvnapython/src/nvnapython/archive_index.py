@@ -0,0 +1,199 @@
+#! /usr/bin/python3
+
+##------------------------------------------------------------------------------------------------\
+#   nanoVNA_python (nvnapython)
+#   'src/nvnapython/archive_index.py'
+#
+#   Time and frequency index over one or more sweep archives (archive.py), for
+#   sub-range queries such as "S11 at 1.42-1.44 GHz between 02:00 and 03:00".
+#
+#   HOW IT STAYS FAST:
+#     * Time: archives are appended in acquisition order, so the memory-mapped
+#       timestamp column is (almost always) already sorted. A time window is
+#       then two binary searches straight on the map -- O(log n) page touches,
+#       no scan -- and the result is a contiguous row slice. If the clock ever
+#       stepped backwards the archive is flagged unsorted and a sorted order
+#       array is kept instead (rows then come back as an index array, which
+#       NumPy has to copy when you read through it).
+#     * Frequency: each sweep plan's frequency table is binary-searched once
+#       per (f_lo, f_hi) and the resulting column slice is cached per plan.
+#     * Archives whose time span doesn't overlap the window are skipped using
+#       just their first/last timestamp; their records are never read.
+#
+#   Query results are ArchiveSlice objects whose arrays are VIEWS into the
+#   memory maps (rows x columns), so only the pages you actually read are
+#   loaded from disk.
+#
+#   Author(s): Lauren Linkous
+##--------------------------------------------------------------------------------------------------\
+
+import numpy as np
+
+from .archive import SweepArchive
+
+
+def _to_epoch(t):
+    # accept epoch seconds or a datetime
+    if t is None:
+        return None
+    if hasattr(t, "timestamp"):
+        return float(t.timestamp())
+    return float(t)
+
+
+class ArchiveSlice:
+    """The part of one archive that matched a query.
+
+    Attributes:
+        archive    : the SweepArchive it came from
+        rows       : slice (sorted archive) or index array of matching records
+        cols       : slice of matching frequency points
+        timestamps : (rows,) timestamps
+        freq       : (cols,) frequencies in Hz
+        data       : dict param -> (rows x cols) array
+    """
+
+    def __init__(self, archive, rows, cols, params):
+        self.archive = archive
+        self.rows = rows
+        self.cols = cols
+        records = archive.records[rows]
+        self.timestamps = records["timestamp"]
+        self.freq = archive.freq[cols]
+        self.data = {p: records[p][:, cols] for p in params}
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def get(self, param="s11"):
+        return self.data[param]
+
+
+class _ArchiveEntry:
+    # per-archive index state. Internal to this module.
+
+    def __init__(self, archive):
+        self.archive = archive
+        self.plan = (archive.points, archive.outmask, archive.freq.tobytes())
+        self.checked = 0          # records already checked for ordering
+        self.sorted = True
+        self.order = None         # argsort of timestamps when not sorted
+        self.update()
+
+    def update(self):
+        # Extend the ordering check over records appended since last time.
+        self.archive.refresh()
+        n = len(self.archive)
+        if n > self.checked:
+            ts = self.archive.timestamps
+            lo = max(self.checked - 1, 0)
+            tail = np.asarray(ts[lo:n])
+            if self.sorted and np.any(np.diff(tail) < 0):
+                self.sorted = False
+            if not self.sorted:
+                self.order = np.argsort(np.asarray(ts), kind="stable")
+            self.checked = n
+
+    def time_span(self):
+        n = self.checked
+        if n == 0:
+            return None
+        ts = self.archive.timestamps
+        if self.sorted:
+            return float(ts[0]), float(ts[n - 1])
+        return float(ts[self.order[0]]), float(ts[self.order[-1]])
+
+    def rows(self, t_start, t_stop):
+        n = self.checked
+        if self.sorted:
+            ts = self.archive.timestamps[:n]
+            i0 = 0 if t_start is None else int(np.searchsorted(ts, t_start, "left"))
+            i1 = n if t_stop is None else int(np.searchsorted(ts, t_stop, "right"))
+            return slice(i0, max(i0, i1))
+        ts_sorted = np.asarray(self.archive.timestamps)[self.order]
+        i0 = 0 if t_start is None else int(np.searchsorted(ts_sorted, t_start, "left"))
+        i1 = n if t_stop is None else int(np.searchsorted(ts_sorted, t_stop, "right"))
+        return np.sort(self.order[i0:max(i0, i1)])
+
+
+class ArchiveIndex:
+    """Index over a set of sweep archives.
+
+        idx = ArchiveIndex(["day1.nvsa", "day2.nvsa"])
+        for part in idx.query(t_start, t_stop, 1.42e9, 1.44e9, params=("s11",)):
+            part.timestamps, part.freq, part.get("s11")     # views
+
+    Call refresh() to pick up records appended to the archives since the index
+    was built (only the new tail is examined).
+    """
+
+    def __init__(self, archives=()):
+        self._entries = []
+        self._bin_cache = {}      # plan -> {(f_lo, f_hi): slice}
+        for arc in archives:
+            self.add(arc)
+
+    def add(self, archive):
+        # add an archive (a path or an open SweepArchive) to the index
+        if not isinstance(archive, SweepArchive):
+            archive = SweepArchive(archive)
+        self._entries.append(_ArchiveEntry(archive))
+        return archive
+
+    @property
+    def archives(self):
+        return [e.archive for e in self._entries]
+
+    def refresh(self):
+        for entry in self._entries:
+            entry.update()
+
+    def __len__(self):
+        # total indexed records across all archives
+        return sum(e.checked for e in self._entries)
+
+    def freq_bins(self, archive, f_lo=None, f_hi=None):
+        # Column slice of `archive`'s frequency table covering [f_lo, f_hi],
+        # cached per sweep plan so repeated queries skip the search.
+        entry = self._entry(archive)
+        cache = self._bin_cache.setdefault(entry.plan, {})
+        key = (f_lo, f_hi)
+        if key not in cache:
+            freq = entry.archive.freq
+            j0 = 0 if f_lo is None else int(np.searchsorted(freq, f_lo, "left"))
+            j1 = len(freq) if f_hi is None else int(np.searchsorted(freq, f_hi, "right"))
+            cache[key] = slice(j0, max(j0, j1))
+        return cache[key]
+
+    def query(self, t_start=None, t_stop=None, f_lo=None, f_hi=None,
+              params=None):
+        """
+        Return a list of ArchiveSlice for every archive holding records with
+        t_start <= timestamp <= t_stop, restricted to f_lo <= freq <= f_hi.
+        Any bound may be None (open). Times may be epoch seconds or datetimes.
+        params limits which S-parameters are sliced (default: all stored).
+        """
+        t_start, t_stop = _to_epoch(t_start), _to_epoch(t_stop)
+        out = []
+        for entry in self._entries:
+            span = entry.time_span()
+            if span is None:
+                continue
+            if (t_start is not None and span[1] < t_start) or \
+                    (t_stop is not None and span[0] > t_stop):
+                continue
+            rows = entry.rows(t_start, t_stop)
+            cols = self.freq_bins(entry.archive, f_lo, f_hi)
+            n_rows = (rows.stop - rows.start) if isinstance(rows, slice) else len(rows)
+            if n_rows == 0 or cols.stop == cols.start:
+                continue
+            use = entry.archive.params if params is None else \
+                [p for p in params if p in entry.archive.params]
+            out.append(ArchiveSlice(entry.archive, rows, cols, use))
+        return out
+
+    def _entry(self, archive):
+        for entry in self._entries:
+            if entry.archive is archive:
+                return entry
+        raise ValueError("archive is not part of this index")
@@ -0,0 +1,186 @@
+#! /usr/bin/python3
+
+##------------------------------------------------------------------------------------------------\
+#   nanoVNA_python (nvnapython)
+#   'src/nvnapython/averaging.py'
+#
+#   Vectorized multi-sweep averaging for complex sweep data.
+#
+#   Modes:
+#       "mean"   - block average of N sweeps. Running complex sum, O(points)
+#                  memory; emits one averaged sweep every N inputs.
+#       "ema"    - exponential moving average, alpha = 1/N unless given.
+#                  O(points) memory; emits on every input once primed.
+#       "median" - component-wise complex median (median of real and of imag)
+#                  over a block of N sweeps.
+#       "sigma"  - sigma-clipped mean over a block of N sweeps: points further
+#                  than `sigma` x the robust spread from the block median are
+#                  rejected before averaging (kills single-sweep glitches).
+#
+#   The block modes (median, sigma) need every sample of the block at once, so
+#   they hold one preallocated (N x points) complex array per parameter; it is
+#   allocated on the first sweep and reused for every block after that.
+#
+#   SweepAverager is a ScanPipeline stage (see streaming.py): pass it in
+#   `stages`, or use stream_scan(..., avg=N) / scan_averaged().
+#
+#   Author(s): Lauren Linkous
+##--------------------------------------------------------------------------------------------------\
+
+import numpy as np
+
+from .sweep import SweepResult
+
+
+AVERAGING_MODES = ("mean", "ema", "median", "sigma")
+
+# rms / median ratio of the deviation magnitude |x - center| for complex
+# Gaussian noise (Rayleigh distributed): sqrt(2) / sqrt(2 ln 2)
+_RAYLEIGH_RMS_PER_MEDIAN = 1.2011224087864498
+
+
+def complex_median(block, axis=0):
+    # component-wise median of a complex array along `axis`
+    return (np.median(block.real, axis=axis) +
+            1j * np.median(block.imag, axis=axis))
+
+
+def sigma_clipped_mean(block, sigma=3.0, axis=0):
+    """
+    Mean of a complex block along `axis`, ignoring outliers.
+
+    For each point the block median is taken as the center and the robust
+    spread is estimated from the median deviation magnitude. Samples further
+    than `sigma` x that spread from the center are dropped; if every sample of
+    a point is dropped, the median is returned for that point.
+    """
+    block = np.moveaxis(np.asarray(block), axis, 0)
+    center = complex_median(block, axis=0)
+    dev = np.abs(block - center)
+    spread = np.median(dev, axis=0) * _RAYLEIGH_RMS_PER_MEDIAN
+    keep = dev <= sigma * spread
+    kept = keep.sum(axis=0)
+    total = np.where(keep, block, 0).sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / kept
+    return np.where(kept > 0, mean, center)
+
+
+def average_stack(block, mode="mean", sigma=3.0, alpha=None):
+    """
+    Average a (sweeps x points) complex stack in one call.
+
+    mode is one of AVERAGING_MODES. For "ema" the rows are folded in order
+    with `alpha` (default 1/rows) and the final running value is returned.
+    """
+    block = np.asarray(block)
+    if mode == "mean":
+        return block.mean(axis=0)
+    if mode == "median":
+        return complex_median(block)
+    if mode == "sigma":
+        return sigma_clipped_mean(block, sigma=sigma)
+    if mode == "ema":
+        a = 1.0 / len(block) if alpha is None else float(alpha)
+        acc = block[0].astype(np.complex128, copy=True)
+        for row in block[1:]:
+            acc *= (1.0 - a)
+            acc += a * row
+        return acc
+    raise ValueError("mode must be one of " + ", ".join(AVERAGING_MODES))
+
+
+class SweepAverager:
+    """Accumulates SweepResults and emits averaged ones.
+
+        avg = SweepAverager(16, mode="sigma")
+        for sweep in nvna.stream_scan(..., stages=[avg]):
+            ...      # one averaged sweep per 16 scans
+
+    add(sweep) (also available as avg(sweep)) returns the averaged SweepResult
+    when one is ready, otherwise None. The averaged sweep carries
+    cache["averages"] = number of sweeps folded into it.
+    """
+
+    def __init__(self, n=16, mode="mean", alpha=None, sigma=3.0,
+                 params=("s11", "s21")):
+        if mode not in AVERAGING_MODES:
+            raise ValueError("mode must be one of " + ", ".join(AVERAGING_MODES))
+        self.n = max(1, int(n))
+        self.mode = mode
+        self.alpha = (1.0 / self.n) if alpha is None else float(alpha)
+        self.sigma = float(sigma)
+        self.params = tuple(params)
+        self.reset()
+
+    def reset(self):
+        # drop all accumulated state (next sweep starts a fresh average)
+        self._acc = {}          # param -> running sum / EMA (points,)
+        self._block = {}        # param -> (n, points) block buffer
+        self._count = 0
+        self._points = None
+
+    def __call__(self, sweep):
+        return self.add(sweep)
+
+    def add(self, sweep):
+        active = [p for p in self.params if sweep.get(p) is not None]
+        if self._points != len(sweep) or set(active) != self._active():
+            self._allocate(sweep, active)
+
+        row = self._count % self.n if self.mode in ("median", "sigma") else None
+        for p in active:
+            data = sweep.get(p)
+            if self.mode == "mean":
+                self._acc[p] += data
+            elif self.mode == "ema":
+                if self._count == 0:
+                    self._acc[p][:] = data
+                else:
+                    self._acc[p] *= (1.0 - self.alpha)
+                    self._acc[p] += self.alpha * data
+            else:
+                self._block[p][row] = data
+        self._count += 1
+
+        if self.mode == "ema":
+            return self._emit(sweep, {p: self._acc[p].copy() for p in active},
+                              min(self._count, self.n))
+        if self._count < self.n:
+            return None
+
+        if self.mode == "mean":
+            out = {p: self._acc[p] / self.n for p in active}
+            for p in active:
+                self._acc[p][:] = 0
+        elif self.mode == "median":
+            out = {p: complex_median(self._block[p]) for p in active}
+        else:
+            out = {p: sigma_clipped_mean(self._block[p], self.sigma) for p in active}
+        self._count = 0
+        return self._emit(sweep, out, self.n)
+
+    # ---- internals ----------------------------------------------------------
+
+    def _active(self):
+        return set(self._acc) | set(self._block)
+
+    def _allocate(self, sweep, active):
+        # (Re)build the preallocated buffers for this sweep shape. A change of
+        # point count or requested parameters means a new sweep plan, so any
+        # partial average from the old plan is discarded.
+        self.reset()
+        self._points = len(sweep)
+        for p in active:
+            if self.mode in ("mean", "ema"):
+                self._acc[p] = np.zeros(self._points, dtype=np.complex128)
+            else:
+                self._block[p] = np.empty((self.n, self._points), dtype=np.complex128)
+
+    def _emit(self, sweep, data, count):
+        out = SweepResult(sweep.freq, s11=data.get("s11", sweep.s11),
+                          s21=data.get("s21", sweep.s21), start=sweep.start,
+                          stop=sweep.stop, points=sweep.points,
+                          outmask=sweep.outmask, timestamp=sweep.timestamp)
+        out.cache["averages"] = count
+        return out
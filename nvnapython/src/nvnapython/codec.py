@@ -0,0 +1,400 @@
+#! /usr/bin/python3
+
+##------------------------------------------------------------------------------------------------\
+#   nanoVNA_python (nvnapython)
+#   'src/nvnapython/codec.py'
+#
+#   Compressed storage for streams of repeated sweeps of a stable DUT.
+#
+#   ENCODING: every sample's real and imaginary part is quantized to an integer
+#   number of `precision` steps. The default step, DEVICE_RESOLUTION (1e-6), is
+#   the resolution the firmware prints scan values with ('1.099591 1.187207'),
+#   so raw device sweeps decode to the printed values (to float rounding);
+#   averaged data loses at most precision/2 per component. NaN and infinite
+#   samples have no integer form and are refused with a ValueError -- write
+#   sweeps with failed segments (wide_scan) to the uncompressed archive.
+#
+#       keyframe : the quantized sweep itself
+#       delta    : quantized sweep minus the quantized keyframe it refers to
+#
+#   A keyframe is written every `keyframe_interval` sweeps. Deltas refer to
+#   their keyframe (not to the previous sweep), so ANY sweep decodes from at
+#   most two frames -- random access stays O(1).
+#
+#   Each integer block is zigzag-mapped (small negatives -> small positives),
+#   stored in the narrowest unsigned width that fits, byte-shuffled (all low
+#   bytes, then all high bytes) and zlib-compressed. For a stable DUT the
+#   deltas are a few counts of noise, so most frames shrink to a fraction of a
+#   byte per value against 16 bytes per complex128 sample.
+#
+#   FILES: <path> holds a header (same fields as archive.py plus precision and
+#   keyframe interval) followed by variable-size frames. <path>.idx is a
+#   fixed-record index (offset, reference keyframe, size, flags, timestamp)
+#   that readers memory-map; as with archive.py, only whole index records are
+#   counted, so a reader can follow a live writer.
+#
+#   Author(s): Lauren Linkous
+##--------------------------------------------------------------------------------------------------\
+
+import os
+import struct
+import time
+import zlib
+
+import numpy as np
+
+from .archive import archive_params
+from .sweep import SweepResult, sweep_frequencies
+
+
+DEVICE_RESOLUTION = 1e-6     # scan values are printed with 6 decimals
+
+CODEC_MAGIC = b"NVNASWZ1"
+CODEC_VERSION = 1
+
+# magic, version, flags, data_offset, model, serial, start, stop, points,
+# outmask, precision, keyframe interval
+_HEADER = struct.Struct("<8sHHI32s32sddIIdI")
+_HEADER_SIZE = 128
+_DATA_ALIGN = 64
+
+INDEX_DTYPE = np.dtype([("offset", "<u8"), ("ref", "<u8"), ("size", "<u4"),
+                        ("flags", "<u4"), ("timestamp", "<f8")])
+FLAG_KEYFRAME = 1
+
+_BLOCK_HEAD = struct.Struct("<BI")      # integer width, compressed length
+
+
+# ---- integer block packing ------------------------------------------------------
+
+def _zigzag(v):
+    v = v.astype(np.int64, copy=False)
+    return ((v << 1) ^ (v >> 63)).view(np.uint64)
+
+
+def _unzigzag(u):
+    u = u.astype(np.uint64, copy=False)
+    return ((u >> np.uint64(1)).view(np.int64)) ^ (-(u & np.uint64(1)).view(np.int64))
+
+
+def pack_ints(values, level=6):
+    # int64 array -> compact bytes (zigzag, narrowest width, shuffle, zlib)
+    u = _zigzag(np.asarray(values))
+    top = int(u.max()) if u.size else 0
+    width = 1 if top < 1 << 8 else 2 if top < 1 << 16 else 4 if top < 1 << 32 else 8
+    shuffled = u.astype("<u" + str(width)).view(np.uint8).reshape(-1, width).T
+    body = zlib.compress(shuffled.tobytes(), level)
+    return _BLOCK_HEAD.pack(width, len(body)) + body
+
+
+def unpack_ints(buf, offset, count):
+    # inverse of pack_ints; returns (int64 array, next offset)
+    width, clen = _BLOCK_HEAD.unpack_from(buf, offset)
+    offset += _BLOCK_HEAD.size
+    raw = zlib.decompress(bytes(buf[offset:offset + clen]))
+    planes = np.frombuffer(raw, dtype=np.uint8).reshape(width, count)
+    u = np.ascontiguousarray(planes.T).view("<u" + str(width)).reshape(count)
+    return _unzigzag(u), offset + clen
+
+
+class SweepCodec:
+    """Keyframe + quantized-delta codec for one sweep plan.
+
+    encode(arrays) -> (payload bytes, is_keyframe) and advances the codec.
+    decode(payload, key_q) -> dict of complex arrays, where key_q is the
+    quantized keyframe (from decode_quantized on the keyframe payload).
+    """
+
+    def __init__(self, points, params, precision=DEVICE_RESOLUTION,
+                 keyframe_interval=64, level=6):
+        self.points = int(points)
+        self.params = tuple(params)
+        self.precision = float(precision)
+        self.keyframe_interval = max(1, int(keyframe_interval))
+        self.level = level
+        self.frames_since_key = 0
+        self.key_q = None
+
+    def quantize(self, arrays):
+        # dict of complex arrays -> (params x 2*points) int64
+        q = np.empty((len(self.params), 2 * self.points), dtype=np.int64)
+        for i, p in enumerate(self.params):
+            data = np.asarray(arrays[p])
+            if not np.all(np.isfinite(data)):
+                raise ValueError(p + " has NaN or infinite samples, which the "
+                                 "compressed archive cannot store")
+            q[i, 0::2] = np.rint(data.real / self.precision)
+            q[i, 1::2] = np.rint(data.imag / self.precision)
+        return q
+
+    def force_keyframe(self):
+        self.key_q = None
+
+    def encode(self, arrays):
+        q = self.quantize(arrays)
+        is_key = self.key_q is None or self.frames_since_key >= self.keyframe_interval
+        if is_key:
+            self.key_q = q
+            self.frames_since_key = 0
+            block = q
+        else:
+            block = q - self.key_q
+        self.frames_since_key += 1
+        return pack_ints(block.ravel(), self.level), is_key
+
+    def decode_quantized(self, payload, key_q=None):
+        # payload -> quantized (params x 2*points); adds key_q for deltas
+        n = len(self.params) * 2 * self.points
+        block, _ = unpack_ints(payload, 0, n)
+        block = block.reshape(len(self.params), 2 * self.points)
+        return block if key_q is None else block + key_q
+
+    def to_complex(self, q):
+        scaled = q * self.precision
+        return {p: scaled[i, 0::2] + 1j * scaled[i, 1::2]
+                for i, p in enumerate(self.params)}
+
+
+class _CodecHeader:
+    # header of a compressed archive. Internal to this module.
+
+    def __init__(self, model, serial, start, stop, points, outmask, precision,
+                 keyframe_interval, freq=None):
+        if not archive_params(outmask):
+            raise ValueError("outmask must include S11 (2) and/or S21 (4) data")
+        if not float(precision) > 0:
+            raise ValueError("precision must be > 0")
+        self.model = str(model or "")
+        self.serial = str(serial or "")
+        self.start = float(start)
+        self.stop = float(stop)
+        self.points = int(points)
+        self.outmask = int(outmask)
+        self.params = archive_params(outmask)
+        self.precision = float(precision)
+        self.keyframe_interval = max(1, int(keyframe_interval))
+        self.freq = (sweep_frequencies(start, stop, points) if freq is None
+                     else np.asarray(freq, dtype="<f8"))
+        table_end = _HEADER_SIZE + 8 * self.points
+        self.data_offset = -(-table_end // _DATA_ALIGN) * _DATA_ALIGN
+
+    def pack(self):
+        fixed = _HEADER.pack(
+            CODEC_MAGIC, CODEC_VERSION, 0, self.data_offset,
+            self.model.encode("utf-8")[:32], self.serial.encode("utf-8")[:32],
+            self.start, self.stop, self.points, self.outmask, self.precision,
+            self.keyframe_interval)
+        out = bytearray(self.data_offset)
+        out[:len(fixed)] = fixed
+        out[_HEADER_SIZE:_HEADER_SIZE + 8 * self.points] = self.freq.tobytes()
+        return bytes(out)
+
+    @classmethod
+    def read(cls, fh):
+        raw = fh.read(_HEADER_SIZE)
+        if len(raw) < _HEADER_SIZE or raw[:8] != CODEC_MAGIC:
+            raise ValueError("not an nvnapython compressed sweep archive")
+        (_magic, version, _flags, data_offset, model, serial, start, stop,
+         points, outmask, precision, interval) = _HEADER.unpack_from(raw)
+        if version != CODEC_VERSION:
+            raise ValueError("unsupported compressed archive version " + str(version))
+        freq = np.frombuffer(fh.read(8 * points), dtype="<f8")
+        header = cls(model.rstrip(b"\0").decode("utf-8"),
+                     serial.rstrip(b"\0").decode("utf-8"), start, stop, points,
+                     outmask, precision, interval, freq=freq)
+        if header.data_offset != data_offset:
+            raise ValueError("compressed archive header is inconsistent")
+        return header
+
+    def codec(self, level=6):
+        return SweepCodec(self.points, self.params, self.precision,
+                          self.keyframe_interval, level)
+
+
+class CompressedSweepArchiveWriter:
+    """Appends sweeps to a compressed archive (<path> + <path>.idx).
+
+    Same usage as archive.SweepArchiveWriter, including use as a stream stage.
+    Re-opening an existing file appends to it (the sweep plan and precision
+    must match) and starts with a fresh keyframe.
+    """
+
+    def __init__(self, path, start, stop, points, outmask=2, model="",
+                 serial="", precision=DEVICE_RESOLUTION, keyframe_interval=64,
+                 level=6, freq=None, auto_flush=True):
+        self.path = str(path)
+        self.index_path = self.path + ".idx"
+        self.header = _CodecHeader(model, serial, start, stop, points, outmask,
+                                   precision, keyframe_interval, freq=freq)
+        self.auto_flush = auto_flush
+
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            with open(self.path, "rb") as fh:
+                existing = _CodecHeader.read(fh)
+            if (existing.points, existing.outmask, existing.precision,
+                    existing.start, existing.stop) != \
+                    (self.header.points, self.header.outmask,
+                     self.header.precision, self.header.start, self.header.stop):
+                raise ValueError("existing archive " + self.path +
+                                 " holds a different sweep plan or precision")
+            self.header = existing
+            self._fh = open(self.path, "r+b")
+            self._idx = open(self.index_path, "a+b")
+            # keep only whole index entries, and frame bytes they point to
+            whole = os.path.getsize(self.index_path) // INDEX_DTYPE.itemsize
+            self._idx.truncate(whole * INDEX_DTYPE.itemsize)
+            end = self.header.data_offset
+            if whole:
+                self._idx.seek((whole - 1) * INDEX_DTYPE.itemsize)
+                last = np.frombuffer(self._idx.read(INDEX_DTYPE.itemsize),
+                                     dtype=INDEX_DTYPE)[0]
+                end = int(last["offset"]) + int(last["size"])
+            self._fh.truncate(end)
+            self._fh.seek(end)
+            self._idx.seek(0, os.SEEK_END)
+            self._count = whole
+        else:
+            self._fh = open(self.path, "wb")
+            self._fh.write(self.header.pack())
+            self._idx = open(self.index_path, "wb")
+            self._count = 0
+        self._codec = self.header.codec(level)
+        self._key_index = None
+        self._entry = np.zeros(1, dtype=INDEX_DTYPE)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def __call__(self, sweep):
+        self.append(sweep)
+        return sweep
+
+    def __len__(self):
+        return self._count
+
+    def append(self, sweep):
+        self.append_arrays(sweep.timestamp,
+                           **{p: sweep.get(p) for p in self.header.params})
+
+    def append_arrays(self, timestamp=None, **arrays):
+        payload, is_key = self._codec.encode(arrays)
+        if is_key:
+            self._key_index = self._count
+        entry = self._entry
+        entry["offset"] = self._fh.tell()
+        entry["ref"] = self._key_index
+        entry["size"] = len(payload)
+        entry["flags"] = FLAG_KEYFRAME if is_key else 0
+        entry["timestamp"] = time.time() if timestamp is None else timestamp
+        # frame first, then its index entry: a reader never sees an index
+        # entry whose frame isn't on disk yet
+        self._fh.write(payload)
+        if self.auto_flush:
+            self._fh.flush()
+        self._idx.write(entry.tobytes())
+        if self.auto_flush:
+            self._idx.flush()
+        self._count += 1
+
+    def bytes_written(self):
+        # data + index bytes on disk so far (header included)
+        return self._fh.tell() + self._idx.tell()
+
+    def flush(self):
+        self._fh.flush()
+        self._idx.flush()
+
+    def close(self):
+        for fh in (self._fh, self._idx):
+            if fh is not None and not fh.closed:
+                fh.flush()
+                fh.close()
+
+
+class CompressedSweepArchive:
+    """Reader for a compressed archive. Same interface as archive.SweepArchive
+    (len, [n], iteration, timestamps, refresh(), array()), except that arrays
+    are decoded on access instead of being views into the file."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.index_path = self.path + ".idx"
+        with open(self.path, "rb") as fh:
+            self.header = _CodecHeader.read(fh)
+        self.model = self.header.model
+        self.serial = self.header.serial
+        self.start = self.header.start
+        self.stop = self.header.stop
+        self.points = self.header.points
+        self.outmask = self.header.outmask
+        self.params = self.header.params
+        self.precision = self.header.precision
+        self.freq = self.header.freq
+        self._codec = self.header.codec()
+        self._data = None
+        self._key_cache = (None, None)       # (frame number, quantized keyframe)
+        self.index = np.zeros(0, dtype=INDEX_DTYPE)
+        self.refresh()
+
+    def refresh(self):
+        count = os.path.getsize(self.index_path) // INDEX_DTYPE.itemsize
+        if count != len(self.index):
+            self.index = np.memmap(self.index_path, dtype=INDEX_DTYPE, mode="r",
+                                   shape=(count,)) if count else \
+                np.zeros(0, dtype=INDEX_DTYPE)
+            self._data = np.memmap(self.path, dtype=np.uint8, mode="r") \
+                if count else None
+        return count
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def timestamps(self):
+        return self.index["timestamp"]
+
+    def _frame(self, n):
+        entry = self.index[n]
+        start = int(entry["offset"])
+        return self._data[start:start + int(entry["size"])]
+
+    def _keyframe(self, k):
+        if self._key_cache[0] != k:
+            self._key_cache = (k, self._codec.decode_quantized(self._frame(k)))
+        return self._key_cache[1]
+
+    def quantized(self, n):
+        # the stored integer representation of sweep n
+        n = range(len(self.index))[n]
+        entry = self.index[n]
+        if int(entry["flags"]) & FLAG_KEYFRAME:
+            return self._keyframe(n)
+        return self._codec.decode_quantized(self._frame(n),
+                                            self._keyframe(int(entry["ref"])))
+
+    def __getitem__(self, n):
+        n = range(len(self.index))[n]
+        data = self._codec.to_complex(self.quantized(n))
+        return SweepResult(self.freq, s11=data.get("s11"), s21=data.get("s21"),
+                           start=self.start, stop=self.stop, points=self.points,
+                           outmask=self.outmask,
+                           timestamp=float(self.index[n]["timestamp"]))
+
+    def __iter__(self):
+        for n in range(len(self.index)):
+            yield self[n]
+
+    def array(self, param="s11", rows=None):
+        # decode `rows` (a slice or index list; default all) of one parameter
+        # into a (sweeps x points) complex128 array
+        picks = range(len(self.index))[rows if rows is not None else slice(None)]
+        out = np.empty((len(picks), self.points), dtype=np.complex128)
+        i = self.params.index(param)
+        for row, n in enumerate(picks):
+            q = self.quantized(n)[i] * self.precision
+            out[row] = q[0::2] + 1j * q[1::2]
+        return out
@@ -36,6 +36,13 @@
 SERIAL_TIMEOUT_S = 5.0
 SERIAL_POLL_INTERVAL_S = 0.01
 
+# USB VID:PID pairs autoconnect() (and the reconnect supervisor) treat as a
+# NanoVNA-class device. NanoVNA and tinySA units both commonly enumerate as the
+# STM32 virtual COM port 0483:5740, so this alone cannot tell them apart.
+USB_VID_PID = (
+    (0x0483, 0x5740),   # STM32 VCP (NanoVNA-H, NanoVNA-F, tinySA, ...)
+)
+
 # scan() outmask: bitwise OR of 1=frequency, 2=S11, 4=S21 -> valid 0..7
 SCAN_OUTMASK_VALUES = (0, 1, 2, 3, 4, 5, 6, 7)
 
@@ -63,10 +70,19 @@ MARKER_ACTIONS = ("on", "off", "peak")
 #                               False -> max_points is the exclusive upper end
 #                                        (the device reports e.g. "range 11-201"
 #                                        with the top end not selectable)
+#   min_points                : smallest point count one 'scan' accepts; the
+#                               sweep planner never splits below it
 #   screen_width / screen_height : LCD pixel dimensions (for touch/lcd bounds)
 #   num_markers / num_traces  : how many markers / traces the UI exposes
 #   num_cal_slots             : calibration storage groups (recall range)
 #   num_preset_slots          : save/recall preset count
+#   scan_overhead_s           : DEFAULT cost model for the sweep planner
+#   scan_point_s                (planner.py): wall time of one 'scan' is
+#   scan_value_s                  overhead + pts * (point + values * value),
+#                                 where values is the number of columns the
+#                                 outmask returns. Rough estimates only --
+#                                 nanoVNA.calibrate_sweep_costs() measures
+#                                 the connected unit and replaces them.
 #
 # Sources:
 #   NanoVNA-F V2 : Chelegance "Nano VNA-F V2 User Guide Rev 2.0" (50kHz-3GHz,
@@ -90,12 +106,16 @@ MODELS = {
         "max_freq_hz": 3e9,         # 3 GHz
         "max_points": 201,          # 11-201 configurable per the user guide
         "point_end_inclusive": True,
+        "min_points": 11,
         "screen_width": 800,
         "screen_height": 480,
         "num_markers": 4,
         "num_traces": 4,
         "num_cal_slots": 7,
         "num_preset_slots": 7,
+        "scan_overhead_s": 0.03,    # command echo + prompt wait + parse call
+        "scan_point_s": 1.0e-3,     # device sweep time per point
+        "scan_value_s": 2.0e-5,     # transfer + parse per returned value
     },
     "NANOVNA_F_V3": {
         "min_freq_hz": 50e3,        # 50 kHz (per the docs; the device is
@@ -111,36 +131,48 @@ MODELS = {
                                     #        (menu range is 101-801; the scan
                                     #        command accepts down to 51)
         "point_end_inclusive": True,
+        "min_points": 51,
         "screen_width": 800,
         "screen_height": 480,
         "num_markers": 4,
         "num_traces": 4,
         "num_cal_slots": 7,
         "num_preset_slots": 7,
+        "scan_overhead_s": 0.03,    # command echo + prompt wait + parse call
+        "scan_point_s": 0.6e-3,     # device sweep time per point
+        "scan_value_s": 2.0e-5,     # transfer + parse per returned value
     },
     "NANOVNA_H4": {
         "min_freq_hz": 10e3,        # 10 kHz (firmware-permissive floor)
         "max_freq_hz": 1.5e9,       # 1.5 GHz
         "max_points": 101,          # fixed 101 on the H4
         "point_end_inclusive": True,
+        "min_points": 11,           # scan accepts short sweeps; display stays 101
         "screen_width": 320,
         "screen_height": 480,
         "num_markers": 4,
         "num_traces": 4,
         "num_cal_slots": 5,
         "num_preset_slots": 5,
+        "scan_overhead_s": 0.04,    # command echo + prompt wait + parse call
+        "scan_point_s": 1.5e-3,     # device sweep time per point
+        "scan_value_s": 2.0e-5,     # transfer + parse per returned value
     },
     "NANOVNA_GENERIC": {
         "min_freq_hz": 10e3,        # 10 kHz
         "max_freq_hz": 1.5e9,       # 1.5 GHz (conservative; many base units)
         "max_points": 101,          # conservative; the classic NanoVNA limit
         "point_end_inclusive": True,
+        "min_points": 11,           # conservative floor for unknown firmware
         "screen_width": 320,
         "screen_height": 240,
         "num_markers": 4,
         "num_traces": 4,
         "num_cal_slots": 5,
         "num_preset_slots": 5,
+        "scan_overhead_s": 0.05,    # command echo + prompt wait + parse call
+        "scan_point_s": 2.0e-3,     # device sweep time per point
+        "scan_value_s": 2.0e-5,     # transfer + parse per returned value
     },
 }
 
@@ -23,21 +23,29 @@
 import serial
 import serial.tools.list_ports  # COM search method wants full path
 import re
-import time  # noqa: F401  (used by binary read helper)
+import time
 
 from .constants import (
     MODELS,
     DEFAULT_MODEL,
     SERIAL_TIMEOUT_S,
     SERIAL_POLL_INTERVAL_S,
+    USB_VID_PID,
 )
 
+from .supervisor import ConnectionSupervisor
+from .timeouts import TimeoutBudget
+from .instrumentation import SerialStats
+from .recording import RecordingPort, ReplayPort
+from .transports import open_transport
+
 from ._commands.acquisition import AcquisitionMixin
 from ._commands.calibration import CalibrationMixin
 from ._commands.markers_traces import MarkersTracesMixin
 from ._commands.display_ui import DisplayUIMixin
 from ._commands.presets_config import PresetsConfigMixin
 from ._commands.system_info import SystemInfoMixin
+from ._commands.streaming import StreamingMixin
 
 
 class nanoVNA(
@@ -47,6 +55,7 @@ class nanoVNA(
     DisplayUIMixin,
     PresetsConfigMixin,
     SystemInfoMixin,
+    StreamingMixin,
 ):
     def __init__(self, parent=None):
         # serial port
@@ -60,6 +69,24 @@ class nanoVNA(
         self.serialTimeout = SERIAL_TIMEOUT_S
         self.serialPollInterval = SERIAL_POLL_INTERVAL_S
 
+        # reconnect supervisor (see enable_supervisor); None = unsupervised
+        self._supervisor = None
+
+        # adaptive per-command timeouts (see enable_adaptive_timeouts);
+        # None = the fixed serialTimeout for every read
+        self._timeouts = None
+
+        # per-command serial statistics (see enable_serial_stats); None = off.
+        # _lastRead holds the phase timestamps of the last text read for them.
+        self._stats = None
+        self._lastRead = None
+
+        # duration of the last flash write (see nanoVNA_serial_no_wait)
+        self.lastFlashWriteS = None
+
+        # whether the last text read gave up waiting for the prompt
+        self.lastReadTimedOut = False
+
         # VARS BELOW HERE are seeded from the per-model envelope in constants.py.
         # select_existing_device() swaps in a different model's values; the
         # set_* override methods below tweak individual bounds for debug / clones.
@@ -117,6 +144,7 @@ class nanoVNA(
         # __init__ and select_existing_device stay in sync.
         self.maxPoints = model_dict["max_points"]
         self.pointEndInclusive = model_dict["point_end_inclusive"]
+        self.minPoints = model_dict["min_points"]
         self.minVNADeviceFreq = model_dict["min_freq_hz"]
         self.maxVNADeviceFreq = model_dict["max_freq_hz"]
         self.screenWidth = model_dict["screen_width"]
@@ -184,6 +212,12 @@ class nanoVNA(
     def get_max_points(self):
         return self.maxPoints
 
+    def set_min_points(self, n):
+        self.minPoints = int(n)
+
+    def get_min_points(self):
+        return self.minPoints
+
     def set_screen_size(self, width, height):
         self.screenWidth = int(width)
         self.screenHeight = int(height)
@@ -218,10 +252,8 @@ class nanoVNA(
         # STM32 virtual COM VID:PID 0483:5740, so VID/PID ALONE cannot tell them
         # apart. Some NanoVNA variants enumerate differently; the set below is a
         # starting list. If your device isn't detected, connect() to the port
-        # explicitly, or add its VID/PID here.
-        accepted_vid_pid = [
-            (0x0483, 0x5740),   # STM32 VCP (NanoVNA-H, NanoVNA-F, tinySA, ...)
-        ]
+        # explicitly, or add its VID/PID to constants.USB_VID_PID.
+        accepted_vid_pid = USB_VID_PID
 
         ports = serial.tools.list_ports.comports()
         for port_info in ports:
@@ -243,8 +275,10 @@ class nanoVNA(
         # attempt connection to provided port.
         # returns: True if successful, False otherwise
         # Single explicit attempt: open the port, succeed or fail, report.
+        # port is a serial port name, or 'tcp://host:port' (also 'socket://')
+        # for a device behind a raw TCP serial bridge (see transports.py).
         try:
-            self.ser = serial.Serial(port=port, timeout=timeout)
+            self.ser = open_transport(port, timeout)
             return True
         except Exception as err:
             self.ser = None
@@ -252,6 +286,20 @@ class nanoVNA(
             self.print_message(err)
             return False
 
+    def connect_transport(self, transport):
+        # Use an already-open transport (a transports.Transport, or anything
+        # with the same pyserial-style methods) as the device connection,
+        # closing any port that was open.
+        # returns: True
+        if transport is not self.ser:
+            self.disconnect()
+        self.ser = transport
+        return True
+
+    def get_transport(self):
+        # the object the library currently reads and writes through, or None
+        return self.ser
+
     def disconnect(self):
         # Close the serial port and release the handle.
         # Tolerant of being called when never connected or already closed, so
@@ -265,21 +313,73 @@ class nanoVNA(
             finally:
                 self.ser = None
 
-    def nanoVNA_serial(self, writebyte, printBool=False, pts=None):
+    def start_recording(self, path):
+        # Log every write and read chunk on the open port, with timestamps,
+        # to `path` (see recording.py) until stop_recording().
+        # returns: True if recording started
+        if self.ser is None:
+            self.print_message("ERROR: start_recording() needs a connected device")
+            return False
+        if isinstance(self.ser, RecordingPort):
+            self.stop_recording()
+        self.ser = RecordingPort(self.ser, path)
+        self.print_message("recording serial traffic to " + str(path))
+        return True
+
+    def stop_recording(self):
+        # close the recording and keep using the port
+        # returns: the number of events recorded, or None if not recording
+        if not isinstance(self.ser, RecordingPort):
+            return None
+        events = self.ser.events
+        self.ser = self.ser.detach()
+        return events
+
+    def replay(self, path, realtime=True, speed=1.0, strict=False):
+        # Use a recording (start_recording) in place of a device: each command
+        # gets the reply chunks recorded for it, at the recorded times
+        # (realtime, scaled by speed) or straight away. Closes any open port.
+        # returns: the ReplayPort
+        self.disconnect()
+        self.ser = ReplayPort(path, realtime, speed, strict)
+        self.print_message("replaying " + str(path))
+        return self.ser
+
+    def nanoVNA_serial(self, writebyte, printBool=False, pts=None, timeout_s=None):
         # write out to serial, get message back, clean up, return.
         #
+        # timeout_s sets the read timeout for this one exchange. It takes the
+        # place of the adaptive budget (when enabled) and the exchange is not
+        # fed back into it, so a deliberately short probe can't skew it.
+        #
         # The pts argument is accepted for signature-compatibility with the
         # tsapython binary path and for future binary-frame reads. NanoVNA
         # scan/data responses are TEXT (whitespace-separated values terminated
         # by the 'ch>' prompt), so the text path is used regardless for now.
 
+        # with a supervisor enabled, route the exchange through it (it calls
+        # back in here with .active set, and recovers from a dead port)
+        if self._supervisor is not None and not self._supervisor.active:
+            return self._supervisor.call(writebyte, printBool, pts, timeout_s)
+
         # clear INPUT buffer
         self.ser.reset_input_buffer()
         # clear OUTPUT buffer
         self.ser.reset_output_buffer()
 
+        budget = self._timeouts if timeout_s is None else None
+        stats = self._stats
+        started = time.time()
         self.ser.write(bytes(writebyte, 'utf-8'))
-        msgbytes = self.get_serial_return()
+        if stats is not None:
+            wrote = time.time()
+        msgbytes = self.get_serial_return(
+            timeout_s if budget is None else budget.budget(writebyte))
+        if budget is not None:
+            budget.observe(writebyte, time.time() - started,
+                           bytes(msgbytes).rstrip().endswith(b'ch>'))
+        if stats is not None:
+            nbytes = len(msgbytes)
         msgbytes = self.clean_return(msgbytes)
 
         # Post-read straggler drain: belt-and-suspenders companion to the
@@ -289,19 +389,130 @@ class nanoVNA(
         # otherwise sit in the buffer and be raced by the NEXT command. We sip
         # them here so each call leaves the input buffer clean. This is cheap and
         # bounded; if nothing is waiting it does effectively nothing.
+        if stats is not None:
+            drain_start = time.time()
         try:
             if self.ser.in_waiting:
                 self.ser.read(self.ser.in_waiting)
         except Exception:
             pass
+        if stats is not None:
+            self._record_text_exchange(stats, writebyte, started, wrote, drain_start,
+                                       nbytes)
 
         if printBool == True:
             print(msgbytes)  # overrides verbose for debug
 
         return msgbytes
 
-    def nanoVNA_serial_no_wait(self, writebyte, settle_s=0.6):
-        # Write a command but do NOT wait for a 'ch>' prompt.
+    def _record_text_exchange(self, stats, command, started, wrote, drain_start, nbytes):
+        # turn the timestamps of one nanoVNA_serial exchange (and the read's,
+        # left in _lastRead) into SerialStats phases
+        done = time.time()
+        first_at, prompt_at, read_done, chunks, timed_out = self._lastRead
+        phases = {"write": wrote - started, "drain": done - drain_start,
+                  "total": done - started}
+        if first_at is not None:
+            phases["first_byte"] = first_at - wrote
+            if prompt_at is not None:
+                phases["stream"] = prompt_at - first_at
+                phases["settle"] = read_done - prompt_at
+        stats.record(command, phases, nbytes, chunks, timed_out)
+
+    def _record_binary_read(self, stats, command, started, wrote, first_at, last_at,
+                            nbytes, chunks, timed_out, drain_s=None):
+        # SerialStats phases of a length-driven binary read (capture,
+        # get_binary_return)
+        phases = {"write": wrote - started, "total": time.time() - started}
+        if first_at is not None:
+            phases["first_byte"] = first_at - wrote
+            phases["stream"] = last_at - first_at
+        if drain_s is not None:
+            phases["drain"] = drain_s
+        stats.record(command, phases, nbytes, chunks, timed_out)
+
+    def enable_serial_stats(self):
+        # Start recording per-command phase timings, reply bytes, read chunks
+        # and timeouts (see instrumentation.py). Recording into an existing
+        # SerialStats continues it; call reset() on it to start over.
+        # returns: the SerialStats
+        if self._stats is None:
+            self._stats = SerialStats()
+        return self._stats
+
+    def disable_serial_stats(self):
+        # stop recording; the instance keeps no statistics afterwards
+        self._stats = None
+
+    def get_serial_stats(self):
+        # the active SerialStats, or None
+        return self._stats
+
+    def enable_supervisor(self, serial_number=None, timeout_s=30.0, interval_s=0.5,
+                          probe_timeout_s=1.0, find_ports=None, open_port=None,
+                          max_timeouts=2):
+        # Turn on automatic reconnect (see supervisor.py): when the port dies
+        # mid-command, find the device with this serial number again, reopen
+        # it, restore the shadowed sweep/trace/marker configuration and retry
+        # the command if it is safe to repeat. A port that stops answering is
+        # treated the same way once max_timeouts exchanges in a row time out
+        # and an 'SN' probe gets no answer. serial_number defaults to the
+        # connected device's SN. find_ports / open_port override port
+        # discovery and opening.
+        # returns: the ConnectionSupervisor, or None if no SN is available
+        if serial_number is None:
+            if self.ser is None:
+                self.print_message("ERROR: enable_supervisor() needs a connected device "
+                                   "or a serial_number")
+                return None
+            serial_number = bytes(self.SN()).decode("utf-8", errors="replace").strip()
+            if not serial_number:
+                self.print_message("ERROR: enable_supervisor() could not read the SN")
+                return None
+        self._supervisor = ConnectionSupervisor(self, serial_number, timeout_s, interval_s,
+                                                probe_timeout_s, find_ports, open_port,
+                                                max_timeouts)
+        self.print_message("supervising device " + str(serial_number))
+        return self._supervisor
+
+    def disable_supervisor(self):
+        self._supervisor = None
+
+    def get_supervisor(self):
+        # the active ConnectionSupervisor, or None
+        return self._supervisor
+
+    def enable_adaptive_timeouts(self, margin=2.0, k=4.0, min_s=0.5, max_s=120.0,
+                                 cost=None):
+        # Replace the fixed serialTimeout with a per-command budget (see
+        # timeouts.py): short for quick queries so a dead device is noticed in
+        # about min_s, scaled with point count for scans and with size for
+        # binary captures, and refined from every observed exchange. Seeded
+        # from the selected model's cost defaults; pass cost (e.g.
+        # sweep_cost_model() after calibrate_sweep_costs()) to seed from a
+        # measured model. Call again after select_existing_device().
+        # returns: the TimeoutBudget
+        self._timeouts = TimeoutBudget(MODELS[self.deviceModel], self.maxPoints, cost,
+                                       margin, k, min_s, max_s)
+        return self._timeouts
+
+    def disable_adaptive_timeouts(self):
+        # back to the fixed serialTimeout for every read
+        self._timeouts = None
+
+    def get_timeout_budget(self):
+        # the active TimeoutBudget, or None
+        return self._timeouts
+
+    def _binary_timeouts(self, nbytes):
+        # (first-byte timeout, absolute cap) for a binary read of nbytes: the
+        # adaptive budget if enabled, else serialTimeout and serialTimeout * 6
+        if self._timeouts is not None:
+            return self._timeouts.binary_budget(nbytes)
+        return self.serialTimeout, self.serialTimeout * 6
+
+    def nanoVNA_serial_no_wait(self, writebyte, settle_s=None, ready_timeout_s=5.0):
+        # Write a command but do NOT wait for its 'ch>' prompt.
         #
         # WHY THIS EXISTS: a few commands write to FLASH (notably 'save', and on
         # some firmware 'saveconfig'). During the flash write the NanoVNA-F V2/V3
@@ -312,23 +523,35 @@ class nanoVNA(
         # therefore always hits the full serial timeout, and the next command can
         # collide with the still-recovering device and block the port on Windows.
         #
-        # So for these commands we write, wait a fixed settle for the flash write
-        # to finish, drain any bytes the device did emit (the echo, and possibly a
-        # late prompt on firmware that does recover), and return WITHOUT awaiting a
-        # prompt. The command still executes on the device; we simply don't depend
-        # on an acknowledgement that may never come.
+        # So for these commands we write, then wait until the console answers
+        # again (wait_for_console: an empty line re-prompts, probed at a short
+        # interval), drain what the device emitted, and return WITHOUT awaiting
+        # the command's own prompt. This returns as soon as the flash write is
+        # done instead of after a worst-case sleep; the measured time is kept in
+        # get_last_flash_write_time(). Passing settle_s restores the old fixed
+        # settle sleep (no probing).
         #
         # NOTE: because the device does not acknowledge, the return here is only
-        # whatever bytes happened to arrive within the settle window -- it is NOT a
-        # reliable success signal. To confirm a save persisted, power-cycle and
-        # 'recall' the slot.
+        # whatever bytes happened to arrive -- it is NOT a reliable success
+        # signal. To confirm a save persisted, power-cycle and 'recall' the slot.
         import time
         self.ser.reset_input_buffer()
         self.ser.reset_output_buffer()
         self.ser.write(bytes(writebyte, 'utf-8'))
 
-        time.sleep(settle_s)
         collected = bytearray()
+        if settle_s is None:
+            self.lastFlashWriteS = self.wait_for_console(ready_timeout_s, collected)
+            if self.lastFlashWriteS is None:
+                self.print_message("WARNING: device console did not answer within " +
+                                   str(ready_timeout_s) + "s after '" +
+                                   writebyte.strip() + "'")
+            else:
+                self.print_message("'" + writebyte.strip() + "' finished in " +
+                                   format(self.lastFlashWriteS, ".3f") + "s")
+        else:
+            self.lastFlashWriteS = None
+            time.sleep(settle_s)
         try:
             if self.ser.in_waiting:
                 collected += self.ser.read(self.ser.in_waiting)
@@ -343,7 +566,49 @@ class nanoVNA(
             pass
         return self.clean_return(bytearray(collected))
 
-    def get_serial_return(self):
+    def wait_for_console(self, timeout_s=5.0, collected=None, probe_timeout_s=0.1,
+                         interval_s=0.02):
+        # Probe until the device console is servicing commands again: send an
+        # empty line (the shell just re-prompts) and wait probe_timeout_s for a
+        # 'ch>'; repeat every interval_s until timeout_s. Probes sent while the
+        # device is busy are buffered by USB and answered together once it is
+        # free, so the extra prompts are drained before returning. Bytes read
+        # are appended to `collected` if given.
+        # returns: seconds until the console answered, or None on timeout
+        import time
+        collected = bytearray() if collected is None else collected
+        started = time.time()
+        while True:
+            self.ser.write(b'\r\n')
+            probe_deadline = time.time() + probe_timeout_s
+            while time.time() < probe_deadline:
+                if self.ser.in_waiting:
+                    collected += self.ser.read(self.ser.in_waiting)
+                    if b'ch>' in collected:
+                        ready_s = time.time() - started
+                        # absorb the prompts of the earlier, buffered probes
+                        quiet_deadline = time.time() + max(self.serialPollInterval * 5,
+                                                           0.05)
+                        while time.time() < quiet_deadline:
+                            if self.ser.in_waiting:
+                                collected += self.ser.read(self.ser.in_waiting)
+                                quiet_deadline = time.time() + max(
+                                    self.serialPollInterval * 5, 0.05)
+                            else:
+                                time.sleep(self.serialPollInterval)
+                        return ready_s
+                else:
+                    time.sleep(self.serialPollInterval)
+            if time.time() - started + interval_s > timeout_s:
+                return None
+            time.sleep(interval_s)
+
+    def get_last_flash_write_time(self):
+        # seconds the last save-type command kept the console busy (measured
+        # by nanoVNA_serial_no_wait), or None if not measured
+        return self.lastFlashWriteS
+
+    def get_serial_return(self, timeout_s=None):
         # Read the device reply, accumulating until the 'ch>' prompt arrives.
         #
         # The device terminates every reply with the prompt 'ch>'. USB CDC
@@ -372,18 +637,30 @@ class nanoVNA(
         # of hanging. The companion post-read drain in nanoVNA_serial mops up any
         # straggler bytes that arrive after the settle window.
         #
+        # timeout_s overrides serialTimeout as the idle timeout for this read
+        # (nanoVNA_serial passes the adaptive budget when that's enabled).
+        #
         # buffer reading lineage:
         #   https://groups.io/g/nanovna-users (screen capture / serial read threads)
 
         import time
         prompt = b'ch>'
         buffer = bytes()
-        deadline = time.time() + self.serialTimeout
+        idle_s = self.serialTimeout if timeout_s is None else timeout_s
+        deadline = time.time() + idle_s
+        stats = self._stats
+        first_at = prompt_at = None
+        chunks = 0
+        timed_out = False
 
         while True:
             waiting = self.ser.in_waiting
             if waiting > 0:
                 buffer += self.ser.read(waiting)
+                if stats is not None:
+                    chunks += 1
+                    if first_at is None:
+                        first_at = time.time()
                 # The full reply is done once the prompt is at the end. The
                 # device emits the prompt as 'ch> ' WITH A TRAILING SPACE (and
                 # sometimes a trailing '\r\n'), so a bare buffer.endswith(b'ch>')
@@ -395,11 +672,21 @@ class nanoVNA(
                     # the next command to race. We do NOT require a second prompt
                     # -- if none comes within the settle window, we return what we
                     # have (handles single-prompt firmware without a long stall).
+                    # If the doubled prompt already landed in the same chunk
+                    # (common when the whole reply is buffered by the time we
+                    # poll), there is nothing left to wait for -- skipping the
+                    # settle here is what lets back-to-back scans (stream_scan)
+                    # run at the device's sweep rate.
                     settle_deadline = time.time() + max(self.serialPollInterval * 5,
                                                         0.05)
+                    if stats is not None:
+                        prompt_at = time.time()
+                    if buffer.count(prompt) >= 2:
+                        settle_deadline = 0
                     while time.time() < settle_deadline:
                         if self.ser.in_waiting:
                             buffer += self.ser.read(self.ser.in_waiting)
+                            chunks += 1
                             # if a full second prompt has now landed, we're done
                             if buffer.count(prompt) >= 2:
                                 break
@@ -407,15 +694,19 @@ class nanoVNA(
                             time.sleep(self.serialPollInterval)
                     break
                 # reset the deadline whenever we make progress
-                deadline = time.time() + self.serialTimeout
+                deadline = time.time() + idle_s
             else:
                 # no data right now; the device may still be sending. Wait a
                 # beat and re-check rather than busy-spinning or bailing early.
                 if time.time() > deadline:
                     self.print_message("WARNING: serial read timed out waiting for prompt")
+                    timed_out = True
                     break
                 time.sleep(self.serialPollInterval)
 
+        self.lastReadTimedOut = timed_out
+        if stats is not None:
+            self._lastRead = (first_at, prompt_at, time.time(), chunks, timed_out)
         return bytearray(buffer)
 
     def get_binary_return(self, expected_bytes, timeout_s=None, start_timeout_s=None):
@@ -439,24 +730,36 @@ class nanoVNA(
         # instead of waiting the full cap), or (c) a generous absolute timeout
         # (a stalled/dead transfer mid-stream). Returns exactly expected_bytes on
         # success, or a SHORT bytearray (with a warning) otherwise.
+        #
+        # With adaptive timeouts enabled, both limits default to the budget for
+        # expected_bytes instead (see _binary_timeouts).
         import time
+        default_start_s, default_total_s = self._binary_timeouts(expected_bytes)
         if timeout_s is None:
             # generous absolute cap that scales with the configured serial
             # timeout. At the default serialTimeout (5s) this is ~30s; the real
             # transfer is a couple of seconds, so it only fires on a stalled or
             # dead transfer mid-stream.
-            timeout_s = self.serialTimeout * 6
+            timeout_s = default_total_s
         if start_timeout_s is None:
             # how long to wait for the FIRST byte before giving up. If the device
             # didn't begin streaming, there's no point waiting out the full cap.
-            start_timeout_s = self.serialTimeout
+            start_timeout_s = default_start_s
 
+        stats = self._stats
+        first_at = last_at = None
+        chunks = 0
         buffer = bytearray()
         start = time.time()
         while len(buffer) < expected_bytes:
             waiting = self.ser.in_waiting
             if waiting:
                 buffer += self.ser.read(waiting)
+                if stats is not None:
+                    chunks += 1
+                    last_at = time.time()
+                    if first_at is None:
+                        first_at = last_at
             else:
                 elapsed = time.time() - start
                 if len(buffer) == 0 and elapsed > start_timeout_s:
@@ -471,6 +774,12 @@ class nanoVNA(
                         str(timeout_s) + "s")
                     break
                 time.sleep(self.serialPollInterval)
+        if self._timeouts is not None:
+            self._timeouts.observe_binary(expected_bytes, time.time() - start,
+                                          len(buffer) >= expected_bytes)
+        if stats is not None:
+            self._record_binary_read(stats, "binary", start, start, first_at, last_at,
+                                     len(buffer), chunks, len(buffer) < expected_bytes)
 
         # The device appends a 'ch> ' prompt after the frame; if we over-read
         # into it, trim back to exactly the image bytes.
@@ -0,0 +1,262 @@
+#! /usr/bin/python3
+
+##------------------------------------------------------------------------------------------------\
+#   nanoVNA_python (nvnapython)
+#   'src/nvnapython/exporter.py'
+#
+#   Prometheus text-format metrics endpoint for long-running acquisition
+#   hosts.
+#
+#       exporter = MetricsExporter(port=9110)        # http://host:9110/metrics
+#       exporter.add(nvna)                           # turns on serial stats
+#       stream = nvna.stream_scan(int(1e6), int(900e6), 401)
+#       exporter.add_stream(nvna, stream)
+#       exporter.start()
+#
+#   Every series is labelled with the device's serial number and model. What
+#   is published, per device:
+#
+#       nvnapython_up                               port open (1) or not (0)
+#       nvnapython_commands_total{command}          exchanges (instrumentation.py)
+#       nvnapython_command_timeouts_total{command}  reads that timed out
+#       nvnapython_serial_bytes_total{command}      reply bytes -> bytes/s via rate()
+#       nvnapython_command_seconds{command,phase}   summary: p50/p90/p99, sum, count
+#                                                   (parse latency is phase="parse")
+#       nvnapython_reconnects_total                 supervisor.py counters, if enabled
+#       nvnapython_reconnect_failures_total
+#       nvnapython_replayed_commands_total
+#       nvnapython_retried_commands_total
+#       nvnapython_adaptive_timeouts_total          timeouts.py, if enabled
+#       nvnapython_sweeps_parsed_total{stream}      registered stream_scan pipelines;
+#       nvnapython_sweeps_dropped_total{stream}     sweep rate via rate() or the
+#       nvnapython_sweep_rate{stream}               pipeline's own gauge
+#
+#   Nothing runs on the acquisition thread: the counters are the ones the
+#   library already keeps, and they are read when the endpoint is scraped,
+#   on the server's own thread. The serial number is read once, in add().
+#
+#   Only the standard library is needed.
+#
+#   Author(s): Lauren Linkous
+##--------------------------------------------------------------------------------------------------\
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .instrumentation import PHASES
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+QUANTILES = (("0.5", "p50"), ("0.9", "p90"), ("0.99", "p99"))
+
+_SUPERVISOR_COUNTERS = (
+    ("nvnapython_reconnects_total", "reconnects", "Successful reconnects."),
+    ("nvnapython_reconnect_failures_total", "failures", "Reconnects that gave up."),
+    ("nvnapython_replayed_commands_total", "replayed",
+     "Configuration commands replayed after a reconnect."),
+    ("nvnapython_retried_commands_total", "retried",
+     "In-flight commands re-sent after a reconnect."),
+)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(labels):
+    return "{" + ",".join(k + "=\"" + _escape(v) + "\"" for k, v in labels) + "}"
+
+
+class _Metric:
+    # one metric family: HELP / TYPE lines and its samples
+
+    def __init__(self, name, kind, help_text):
+        self.name = name
+        self.kind = kind
+        self.help_text = help_text
+        self.samples = []
+
+    def add(self, labels, value, suffix=""):
+        self.samples.append((self.name + suffix, labels, value))
+
+    def lines(self):
+        out = ["# HELP " + self.name + " " + self.help_text,
+               "# TYPE " + self.name + " " + self.kind]
+        for name, labels, value in self.samples:
+            out.append(name + _labels(labels) + " " + repr(float(value)))
+        return out
+
+
+class _Device:
+    def __init__(self, nvna, serial, model):
+        self.nvna = nvna
+        self.serial = serial
+        self.model = model
+        self.streams = {}
+
+
+def render(devices):
+    """
+    Prometheus text exposition of `devices` ([_Device], as kept by
+    MetricsExporter). Separate from the server so it can be tested, or
+    written to a node_exporter textfile instead.
+    """
+    families = {}
+
+    def family(name, kind, help_text):
+        if name not in families:
+            families[name] = _Metric(name, kind, help_text)
+        return families[name]
+
+    for dev in devices:
+        base = (("serial", dev.serial), ("model", dev.model))
+        nvna = dev.nvna
+        ser = nvna.ser
+        family("nvnapython_up", "gauge", "Serial port open (1) or not (0).").add(
+            base, 1 if ser is not None and getattr(ser, "is_open", True) else 0)
+
+        stats = nvna.get_serial_stats()
+        if stats is not None:
+            for command, summary in stats.summary().items():
+                labels = base + (("command", command),)
+                family("nvnapython_commands_total", "counter",
+                       "Serial exchanges per command.").add(labels, summary["calls"])
+                family("nvnapython_command_timeouts_total", "counter",
+                       "Serial reads per command that timed out.").add(
+                           labels, summary["timeouts"])
+                family("nvnapython_serial_bytes_total", "counter",
+                       "Reply bytes read per command.").add(labels, summary["bytes"]["sum"])
+                seconds = family("nvnapython_command_seconds", "summary",
+                                 "Serial exchange phase times per command.")
+                for phase in PHASES:
+                    if phase not in summary:
+                        continue
+                    s = summary[phase]
+                    phase_labels = labels + (("phase", phase),)
+                    for q, key in QUANTILES:
+                        seconds.add(phase_labels + (("quantile", q),), s[key])
+                    seconds.add(phase_labels, s["sum"], "_sum")
+                    seconds.add(phase_labels, s["count"], "_count")
+
+        supervisor = nvna.get_supervisor()
+        if supervisor is not None:
+            for name, attr, help_text in _SUPERVISOR_COUNTERS:
+                family(name, "counter", help_text).add(base, getattr(supervisor, attr))
+
+        budget = nvna.get_timeout_budget()
+        if budget is not None:
+            family("nvnapython_adaptive_timeouts_total", "counter",
+                   "Exchanges that ran out of their adaptive timeout budget.").add(
+                       base, budget.timeouts)
+
+        for name, stream in sorted(dev.streams.items()):
+            labels = base + (("stream", name),)
+            family("nvnapython_sweeps_parsed_total", "counter",
+                   "Sweeps parsed by a stream_scan pipeline.").add(labels, stream.parsed)
+            family("nvnapython_sweeps_dropped_total", "counter",
+                   "Malformed scan replies a stream_scan pipeline dropped.").add(
+                       labels, stream.dropped)
+            family("nvnapython_sweep_rate", "gauge",
+                   "Parsed sweeps per second since the stream started.").add(
+                       labels, stream.sweep_rate())
+
+    lines = []
+    for metric in families.values():
+        lines += metric.lines()
+    return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    """Serves the metrics of the added devices at http://host:port/metrics.
+
+    host defaults to localhost only; pass "0.0.0.0" to let a remote
+    Prometheus scrape it. port=0 picks a free port (see .port after start()).
+    """
+
+    def __init__(self, port=9110, host="127.0.0.1"):
+        self.host = host
+        self.port = int(port)
+        self._devices = []
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def add(self, nvna, serial=None):
+        # Publish `nvna`'s metrics. Turns on its serial statistics. serial
+        # defaults to the supervisor's serial number, else the device's SN
+        # (read now, on the caller's thread).
+        if serial is None:
+            supervisor = nvna.get_supervisor()
+            if supervisor is not None:
+                serial = supervisor.serial_number
+            elif nvna.ser is not None:
+                serial = bytes(nvna.SN()).decode("utf-8", errors="replace").strip()
+        nvna.enable_serial_stats()
+        device = _Device(nvna, serial or "unknown", nvna.get_device_model())
+        with self._lock:
+            self._devices = [d for d in self._devices if d.nvna is not nvna] + [device]
+        return device
+
+    def remove(self, nvna):
+        with self._lock:
+            self._devices = [d for d in self._devices if d.nvna is not nvna]
+
+    def add_stream(self, nvna, stream, name="default"):
+        # publish the parsed/dropped counters and sweep rate of a stream_scan
+        # pipeline running on `nvna` (added first if it isn't yet)
+        with self._lock:
+            device = next((d for d in self._devices if d.nvna is nvna), None)
+        if device is None:
+            device = self.add(nvna)
+        device.streams[str(name)] = stream
+
+    def render(self):
+        with self._lock:
+            devices = list(self._devices)
+        return render(devices)
+
+    def start(self):
+        # start serving on a daemon thread; returns the bound port
+        if self._server is not None:
+            return self.port
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass                                # keep scrapes out of stderr
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name="nvnapython-metrics", daemon=True)
+        self._thread.start()
+        return self.port
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
@@ -0,0 +1,269 @@
+#! /usr/bin/python3
+
+##------------------------------------------------------------------------------------------------\
+#   nanoVNA_python (nvnapython)
+#   'src/nvnapython/features.py'
+#
+#   Host-side marker and feature search over batches of sweeps.
+#
+#   The device's 'marker' command costs a serial round trip per marker per
+#   sweep and there are only 4 of them. These functions do the same job (and
+#   more) on parsed data, vectorized over a (sweeps x points) matrix: each
+#   search is a handful of NumPy reductions whatever the number of sweeps, and
+#   every result comes back as an array with one entry per sweep.
+#
+#       extremum        min / max in a band, parabolic sub-bin refinement
+#       ndb_bandwidth   N-dB bandwidth around the band's peak (or notch)
+#       zero_crossings  interpolated zero crossings (e.g. of phase)
+#       resonance       resonance frequency, depth and loaded Q
+#       FeatureSet      dozens of named features evaluated in one call, also
+#                       usable as a stream stage
+#
+#   Author(s): Lauren Linkous
+##--------------------------------------------------------------------------------------------------\
+
+import numpy as np
+
+from .metrics import compute_metrics, crossing_edges, interp_crossing
+
+
+def _as_batch(values):
+    values = np.asarray(values)
+    if values.ndim == 1:
+        return values[np.newaxis, :], True
+    if values.ndim != 2:
+        raise ValueError("values must be (points,) or (sweeps, points)")
+    return values, False
+
+
+def _unbatch(out, single):
+    if not single:
+        return out
+    return {k: (v[0].item() if v.ndim == 1 else v[0]) for k, v in out.items()}
+
+
+def band_slice(freq, f_lo=None, f_hi=None):
+    # column slice of `freq` covering [f_lo, f_hi] (None = open)
+    j0 = 0 if f_lo is None else int(np.searchsorted(freq, f_lo, "left"))
+    j1 = len(freq) if f_hi is None else int(np.searchsorted(freq, f_hi, "right"))
+    if j1 <= j0:
+        raise ValueError("no sweep points between " + str(f_lo) + " and " + str(f_hi) + " Hz")
+    return slice(j0, j1)
+
+
+def _refine(freq, values, idx):
+    # Parabolic interpolation through the extreme sample and its neighbours.
+    # Samples on the band edge are returned unrefined.
+    rows = np.arange(values.shape[0])
+    n = values.shape[1]
+    if n < 3:
+        return freq[idx], values[rows, idx]
+    inner = (idx > 0) & (idx < n - 1)
+    i = np.clip(idx, 1, n - 2)
+    y0, y1, y2 = values[rows, i - 1], values[rows, i], values[rows, i + 1]
+    denom = y0 - 2.0 * y1 + y2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d = np.where(denom != 0, 0.5 * (y0 - y2) / denom, 0.0)
+    d = np.clip(d, -0.5, 0.5)
+    step = 0.5 * (freq[i + 1] - freq[i - 1])
+    f = np.where(inner, freq[i] + d * step, freq[idx])
+    v = np.where(inner, y1 - 0.25 * (y0 - y2) * d, values[rows, idx])
+    return f, v
+
+
+def extremum(freq, values, kind="min", f_lo=None, f_hi=None, interpolate=True):
+    """
+    Minimum or maximum of real `values` ((points,) or (sweeps, points), e.g.
+    |S11| in dB) within [f_lo, f_hi].
+
+    Returns a dict of per-sweep arrays: freq, value, index (index into the
+    full sweep). With interpolate=True freq and value are refined between
+    points with a parabola through the three samples around the extreme.
+    """
+    if kind not in ("min", "max"):
+        raise ValueError("kind must be 'min' or 'max'")
+    batch, single = _as_batch(values)
+    freq = np.asarray(freq, dtype=np.float64)
+    band = band_slice(freq, f_lo, f_hi)
+    sub, fsub = batch[:, band], freq[band]
+    idx = np.argmin(sub, axis=1) if kind == "min" else np.argmax(sub, axis=1)
+    if interpolate:
+        f, v = _refine(fsub, sub, idx)
+    else:
+        f, v = fsub[idx], sub[np.arange(sub.shape[0]), idx]
+    return _unbatch({"freq": f, "value": v, "index": idx + band.start}, single)
+
+
+def ndb_bandwidth(freq, values_db, n_db=3.0, kind="max", f_lo=None, f_hi=None):
+    """
+    N-dB bandwidth of the peak (kind='max', e.g. a filter passband in S21 dB)
+    or notch (kind='min', e.g. an S11 match dip) in [f_lo, f_hi].
+
+    Returns per-sweep arrays: center (extreme frequency), f_lo, f_hi and
+    bandwidth, with the edges linearly interpolated. Edges that fall outside
+    the band give NaN.
+    """
+    if kind not in ("min", "max"):
+        raise ValueError("kind must be 'min' or 'max'")
+    batch, single = _as_batch(values_db)
+    freq = np.asarray(freq, dtype=np.float64)
+    band = band_slice(freq, f_lo, f_hi)
+    sub, fsub = batch[:, band], freq[band]
+    rows = np.arange(sub.shape[0])
+    if kind == "max":
+        center = np.argmax(sub, axis=1)
+        level = sub[rows, center] - float(n_db)
+        inside = sub >= level[:, np.newaxis]
+    else:
+        center = np.argmin(sub, axis=1)
+        level = sub[rows, center] + float(n_db)
+        inside = sub <= level[:, np.newaxis]
+    left, right = crossing_edges(inside, center)
+    lo, hi = interp_crossing(fsub, sub, level, left, right)
+    return _unbatch({"center": fsub[center], "f_lo": lo, "f_hi": hi,
+                     "bandwidth": hi - lo}, single)
+
+
+def zero_crossings(freq, values, direction=0, max_step=None, max_count=None):
+    """
+    Interpolated frequencies where real `values` cross zero.
+
+    direction: 0 any, +1 rising only, -1 falling only. max_step ignores sign
+    changes larger than this between neighbouring points -- use 180 for phase
+    in degrees so the +/-180 wrap isn't counted as a crossing.
+
+    Returns (freqs, counts): freqs is (sweeps, K) with each sweep's crossings
+    in frequency order, NaN-padded; K is max_count or the largest count.
+    counts is (sweeps,). For 1D input freqs is (K,) and counts an int.
+    """
+    batch, single = _as_batch(values)
+    freq = np.asarray(freq, dtype=np.float64)
+    a, b = batch[:, :-1], batch[:, 1:]
+    rising = (a <= 0) & (b > 0)
+    falling = (a >= 0) & (b < 0)
+    mask = rising | falling if direction == 0 else (rising if direction > 0 else falling)
+    if max_step is not None:
+        mask &= np.abs(b - a) < max_step
+    counts = mask.sum(axis=1)
+    k = int(counts.max(initial=0)) if max_count is None else int(max_count)
+    out = np.full((batch.shape[0], k), np.nan)
+    rows, cols = np.nonzero(mask)
+    rank = (np.cumsum(mask, axis=1) - 1)[rows, cols]
+    keep = rank < k
+    rows, cols, rank = rows[keep], cols[keep], rank[keep]
+    va, vb = batch[rows, cols], batch[rows, cols + 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(vb != va, -va / (vb - va), 0.0)
+    out[rows, rank] = freq[cols] + t * (freq[cols + 1] - freq[cols])
+    if single:
+        return out[0], int(counts[0])
+    return out, counts
+
+
+def phase_zero_crossings(freq, data, direction=0, max_count=None):
+    # zero crossings of the phase of complex `data` (wraps at +/-180 ignored)
+    return zero_crossings(freq, np.degrees(np.angle(data)), direction, 180.0, max_count)
+
+
+def resonance(freq, data, param="s11", f_lo=None, f_hi=None):
+    """
+    Resonance of complex `data` in [f_lo, f_hi]: the deepest |S11| dip
+    (param 's11') or highest |S21| peak ('s21').
+
+    Returns per-sweep arrays: freq (interpolated), db (|S| at resonance) and
+    loaded_q (resonance frequency / half-power bandwidth, see metrics.py).
+    """
+    batch, single = _as_batch(data)
+    freq = np.asarray(freq, dtype=np.float64)
+    band = band_slice(freq, f_lo, f_hi)
+    m = compute_metrics(freq[band], batch[:, band], ("db", "loaded_q"), param=param)
+    ext = extremum(freq[band], m["db"], "min" if param == "s11" else "max")
+    return _unbatch({"freq": ext["freq"], "db": ext["value"],
+                     "loaded_q": m["loaded_q"]}, single)
+
+
+class FeatureSet:
+    """A named collection of feature searches evaluated together.
+
+        fs = FeatureSet("s21")
+        fs.maximum("peak", 1.40e9, 1.46e9)
+        fs.bandwidth("bw3", 3.0, "max", 1.3e9, 1.6e9)
+        fs.minimum("spur", 2.0e9, 2.2e9)
+        fs.phase_crossings("phase0", max_count=4)
+        out = fs.evaluate(freq, batch)     # {"peak.freq": (sweeps,), ...}
+
+    |S| in dB and the phase are computed at most once per evaluate() and
+    shared by the min/max, bandwidth and crossing searches (a resonance
+    search computes its own metrics over its band). As a stream stage, the
+    results for each sweep (scalars, or a short array for crossings) go to
+    sweep.cache['features'].
+    """
+
+    def __init__(self, param="s11"):
+        self.param = param
+        self._features = []
+
+    def __len__(self):
+        return len(self._features)
+
+    def _add(self, name, search, **args):
+        if any(f[0] == name for f in self._features):
+            raise ValueError("feature '" + str(name) + "' already defined")
+        self._features.append((name, search, args))
+        return self
+
+    def minimum(self, name, f_lo=None, f_hi=None):
+        return self._add(name, "min", f_lo=f_lo, f_hi=f_hi)
+
+    def maximum(self, name, f_lo=None, f_hi=None):
+        return self._add(name, "max", f_lo=f_lo, f_hi=f_hi)
+
+    def bandwidth(self, name, n_db=3.0, kind="max", f_lo=None, f_hi=None):
+        return self._add(name, "bandwidth", n_db=n_db, kind=kind, f_lo=f_lo, f_hi=f_hi)
+
+    def phase_crossings(self, name, direction=0, max_count=4):
+        return self._add(name, "crossings", direction=direction, max_count=max_count)
+
+    def resonance(self, name, f_lo=None, f_hi=None):
+        return self._add(name, "resonance", f_lo=f_lo, f_hi=f_hi)
+
+    def evaluate(self, freq, data):
+        """
+        Evaluate every feature on complex `data` ((points,) or (sweeps,
+        points)). Returns a flat dict "<name>.<field>" -> per-sweep array.
+        """
+        batch, single = _as_batch(data)
+        shared = {}
+
+        def db():
+            if "db" not in shared:
+                shared["db"] = compute_metrics(freq, batch, ("db",))["db"]
+            return shared["db"]
+
+        def phase():
+            if "phase" not in shared:
+                shared["phase"] = np.degrees(np.angle(batch))
+            return shared["phase"]
+
+        out = {}
+        for name, search, args in self._features:
+            if search in ("min", "max"):
+                res = extremum(freq, db(), search, args["f_lo"], args["f_hi"])
+            elif search == "bandwidth":
+                res = ndb_bandwidth(freq, db(), args["n_db"], args["kind"],
+                                    args["f_lo"], args["f_hi"])
+            elif search == "crossings":
+                crossings, counts = zero_crossings(freq, phase(), args["direction"],
+                                                   180.0, args["max_count"])
+                res = {"freq": crossings, "count": counts}
+            else:
+                res = resonance(freq, batch, self.param, args["f_lo"], args["f_hi"])
+            for field, values in res.items():
+                out[name + "." + field] = values
+        return _unbatch(out, single)
+
+    def __call__(self, sweep):
+        data = sweep.get(self.param)
+        if data is not None:
+            sweep.cache.setdefault("features", {}).update(self.evaluate(sweep.freq, data))
+        return sweep
@@ -0,0 +1,197 @@
+#! /usr/bin/python3
+
+##------------------------------------------------------------------------------------------------\
+#   nanoVNA_python (nvnapython)
+#   'src/nvnapython/instrumentation.py'
+#
+#   Per-command latency and byte-count statistics for the serial layer.
+#
+#   With statistics enabled (nanoVNA.enable_serial_stats) every exchange is
+#   split into phases and each phase time goes into a histogram kept per
+#   command (the command's first word, 'cal' with its step, as in
+#   timeouts.command_key):
+#
+#       write       the ser.write() call
+#       first_byte  end of write -> first reply bytes
+#       stream      first byte -> prompt seen (text) / last byte (binary)
+#       settle      prompt seen -> read returned (doubled-prompt settle)
+#       drain       post-read straggler drain
+#       parse       reply text -> SweepResult (scan_sweep, stream_scan)
+#       total       the whole exchange
+#
+#   plus histograms of reply bytes and of read() chunks per reply, and a
+#   count of reads that timed out. That is the data for tuning
+#   serialPollInterval (first_byte and settle are quantized to it) and for
+#   spotting a firmware that has become slower.
+#
+#   Histograms are log-bucketed (BUCKETS_PER_OCTAVE buckets per factor of 2,
+#   so a percentile is good to about 20 %) and take constant memory however
+#   many values they see. With statistics disabled the serial code does a
+#   single None check per exchange and no timing.
+#
+#   Only the standard library is needed.
+#
+#   Author(s): Lauren Linkous
+##--------------------------------------------------------------------------------------------------\
+
+import math
+import threading
+
+from .timeouts import command_key
+
+
+PHASES = ("write", "first_byte", "stream", "settle", "drain", "parse", "total")
+
+BUCKETS_PER_OCTAVE = 4
+
+
+class Histogram:
+    """Log-bucketed histogram of non-negative values.
+
+    Exact count, sum, min and max; percentiles from the buckets (the
+    geometric middle of the bucket the percentile falls in). Zero gets a
+    bucket of its own.
+    """
+
+    __slots__ = ("buckets", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        value = float(value)
+        if value > 0:
+            index = math.floor(math.log2(value) * BUCKETS_PER_OCTAVE)
+        else:
+            index, value = None, 0.0
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def percentile(self, q):
+        # approximate q-th percentile (0..100), or None if empty
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count * q / 100.0))
+        seen = self.buckets.get(None, 0)
+        if seen >= rank:
+            return 0.0
+        for index in sorted(i for i in self.buckets if i is not None):
+            seen += self.buckets[index]
+            if seen >= rank:
+                middle = 2.0 ** ((index + 0.5) / BUCKETS_PER_OCTAVE)
+                return min(max(middle, self.min), self.max)
+        return self.max
+
+    def summary(self):
+        return {"count": self.count, "sum": self.total, "mean": self.mean,
+                "min": self.min, "p50": self.percentile(50), "p90": self.percentile(90),
+                "p99": self.percentile(99), "max": self.max}
+
+
+class CommandStats:
+    # histograms of one command: a Histogram per phase, reply bytes, chunks
+    # per reply, plus call and timeout counts
+
+    def __init__(self):
+        self.phases = {}
+        self.bytes = Histogram()
+        self.chunks = Histogram()
+        self.calls = 0
+        self.timeouts = 0
+
+    def summary(self):
+        out = {"calls": self.calls, "timeouts": self.timeouts,
+               "bytes": self.bytes.summary(), "chunks": self.chunks.summary()}
+        for phase in PHASES:
+            if phase in self.phases:
+                out[phase] = self.phases[phase].summary()
+        return out
+
+
+class SerialStats:
+    """Statistics for every command a nanoVNA sends (see the module header).
+
+        stats = nvna.enable_serial_stats()
+        ...
+        stats.summary()["scan"]["first_byte"]["p90"]    # seconds
+        print(stats.report())
+
+    Safe to record into from the acquisition and parse threads of a
+    stream_scan at the same time.
+    """
+
+    def __init__(self):
+        self.commands = {}
+        self._lock = threading.Lock()
+
+    def _command(self, command):
+        key = command_key(command)
+        stats = self.commands.get(key)
+        if stats is None:
+            stats = self.commands[key] = CommandStats()
+        return stats
+
+    def record(self, command, phases, nbytes=None, chunks=None, timed_out=False):
+        # one finished exchange: phases is {phase name: seconds}
+        with self._lock:
+            stats = self._command(command)
+            stats.calls += 1
+            if timed_out:
+                stats.timeouts += 1
+            for phase, seconds in phases.items():
+                hist = stats.phases.get(phase)
+                if hist is None:
+                    hist = stats.phases[phase] = Histogram()
+                hist.add(seconds)
+            if nbytes is not None:
+                stats.bytes.add(nbytes)
+            if chunks is not None:
+                stats.chunks.add(chunks)
+
+    def record_phase(self, command, phase, seconds):
+        # a phase measured outside the exchange (e.g. parse)
+        with self._lock:
+            stats = self._command(command)
+            hist = stats.phases.get(phase)
+            if hist is None:
+                hist = stats.phases[phase] = Histogram()
+            hist.add(seconds)
+
+    def summary(self):
+        # {command: {calls, timeouts, bytes, chunks, <phase>: {count, sum,
+        #  mean, min, p50, p90, p99, max}}}
+        with self._lock:
+            return {key: stats.summary() for key, stats in sorted(self.commands.items())}
+
+    def reset(self):
+        with self._lock:
+            self.commands.clear()
+
+    def report(self):
+        # plain-text table: one line per command and phase, times in ms
+        lines = ["command     phase        count    p50 ms    p90 ms    p99 ms    max ms"]
+        for key, summary in self.summary().items():
+            for phase in PHASES:
+                if phase not in summary:
+                    continue
+                s = summary[phase]
+                lines.append("%-11s %-11s %6d %9.2f %9.2f %9.2f %9.2f" % (
+                    key[:11], phase, s["count"], s["p50"] * 1e3, s["p90"] * 1e3,
+                    s["p99"] * 1e3, s["max"] * 1e3))
+            lines.append("%-11s %-11s %6d  bytes p50 %d, chunks p50 %d, timeouts %d" % (
+                key[:11], "(reply)", summary["calls"], summary["bytes"]["p50"] or 0,
+                summary["chunks"]["p50"] or 0, summary["timeouts"]))
+        return "\n".join(lines)
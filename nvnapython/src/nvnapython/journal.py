@@ -0,0 +1,212 @@
+#! /usr/bin/python3
+
+##------------------------------------------------------------------------------------------------\
+#   nanoVNA_python (nvnapython)
+#   'src/nvnapython/journal.py'
+#
+#   Checkpoint journal for long segmented / averaged sweeps (wide_scan).
+#
+#   A campaign is a SweepPlan (planner.py) run `averages` times: one unit of
+#   work is one scan of one segment for one repeat. Every unit that comes back
+#   valid is appended to the journal and flushed straight away, so a crash,
+#   USB drop or disconnect() loses at most the scan in flight. Running the
+#   same wide_scan again with the same journal (after reconnecting, or from a
+#   new process) reloads the finished units and scans only the missing ones --
+#   recovery time is proportional to the missing work. A journal whose
+#   campaign is complete gives the result with no scans at all.
+#
+#   FILE LAYOUT (little-endian):
+#       magic 'NVNAJRN1', uint32 header length, JSON header, padding to a
+#       64-byte boundary, then fixed-size records:
+#           segment uint32, repeat uint32, status uint8, timestamp float64,
+#           one complex128 array per S-parameter, padded to the longest
+#           segment
+#
+#   The JSON header holds the plan (start, stop, points, outmask, segments),
+#   the number of averages and the device identity (model, serial). Opening a
+#   journal for a different plan or device raises ValueError -- resuming
+#   someone else's half-finished sweep would silently mix data. As in
+#   archive.py, a torn trailing record from a crash mid-append is dropped.
+#
+#   The segmentation itself comes from the cost model in use when the
+#   campaign started, which a new process may not have (a calibrated model
+#   lives in memory only). journal_plan() rebuilds the SweepPlan from the
+#   header, so wide_scan resumes with the stored segments whenever the sweep
+#   (start, stop, points, outmask) is the same.
+#
+#   Author(s): Lauren Linkous
+##--------------------------------------------------------------------------------------------------\
+
+import json
+import os
+import struct
+
+import numpy as np
+
+from .archive import archive_params
+from .planner import SweepPlan
+
+
+JOURNAL_MAGIC = b"NVNAJRN1"
+JOURNAL_VERSION = 1
+
+_PREFIX = struct.Struct("<8sI")
+_DATA_ALIGN = 64
+
+# record status codes (planner.SEGMENT_STATUS values a valid scan can have)
+_STATUS_CODES = {"ok": 0, "above_ceiling": 1}
+_STATUS_NAMES = {v: k for k, v in _STATUS_CODES.items()}
+
+
+def journal_dtype(max_points, outmask):
+    # NumPy structured dtype of one journal record
+    fields = [("segment", "<u4"), ("repeat", "<u4"), ("status", "u1"),
+              ("timestamp", "<f8")]
+    fields += [(p, "<c16", (int(max_points),)) for p in archive_params(outmask)]
+    return np.dtype(fields)
+
+
+def _identity(plan, averages, model, serial):
+    return {
+        "version": JOURNAL_VERSION,
+        "model": str(model or ""),
+        "serial": str(serial or ""),
+        "start": int(plan.start),
+        "stop": int(plan.stop),
+        "points": int(plan.pts),
+        "outmask": int(plan.outmask),
+        "segments": [[int(a), int(b), int(n)] for a, b, n in plan.segments],
+        "averages": int(averages),
+    }
+
+
+def journal_plan(path, cost):
+    """
+    The SweepPlan stored in the journal at `path` (estimates from `cost`, a
+    SweepCostModel), or None if there is no journal there yet. ValueError if
+    the file isn't a journal.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, "rb") as fh:
+        stored, _ = SweepJournal._read_header(fh)
+    return SweepPlan(stored["start"], stored["stop"], stored["points"], stored["outmask"],
+                     [tuple(s) for s in stored["segments"]], cost)
+
+
+class SweepJournal:
+    """Append-only record of the finished scans of one campaign.
+
+        with SweepJournal("band.nvjr", plan, averages=100,
+                          model="NANOVNA_F_V3", serial=sn) as jr:
+            jr.missing()                   # [(segment, repeat), ...] to do
+            jr.record(seg, rep, sweep)     # after each valid scan
+            jr.units()                     # {(segment, repeat): (status, t, data)}
+
+    Creates the file if it doesn't exist or is empty; otherwise checks the
+    stored plan and device identity match (ValueError if not) and loads the
+    finished units.
+    """
+
+    def __init__(self, path, plan, averages=1, model="", serial=""):
+        self.path = path
+        self.identity = _identity(plan, averages, model, serial)
+        self.params = archive_params(plan.outmask)
+        self.segments = [tuple(s) for s in self.identity["segments"]]
+        self.averages = int(averages)
+        self.max_points = max(n for _, _, n in self.segments)
+        self.record_dtype = journal_dtype(self.max_points, plan.outmask)
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as fh:
+                stored, self.data_offset = self._read_header(fh)
+            if stored != self.identity:
+                raise ValueError("journal " + str(path) + " was written for a different "
+                                 "sweep plan or device")
+            self._fh = open(path, "r+b")
+            size = os.path.getsize(path)
+            whole = (size - self.data_offset) // self.record_dtype.itemsize
+            # drop a torn trailing record left by a crash mid-append
+            self._fh.truncate(self.data_offset + whole * self.record_dtype.itemsize)
+            self._fh.seek(self.data_offset)
+            records = np.frombuffer(self._fh.read(), dtype=self.record_dtype)
+            self._fh.seek(0, os.SEEK_END)
+        else:
+            header = json.dumps(self.identity, sort_keys=True).encode("utf-8")
+            end = _PREFIX.size + len(header)
+            self.data_offset = -(-end // _DATA_ALIGN) * _DATA_ALIGN
+            self._fh = open(path, "wb")
+            self._fh.write(_PREFIX.pack(JOURNAL_MAGIC, len(header)) + header +
+                           bytes(self.data_offset - end))
+            self._fh.flush()
+            records = np.zeros(0, dtype=self.record_dtype)
+
+        self._units = {}
+        for rec in records:
+            self._store(rec)
+        self.resumed = len(self._units)
+        self._record = np.zeros(1, dtype=self.record_dtype)
+
+    @staticmethod
+    def _read_header(fh):
+        prefix = fh.read(_PREFIX.size)
+        if len(prefix) < _PREFIX.size:
+            raise ValueError("not an nvnapython sweep journal")
+        magic, length = _PREFIX.unpack(prefix)
+        if magic != JOURNAL_MAGIC:
+            raise ValueError("not an nvnapython sweep journal")
+        stored = json.loads(fh.read(length).decode("utf-8"))
+        if stored.get("version") != JOURNAL_VERSION:
+            raise ValueError("unsupported sweep journal version " + str(stored.get("version")))
+        end = _PREFIX.size + length
+        return stored, -(-end // _DATA_ALIGN) * _DATA_ALIGN
+
+    def _store(self, rec):
+        seg = int(rec["segment"])
+        n = self.segments[seg][2]
+        data = {p: np.array(rec[p][:n]) for p in self.params}
+        self._units[(seg, int(rec["repeat"]))] = (_STATUS_NAMES[int(rec["status"])],
+                                                  float(rec["timestamp"]), data)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def __len__(self):
+        return len(self._units)
+
+    @property
+    def complete(self):
+        return len(self._units) == len(self.segments) * self.averages
+
+    def missing(self):
+        # (segment, repeat) units not journaled yet, in scan order
+        return [(s, r) for r in range(self.averages) for s in range(len(self.segments))
+                if (s, r) not in self._units]
+
+    def record(self, segment, repeat, sweep, status="ok"):
+        # journal one valid scan of `segment` (a SweepResult) and flush
+        rec = self._record
+        rec[...] = 0
+        rec["segment"] = segment
+        rec["repeat"] = repeat
+        rec["status"] = _STATUS_CODES[status]
+        rec["timestamp"] = sweep.timestamp
+        n = self.segments[segment][2]
+        for p in self.params:
+            rec[p][0, :n] = sweep.get(p)
+        self._fh.write(rec.tobytes())
+        self._fh.flush()
+        self._store(rec[0])
+
+    def units(self):
+        # {(segment, repeat): (status, timestamp, {param: array})}
+        return dict(self._units)
+
+    def close(self):
+        if self._fh is not None and not self._fh.closed:
+            self._fh.flush()
+            self._fh.close()
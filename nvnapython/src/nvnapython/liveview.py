@@ -0,0 +1,309 @@
+#! /usr/bin/python3
+
+##------------------------------------------------------------------------------------------------\
+#   nanoVNA_python (nvnapython)
+#   'src/nvnapython/liveview.py'
+#
+#   Incremental real-time display: latest trace plus a waterfall, drawn with
+#   matplotlib blitting.
+#
+#   WHY IT'S FAST:
+#     * Blitting: the axes, ticks and labels are rendered once and cached as a
+#       background bitmap. Each frame restores that bitmap and redraws only the
+#       trace line and the waterfall image (set_data on existing artists -- no
+#       clear(), no new artists). A full redraw only happens when an axis range
+#       has to change or the window is resized.
+#     * Decimation: the trace is reduced to at most 2 points per horizontal
+#       pixel, keeping each pixel column's min AND max, so narrow nulls and
+#       spikes stay visible while a stitched 20k-point sweep costs the same to
+#       draw as a 201-point one. Waterfall columns are reduced the same way.
+#     * Decoupled rates: sweeps are handed over as a stream stage (any thread)
+#       and only mark the view dirty; a GUI timer redraws at `fps` at most,
+#       skipping frames when nothing new arrived. Acquisition never waits on
+#       the GUI, and a slow GUI just shows fewer intermediate sweeps.
+#
+#   matplotlib is imported only when a figure is attached (the [plotting]
+#   extra); the decimation helpers need only NumPy.
+#
+#   Author(s): Lauren Linkous
+##--------------------------------------------------------------------------------------------------\
+
+import threading
+
+import numpy as np
+
+from .waterfall import WaterfallBuffer, magnitude_db
+
+
+def minmax_decimate(x, y, width):
+    """
+    Reduce (x, y) to at most 2 * width points for display. The points are
+    split into `width` buckets and each bucket keeps its minimum and maximum
+    y (in their original order), so the drawn envelope is unchanged.
+    Inputs with <= 2 * width points are returned as-is.
+    """
+    x, y = np.asarray(x), np.asarray(y)
+    n, width = len(y), max(1, int(width))
+    if n <= 2 * width:
+        return x, y
+    bucket = -(-n // width)
+    width = -(-n // bucket)
+    padded = np.empty(width * bucket, dtype=y.dtype)
+    padded[:n] = y
+    padded[n:] = y[-1]
+    blocks = padded.reshape(width, bucket)
+    lo, hi = np.argmin(blocks, axis=1), np.argmax(blocks, axis=1)
+    base = np.arange(width) * bucket
+    idx = np.empty((width, 2), dtype=np.intp)
+    idx[:, 0] = base + np.minimum(lo, hi)
+    idx[:, 1] = base + np.maximum(lo, hi)
+    idx = np.minimum(idx.ravel(), n - 1)
+    return x[idx], y[idx]
+
+
+def decimate_columns(image, width, reduce="min"):
+    """
+    Reduce the columns of a (rows x points) image to at most `width` by taking
+    the min (default, keeps nulls of a dB trace) or max of each column bucket.
+    """
+    image = np.asarray(image)
+    n, width = image.shape[1], max(1, int(width))
+    if n <= width:
+        return image
+    bucket = -(-n // width)
+    width = -(-n // bucket)
+    pad = width * bucket - n
+    if pad:
+        image = np.concatenate([image, np.repeat(image[:, -1:], pad, axis=1)], axis=1)
+    blocks = image.reshape(image.shape[0], width, bucket)
+    return blocks.min(axis=2) if reduce == "min" else blocks.max(axis=2)
+
+
+class LiveView:
+    """Blitted live trace + waterfall view, fed as a stream stage.
+
+        view = LiveView(history=200, fps=20)
+        view.attach()                              # builds the figure
+        pipe = nvna.stream_scan(start, stop, pts, stages=[view])
+        view.run(pipe)                             # blocks until window closes
+
+    transform maps the sweep's `param` array to the plotted values (default
+    magnitude in dB). ylim / zlim fix the trace and colour ranges; left as
+    None they grow to fit the data (each change costs one full redraw).
+    """
+
+    def __init__(self, history=200, param="s11", transform=magnitude_db,
+                 fps=20, ylim=None, zlim=None, max_width=2000):
+        self.history = int(history)
+        self.param = param
+        self.transform = transform
+        self.fps = float(fps)
+        self.ylim = ylim
+        self.zlim = zlim
+        self.max_width = int(max_width)
+
+        self.sweeps_received = 0
+        self.frames_drawn = 0
+        self.full_redraws = 0
+
+        self._lock = threading.Lock()
+        self._freq = None
+        self._latest = None
+        self._waterfall = None
+        self._dirty = False
+
+        self.fig = None
+        self._ax_trace = None
+        self._ax_wf = None
+        self._line = None
+        self._image = None
+        self._background = None
+        self._timer = None
+        self._fixed_ylim = ylim is not None
+        self._fixed_zlim = zlim is not None
+
+    # ---- data side (any thread) --------------------------------------------------
+
+    def __call__(self, sweep):
+        data = sweep.get(self.param)
+        if data is None:
+            return sweep
+        row = data if self.transform is None else self.transform(data)
+        with self._lock:
+            if self._waterfall is None or self._waterfall.points != len(row) or \
+                    self._freq is None or len(self._freq) != len(row) or \
+                    self._freq[0] != sweep.freq[0] or self._freq[-1] != sweep.freq[-1]:
+                # new sweep plan: start a fresh history
+                self._waterfall = WaterfallBuffer(self.history, len(row))
+                self._freq = np.asarray(sweep.freq, dtype=np.float64)
+            self._waterfall.append(row, sweep.timestamp)
+            self._latest = self._waterfall.latest()
+            self.sweeps_received += 1
+            self._dirty = True
+        return sweep
+
+    def frame_data(self, width=None):
+        """
+        Return (x, y, image) ready to draw at `width` pixel columns: the
+        min/max-decimated latest trace and the column-decimated waterfall
+        (newest row first). None when no sweep has arrived yet. Clears the
+        dirty flag.
+        """
+        width = self.max_width if width is None else min(int(width), self.max_width)
+        with self._lock:
+            if self._latest is None:
+                return None
+            x, y = minmax_decimate(self._freq, self._latest, width)
+            image = decimate_columns(self._waterfall.view(newest_first=True), width)
+            self._dirty = False
+            # decimation copies when it reduces; otherwise copy here so the
+            # GUI never reads rows the acquisition thread is overwriting
+            return np.array(x), np.array(y), np.array(image)
+
+    @property
+    def dirty(self):
+        return self._dirty
+
+    # ---- GUI side (matplotlib thread) ---------------------------------------------
+
+    def attach(self, fig=None):
+        # Build (or take over) a figure with a trace axes above a waterfall
+        # axes, and start the refresh timer. Returns the figure.
+        import matplotlib.pyplot as plt
+
+        if fig is None:
+            fig = plt.figure(figsize=(10, 8))
+        self.fig = fig
+        self._ax_trace = fig.add_subplot(2, 1, 1)
+        self._ax_wf = fig.add_subplot(2, 1, 2)
+        self._ax_trace.set_ylabel("|" + self.param.upper() + "| (dB)"
+                                  if self.transform is magnitude_db else self.param)
+        self._ax_trace.grid(True, alpha=0.3)
+        self._ax_wf.set_xlabel("Frequency (GHz)")
+        self._ax_wf.set_ylabel("sweeps ago")
+        self._line, = self._ax_trace.plot([], [], "b-", linewidth=1.0, animated=True)
+        self._image = self._ax_wf.imshow(np.zeros((1, 1)), aspect="auto",
+                                         origin="upper", cmap="viridis",
+                                         interpolation="nearest", animated=True)
+        if self.ylim is not None:
+            self._ax_trace.set_ylim(*self.ylim)
+        fig.canvas.mpl_connect("draw_event", self._on_draw)
+        self._timer = fig.canvas.new_timer(interval=max(1, int(1000.0 / self.fps)))
+        self._timer.add_callback(self.refresh)
+        self._timer.start()
+        return fig
+
+    def _pixel_width(self):
+        return max(1, int(self._ax_trace.bbox.width))
+
+    def _on_draw(self, _event):
+        # a full draw just happened: re-cache the static background and put
+        # the animated artists back on top
+        canvas = self.fig.canvas
+        self._background = canvas.copy_from_bbox(self.fig.bbox)
+        self._ax_trace.draw_artist(self._line)
+        self._ax_wf.draw_artist(self._image)
+        self.full_redraws += 1
+
+    def _update_limits(self, band, y):
+        # widen axis / colour limits if the data left them; True if changed.
+        # The x limits follow the sweep's band edges, not the decimated trace
+        # (whose first and last samples move with the data)
+        changed = False
+        ghz = (band[0] / 1e9, band[1] / 1e9)
+        if tuple(self._ax_trace.get_xlim()) != ghz:
+            self._ax_trace.set_xlim(*ghz)
+            self._ax_wf.set_xlim(*ghz)
+            changed = True
+        extent = (ghz[0], ghz[1], self.history - 0.5, -0.5)
+        if tuple(self._image.get_extent()) != extent:
+            self._image.set_extent(extent)
+            changed = True
+        finite = y[np.isfinite(y)]
+        if not self._fixed_ylim and finite.size:
+            lo, hi = self._ax_trace.get_ylim() if self.ylim is not None else (np.inf, -np.inf)
+            if finite.min() < lo or finite.max() > hi:
+                pad = 0.05 * max(1.0, float(finite.max() - finite.min()))
+                self.ylim = (min(lo, float(finite.min()) - pad),
+                             max(hi, float(finite.max()) + pad))
+                self._ax_trace.set_ylim(*self.ylim)
+                changed = True
+        if not self._fixed_zlim and finite.size:
+            lo, hi = self.zlim if self.zlim is not None else (np.inf, -np.inf)
+            if finite.min() < lo or finite.max() > hi:
+                self.zlim = (min(lo, float(finite.min())), max(hi, float(finite.max())))
+                changed = True
+        if self.zlim is not None:
+            self._image.set_clim(*self.zlim)
+        return changed
+
+    def refresh(self):
+        # Timer callback: redraw the animated artists if new data arrived.
+        if self.fig is None or not self._dirty:
+            return False
+        frame = self.frame_data(self._pixel_width())
+        if frame is None:
+            return False
+        x, y, image = frame
+        with self._lock:
+            band = (float(self._freq[0]), float(self._freq[-1]))
+        self._line.set_data(x / 1e9, y)
+        padded = np.full((self.history, image.shape[1]), np.nan)
+        padded[:image.shape[0]] = image
+        self._image.set_data(padded)
+
+        canvas = self.fig.canvas
+        if self._update_limits(band, y) or self._background is None:
+            canvas.draw_idle()        # _on_draw re-caches and draws artists
+        else:
+            canvas.restore_region(self._background)
+            self._ax_trace.draw_artist(self._line)
+            self._ax_wf.draw_artist(self._image)
+            canvas.blit(self.fig.bbox)
+            canvas.flush_events()
+        self.frames_drawn += 1
+        return True
+
+    def run(self, source):
+        """
+        Consume `source` (e.g. a stream_scan pipeline with this view as a
+        stage) on a background thread and show the window; blocks until the
+        window is closed, then stops the consumer and closes the source if it
+        has close().
+        """
+        import matplotlib.pyplot as plt
+
+        if self.fig is None:
+            self.attach()
+        worker, stop = self._start_consumer(source)
+        try:
+            plt.show()
+        finally:
+            if self._timer is not None:
+                self._timer.stop()
+            self._stop_consumer(source, worker, stop)
+
+    def _start_consumer(self, source):
+        # drain `source` on a daemon thread until `stop` is set
+        stop = threading.Event()
+
+        def consume():
+            for _sweep in source:
+                if stop.is_set():
+                    break
+
+        worker = threading.Thread(target=consume, name="liveview-source", daemon=True)
+        worker.start()
+        return worker, stop
+
+    def _stop_consumer(self, source, worker, stop, timeout=5.0):
+        # Stop the consumer and let it leave the source's iterator BEFORE the
+        # source is closed, so close() doesn't run while another thread is
+        # inside next(). The consumer notices `stop` at its next sweep; a
+        # source that stays silent for `timeout` is closed anyway (which ends
+        # its iteration) and the consumer is joined again.
+        stop.set()
+        worker.join(timeout)
+        if hasattr(source, "close"):
+            source.close()
+        worker.join(timeout)
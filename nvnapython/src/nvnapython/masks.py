@@ -0,0 +1,272 @@
+#! /usr/bin/python3
+
+##------------------------------------------------------------------------------------------------\
+#   nanoVNA_python (nvnapython)
+#   'src/nvnapython/masks.py'
+#
+#   Limit-line / mask testing for production pass/fail.
+#
+#   A Mask is a set of piecewise-linear upper and lower limit lines, each on a
+#   quantity of one S-parameter (|S11| dB, VSWR, |S21| dB, group delay, ...).
+#
+#   COMPILE ONCE: the first time a mask meets a frequency grid, every limit
+#   line is evaluated onto that grid, giving one upper and one lower limit
+#   array per (parameter, quantity). The compiled arrays are cached per grid,
+#   so every later sweep on the same plan skips the interpolation entirely.
+#
+#   EVALUATE VECTORIZED: a test is then array arithmetic over (sweeps x
+#   points) -- margin = min(upper - value, value - lower) -- reduced to a
+#   per-sweep verdict, margin and worst point. Metric values come from
+#   metrics.py (and its per-sweep cache when testing SweepResults).
+#
+#   A Mask is also a stream stage, so the verdict is in sweep.cache['mask']
+#   as soon as the sweep is parsed.
+#
+#   Author(s): Lauren Linkous
+##--------------------------------------------------------------------------------------------------\
+
+import numpy as np
+
+from .metrics import compute_metrics, sweep_metrics
+from .sweep import grid_key
+
+
+# real-valued quantities a limit line can apply to
+MASK_QUANTITIES = ("mag", "db", "phase", "group_delay", "return_loss", "vswr", "q")
+
+
+class LimitLine:
+    """One piecewise-linear limit.
+
+    points : [(freq_hz, limit), ...] in increasing frequency. Repeating a
+             frequency makes a step; at the step the tighter limit applies.
+    kind   : 'upper' (value must be <= limit) or 'lower' (value >= limit)
+    param  : 's11' or 's21'
+    quantity : one of MASK_QUANTITIES
+
+    Outside the first/last frequency the line does not apply.
+    """
+
+    def __init__(self, points, kind="upper", param="s11", quantity="db"):
+        if kind not in ("upper", "lower"):
+            raise ValueError("kind must be 'upper' or 'lower'")
+        if quantity not in MASK_QUANTITIES:
+            raise ValueError("quantity must be one of " + ", ".join(MASK_QUANTITIES))
+        pts = np.asarray(points, dtype=np.float64)
+        if pts.ndim != 2 or pts.shape[1] != 2 or len(pts) < 1:
+            raise ValueError("points must be a list of (freq, limit) pairs")
+        if np.any(np.diff(pts[:, 0]) < 0):
+            raise ValueError("limit line frequencies must be non-decreasing")
+        self.points = pts
+        self.kind = kind
+        self.param = str(param).lower()
+        self.quantity = quantity
+
+    @property
+    def key(self):
+        return (self.param, self.quantity)
+
+    def on_grid(self, freq):
+        # limit values on `freq`; NaN where the line does not apply
+        out = np.full(len(freq), np.nan)
+        tighter = np.fmin if self.kind == "upper" else np.fmax
+        pts = self.points
+        if len(pts) == 1:
+            out[freq == pts[0, 0]] = pts[0, 1]
+            return out
+        for (f0, v0), (f1, v1) in zip(pts[:-1], pts[1:]):
+            if f1 == f0:
+                cols = freq == f0
+                out[cols] = tighter(out[cols], tighter(v0, v1))
+                continue
+            j0 = int(np.searchsorted(freq, f0, "left"))
+            j1 = int(np.searchsorted(freq, f1, "right"))
+            seg = v0 + (freq[j0:j1] - f0) * ((v1 - v0) / (f1 - f0))
+            out[j0:j1] = tighter(out[j0:j1], seg)
+        return out
+
+
+class MaskResult:
+    """Outcome of a mask test.
+
+    For a batch every attribute is an array with one entry per sweep; for a
+    single sweep they are scalars.
+
+        passed       : bool
+        margin       : smallest distance to any limit (negative = violation)
+        worst_index  : sweep point where that margin occurs (-1 if no limit
+                       applies anywhere on the grid)
+        worst_freq   : its frequency in Hz (NaN if none)
+        worst_limit  : 'param.quantity upper|lower' of the limit involved
+        point_margin : (sweeps, points) margin per point (inf where no limit)
+    """
+
+    def __init__(self, passed, margin, worst_index, worst_freq, worst_limit,
+                 point_margin):
+        self.passed = passed
+        self.margin = margin
+        self.worst_index = worst_index
+        self.worst_freq = worst_freq
+        self.worst_limit = worst_limit
+        self.point_margin = point_margin
+
+    def __bool__(self):
+        return bool(np.all(self.passed))
+
+    def __repr__(self):
+        return ("MaskResult(passed=" + str(self.passed) + ", margin=" +
+                str(self.margin) + ")")
+
+
+class _CompiledMask:
+    # A mask's limits on one frequency grid. Internal to this module.
+
+    def __init__(self, lines, freq):
+        self.freq = freq
+        self.groups = {}          # (param, quantity) -> (upper, lower)
+        for line in lines:
+            upper, lower = self.groups.get(line.key, (None, None))
+            limit = line.on_grid(freq)
+            if line.kind == "upper":
+                base = np.full(len(freq), np.inf) if upper is None else upper
+                upper = np.fmin(base, np.where(np.isnan(limit), np.inf, limit))
+            else:
+                base = np.full(len(freq), -np.inf) if lower is None else lower
+                lower = np.fmax(base, np.where(np.isnan(limit), -np.inf, limit))
+            self.groups[line.key] = (upper, lower)
+        self.labels = []
+        for (param, quantity), (upper, lower) in self.groups.items():
+            for kind, arr in (("upper", upper), ("lower", lower)):
+                if arr is not None:
+                    self.labels.append((param, quantity, kind, arr))
+
+    def evaluate(self, values):
+        # values: (param, quantity) -> (sweeps, points) array
+        n_sweeps = len(next(iter(values.values())))
+        n_pts = len(self.freq)
+        stacked = np.empty((len(self.labels), n_sweeps, n_pts))
+        for i, (param, quantity, kind, limit) in enumerate(self.labels):
+            v = values[(param, quantity)]
+            m = (limit - v) if kind == "upper" else (v - limit)
+            # no limit here -> +inf; a NaN measurement under a limit fails
+            stacked[i] = np.where(np.isfinite(limit),
+                                  np.where(np.isnan(m), -np.inf, m), np.inf)
+        point_margin = stacked.min(axis=0)
+        worst_index = np.argmin(point_margin, axis=1)
+        rows = np.arange(n_sweeps)
+        margin = point_margin[rows, worst_index]
+        which = np.argmin(stacked[:, rows, worst_index], axis=0)
+        names = np.array([p + "." + q + " " + k for p, q, k, _ in self.labels] or [""])
+        limited = margin != np.inf
+        return MaskResult(passed=margin >= 0,
+                          margin=margin,
+                          worst_index=np.where(limited, worst_index, -1),
+                          worst_freq=np.where(limited, self.freq[worst_index], np.nan),
+                          worst_limit=np.where(limited, names[which], ""),
+                          point_margin=point_margin)
+
+
+class Mask:
+    """A named set of limit lines.
+
+        mask = (Mask("bpf-1g4")
+                .upper("s11", "db", [(1.38e9, -10), (1.46e9, -10)])
+                .lower("s21", "db", [(1.40e9, -3), (1.44e9, -3)])
+                .upper("s21", "db", [(1.0e9, -40), (1.2e9, -40)]))
+
+        mask.check(sweep)           # MaskResult for one SweepResult
+        mask.check_batch(sweeps)    # arrays over a list of sweeps
+        nvna.stream_scan(..., stages=[mask])   # verdict in sweep.cache['mask']
+
+    Compiled limits are cached per frequency grid (see compile()).
+    As a stage, `on_fail(sweep, result)` is called for failing sweeps, and
+    the passed / failed counters are kept.
+    """
+
+    def __init__(self, name="mask", lines=(), z0=50.0, on_fail=None):
+        self.name = str(name)
+        self.lines = list(lines)
+        self.z0 = z0
+        self.on_fail = on_fail
+        self.passed = 0
+        self.failed = 0
+        self._compiled = {}
+
+    def add(self, line):
+        self.lines.append(line)
+        self._compiled.clear()
+        return self
+
+    def upper(self, param, quantity, points):
+        return self.add(LimitLine(points, "upper", param, quantity))
+
+    def lower(self, param, quantity, points):
+        return self.add(LimitLine(points, "lower", param, quantity))
+
+    @property
+    def params(self):
+        return tuple(sorted({line.param for line in self.lines}))
+
+    def compile(self, freq):
+        # limits on `freq`, cached per grid
+        freq = np.asarray(freq, dtype=np.float64)
+        key = grid_key(freq)
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            if not self.lines:
+                raise ValueError("mask '" + self.name + "' has no limit lines")
+            compiled = _CompiledMask(self.lines, freq)
+            self._compiled[key] = compiled
+        return compiled
+
+    def evaluate(self, freq, data):
+        """
+        Test raw arrays: data maps param -> (points,) or (sweeps, points)
+        complex array. Returns a MaskResult (scalars for 1D input).
+        """
+        compiled = self.compile(freq)
+        single = False
+        values = {}
+        for param in self.params:
+            arr = np.asarray(data[param])
+            single = arr.ndim == 1
+            quantities = tuple({q for p, q in compiled.groups if p == param})
+            m = compute_metrics(freq, np.atleast_2d(arr), quantities, self.z0, param)
+            values.update({(param, q): m[q] for q in quantities})
+        result = compiled.evaluate(values)
+        return _single(result) if single else result
+
+    def check(self, sweep):
+        # test one SweepResult, reusing (and filling) its metrics cache
+        compiled = self.compile(sweep.freq)
+        values = {}
+        for param, quantity in compiled.groups:
+            if sweep.get(param) is None:
+                raise ValueError("sweep has no " + param + " data for mask '" +
+                                 self.name + "'")
+            m = sweep_metrics(sweep, (quantity,), param, self.z0)
+            values[(param, quantity)] = m[quantity][np.newaxis, :]
+        return _single(compiled.evaluate(values))
+
+    def check_batch(self, sweeps):
+        # test a list of SweepResults that share one frequency grid
+        data = {p: np.vstack([s.get(p) for s in sweeps]) for p in self.params}
+        return self.evaluate(sweeps[0].freq, data)
+
+    def __call__(self, sweep):
+        result = self.check(sweep)
+        sweep.cache.setdefault("mask", {})[self.name] = result
+        if result.passed:
+            self.passed += 1
+        else:
+            self.failed += 1
+            if self.on_fail is not None:
+                self.on_fail(sweep, result)
+        return sweep
+
+
+def _single(result):
+    # batch-of-one MaskResult -> scalar fields
+    return MaskResult(bool(result.passed[0]), float(result.margin[0]),
+                      int(result.worst_index[0]), float(result.worst_freq[0]),
+                      str(result.worst_limit[0]), result.point_margin[0])
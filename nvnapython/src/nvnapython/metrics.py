@@ -0,0 +1,246 @@
+#! /usr/bin/python3
+
+##------------------------------------------------------------------------------------------------\
+#   nanoVNA_python (nvnapython)
+#   'src/nvnapython/metrics.py'
+#
+#   Batched derived metrics for S-parameter sweeps.
+#
+#   Everything works on a (sweeps x points) complex matrix (a single sweep is
+#   treated as one row), so a thousand sweeps cost one NumPy call per metric,
+#   not a thousand Python loops. Metrics are evaluated lazily through a small
+#   dependency graph and every intermediate is computed at most once per call:
+#   asking for db, return_loss and vswr computes |S| once; z, y and q share
+#   one impedance computation; group_delay reuses the unwrapped phase.
+#
+#   Available metrics (shape (sweeps, points) unless noted):
+#       mag          |S|
+#       db           20*log10|S|   (exact zeros floored at -240 dB)
+#       phase        angle in degrees
+#       phase_unwrap angle in radians, unwrapped along frequency
+#       group_delay  -d(phase)/d(omega) in seconds
+#       return_loss  -db           (reflection)
+#       vswr         (1+|S|)/(1-|S|), inf for |S| >= 1   (reflection)
+#       z            complex impedance z0*(1+S)/(1-S)    (reflection)
+#       y            complex admittance 1/z              (reflection)
+#       q            per-point |X|/R of z                (reflection)
+#       loaded_q     (sweeps,) f0 / half-power bandwidth of the resonance
+#                    (deepest |S| dip for s11, highest peak for s21)
+#
+#   Author(s): Lauren Linkous
+##--------------------------------------------------------------------------------------------------\
+
+import numpy as np
+
+from .sweep import stack_sweeps
+
+
+METRICS = ("mag", "db", "phase", "phase_unwrap", "group_delay", "return_loss",
+           "vswr", "z", "y", "q", "loaded_q")
+
+
+def _as_batch(data):
+    # (points,) or (sweeps, points) -> 2D complex array and whether it was 1D
+    data = np.asarray(data)
+    if data.ndim == 1:
+        return data[np.newaxis, :], True
+    if data.ndim != 2:
+        raise ValueError("data must be (points,) or (sweeps, points)")
+    return data, False
+
+
+def crossing_edges(inside, center):
+    """
+    For each row of the boolean (sweeps, points) array `inside`, find the
+    contiguous run of True around column `center[row]`. Returns (left, right):
+    the last False column left of the run and the first False column right of
+    it, or -1 / points when the run reaches the edge of the sweep.
+    """
+    cols = np.arange(inside.shape[1])
+    center = np.asarray(center)[:, np.newaxis]
+    outside = ~inside
+    left = np.where(outside & (cols < center), cols, -1).max(axis=1)
+    right = np.where(outside & (cols > center), cols, inside.shape[1]).min(axis=1)
+    return left, right
+
+
+def interp_crossing(freq, values, level, left, right):
+    """
+    Linearly interpolated frequency where each row of `values` crosses
+    `level` (per row) between columns (left, left+1) and (right-1, right).
+    Rows whose edge is missing (-1 / points) give NaN.
+    """
+    n_rows, n_pts = values.shape
+    rows = np.arange(n_rows)
+    level = np.broadcast_to(level, (n_rows,))
+
+    def at(i0, i1):
+        ok = (i0 >= 0) & (i1 < n_pts)
+        a = np.clip(i0, 0, n_pts - 1)
+        b = np.clip(i1, 0, n_pts - 1)
+        va, vb = values[rows, a], values[rows, b]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.where(vb != va, (level - va) / (vb - va), 0.0)
+        f = freq[a] + np.clip(t, 0.0, 1.0) * (freq[b] - freq[a])
+        return np.where(ok, f, np.nan)
+
+    return at(left, left + 1), at(right - 1, right)
+
+
+class _Evaluator:
+    # Lazy, memoized metric graph over one batch. Internal to this module.
+
+    def __init__(self, freq, data, z0, param):
+        self.freq = np.asarray(freq, dtype=np.float64)
+        self.data = data
+        self.z0 = float(z0)
+        self.param = param
+        self.values = {}
+
+    def get(self, name):
+        if name not in self.values:
+            if name not in METRICS and name not in ("power",):
+                raise ValueError("unknown metric '" + str(name) + "'; choose from " +
+                                 ", ".join(METRICS))
+            self.values[name] = getattr(self, "_" + name)()
+        return self.values[name]
+
+    def _mag(self):
+        return np.abs(self.data)
+
+    def _power(self):
+        mag = self.get("mag")
+        return mag * mag
+
+    def _db(self):
+        # zeros floor at -240 dB; NaN (bad sample) stays NaN
+        mag = self.get("mag")
+        with np.errstate(divide="ignore"):
+            return np.where(mag == 0, -240.0, 20.0 * np.log10(mag))
+
+    def _return_loss(self):
+        return -self.get("db")
+
+    def _phase(self):
+        return np.degrees(np.angle(self.data))
+
+    def _phase_unwrap(self):
+        return np.unwrap(np.angle(self.data), axis=1)
+
+    def _group_delay(self):
+        if self.data.shape[1] < 2:
+            return np.full(self.data.shape, np.nan)
+        omega = 2.0 * np.pi * self.freq
+        return -np.gradient(self.get("phase_unwrap"), omega, axis=1)
+
+    def _vswr(self):
+        mag = self.get("mag")
+        with np.errstate(divide="ignore"):
+            return np.where(mag < 1.0, (1.0 + mag) / (1.0 - np.minimum(mag, 1.0)), np.inf)
+
+    def _z(self):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.z0 * (1.0 + self.data) / (1.0 - self.data)
+
+    def _y(self):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return 1.0 / self.get("z")
+
+    def _q(self):
+        z = self.get("z")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.abs(z.imag) / z.real
+
+    def _loaded_q(self):
+        # half-power bandwidth around the resonance, vectorized over rows
+        power = self.get("power")
+        rows = np.arange(power.shape[0])
+        if self.param == "s21":
+            center = np.argmax(power, axis=1)
+            level = power[rows, center] / 2.0
+            inside = power >= level[:, np.newaxis]
+        else:
+            # reflection: half of the absorbed power 1-|S|^2 at the dip
+            center = np.argmin(power, axis=1)
+            level = (1.0 + power[rows, center]) / 2.0
+            inside = power <= level[:, np.newaxis]
+        left, right = crossing_edges(inside, center)
+        f_lo, f_hi = interp_crossing(self.freq, power, level, left, right)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.freq[center] / (f_hi - f_lo)
+
+
+def compute_metrics(freq, data, metrics=None, z0=50.0, param="s11"):
+    """
+    Compute `metrics` (names from METRICS, default all) for `data`, a
+    (points,) or (sweeps, points) complex array on the frequency grid `freq`.
+    `param` tells loaded_q whether the data is a reflection ('s11') or a
+    transmission ('s21') measurement.
+
+    Returns a dict name -> array. 1D input gives 1D results (loaded_q a float).
+    """
+    batch, single = _as_batch(data)
+    if batch.shape[1] != len(freq):
+        raise ValueError("data has " + str(batch.shape[1]) + " points but freq has " +
+                         str(len(freq)))
+    ev = _Evaluator(freq, batch, z0, param)
+    out = {name: ev.get(name) for name in (METRICS if metrics is None else metrics)}
+    if single:
+        out = {k: (v[0] if v.ndim == 2 else float(v[0])) for k, v in out.items()}
+    return out
+
+
+def _cache_slot(sweep, param, z0):
+    return sweep.cache.setdefault("metrics", {}).setdefault((param, float(z0)), {})
+
+
+def sweep_metrics(sweep, metrics=None, param="s11", z0=50.0):
+    """
+    Metrics for one SweepResult, cached in sweep.cache['metrics'][(param, z0)]
+    so later calls (and later stream stages) only compute what's missing.
+    """
+    names = METRICS if metrics is None else tuple(metrics)
+    slot = _cache_slot(sweep, param, z0)
+    missing = [n for n in names if n not in slot]
+    if missing:
+        slot.update(compute_metrics(sweep.freq, sweep.get(param), missing, z0, param))
+    return {n: slot[n] for n in names}
+
+
+def batch_metrics(sweeps, metrics=None, param="s11", z0=50.0, cache=True):
+    """
+    Metrics for a list of SweepResults sharing one frequency grid, computed
+    in one batched pass. Returns a dict name -> (sweeps, points) array (or
+    (sweeps,) for loaded_q). With cache=True each sweep's cache also gets its
+    row (a view into the batch result, no copy).
+    """
+    out = compute_metrics(sweeps[0].freq, stack_sweeps(sweeps, param), metrics,
+                          z0, param)
+    if cache:
+        for i, sweep in enumerate(sweeps):
+            slot = _cache_slot(sweep, param, z0)
+            for name, values in out.items():
+                slot.setdefault(name, values[i] if values.ndim == 2 else float(values[i]))
+    return out
+
+
+class MetricsStage:
+    """Stream stage that computes metrics for every sweep into its cache.
+
+        stage = MetricsStage(("vswr", "return_loss"))
+        for sweep in nvna.stream_scan(..., stages=[stage]):
+            sweep.cache["metrics"][("s11", 50.0)]["vswr"]
+    """
+
+    def __init__(self, metrics=None, param="s11", z0=50.0):
+        self.metrics = METRICS if metrics is None else tuple(metrics)
+        for name in self.metrics:
+            if name not in METRICS:
+                raise ValueError("unknown metric '" + str(name) + "'")
+        self.param = param
+        self.z0 = z0
+
+    def __call__(self, sweep):
+        if sweep.get(self.param) is not None:
+            sweep_metrics(sweep, self.metrics, self.param, self.z0)
+        return sweep
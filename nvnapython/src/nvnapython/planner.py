@@ -0,0 +1,295 @@
+#! /usr/bin/python3
+
+##------------------------------------------------------------------------------------------------\
+#   nanoVNA_python (nvnapython)
+#   'src/nvnapython/planner.py'
+#
+#   Cost-model sweep planner for wide, segmented scans.
+#
+#   One 'scan' can return at most maxPoints points (201 on the F V2, 801 on
+#   the F V3, 101 on the H4), so a sweep with more resolution than that is
+#   split into segments. Each segment pays a fixed per-command overhead
+#   (command echo, prompt wait, parse call) on top of the per-point device
+#   sweep time and the per-value transfer/parse time:
+#
+#       scan_time(pts, outmask) = overhead_s + pts * (point_s + values * value_s)
+#
+#   where values is the number of columns the outmask returns (1 for the
+#   frequency, 2 per S-parameter). For that model the wall time of a sweep
+#   with `pts` points in `segs` segments is
+#
+#       segs * overhead_s + pts * (point_s + values * value_s)
+#
+#   A reply can also come back corrupted and have to be re-requested. With a
+#   per-point error rate point_error (the chance that any one point spoils
+#   its scan), an n-point scan succeeds with probability (1 - point_error)^n,
+#   so its expected cost including retries is
+#
+#       expected_scan_time(n) = scan_time(n) / (1 - point_error)^n
+#
+#   Fewer, longer segments save per-scan overhead; more, shorter ones lose
+#   less work to each retry. The planner picks the cheapest outmask that
+#   returns the requested parameters (both in one scan, never the frequency
+#   column -- the grid is known), then the segment count with the lowest
+#   expected wall time, with the points spread evenly over the segments so
+#   there is no short tail segment. With point_error 0 (the default) that is
+#   the fewest segments that fit. The plan's estimate is the same expected
+#   wall time.
+#
+#   Default costs come from the constants.MODELS entry (point_error 0); a
+#   SweepCostModel fitted to timed scans on the connected unit
+#   (nanoVNA.calibrate_sweep_costs, which also estimates point_error from the
+#   scans that failed to parse) is cached per device serial for the rest of
+#   the session.
+#
+#   PARTIAL RETRY: nanoVNA.wide_scan validates every segment on its own
+#   (check_segment: line count and numeric parse via parse_scan, then all-zero
+#   samples) and re-requests only the segments that failed, so one bad reply
+#   in a 50-segment sweep costs one segment, not the sweep. Each segment's
+#   outcome is one of SEGMENT_STATUS:
+#
+#       ok             valid on the first try
+#       retried        valid after one or more retries
+#       above_ceiling  valid, but all-zero samples above the model's max
+#                      frequency (the F V3 returns zeros above ~6 GHz) were
+#                      replaced with NaN; retrying would not change them
+#       failed         still invalid after every retry; its points are NaN
+#
+#   Author(s): Lauren Linkous
+##--------------------------------------------------------------------------------------------------\
+
+import math
+
+import numpy as np
+
+from .sweep import (
+    OUTMASK_FREQ,
+    OUTMASK_S11,
+    OUTMASK_S21,
+    SweepResult,
+    outmask_columns,
+    sweep_frequencies,
+    zero_samples,
+)
+
+
+_PARAM_BITS = {"s11": OUTMASK_S11, "s21": OUTMASK_S21}
+
+SEGMENT_STATUS = ("ok", "retried", "above_ceiling", "failed")
+
+# calibrated cost models: (model name, serial number) -> SweepCostModel
+_COST_MODELS = {}
+
+
+def outmask_for(params, freq=False):
+    # smallest scan outmask returning `params` ('s11' / 's21'), plus the
+    # frequency column only if asked for
+    mask = OUTMASK_FREQ if freq else 0
+    for param in params:
+        bit = _PARAM_BITS.get(str(param).lower())
+        if bit is None:
+            raise ValueError("unknown parameter '" + str(param) + "'; choose s11 or s21")
+        mask |= bit
+    if mask == 0:
+        raise ValueError("at least one of s11 / s21 (or freq) must be requested")
+    return mask
+
+
+class SweepCostModel:
+    """Wall-time model of one 'scan' command (see the module header).
+
+        cost = SweepCostModel.from_model(MODELS["NANOVNA_F_V3"])
+        cost.scan_time(801, 2)         # seconds for one 801-point S11 scan
+
+    source records where the numbers came from ('defaults' or 'measured').
+    point_error is the per-point chance of a corrupted reply (0..1).
+    """
+
+    def __init__(self, overhead_s, point_s, value_s, source="defaults",
+                 point_error=0.0):
+        self.overhead_s = float(overhead_s)
+        self.point_s = float(point_s)
+        self.value_s = float(value_s)
+        self.source = source
+        self.point_error = min(max(float(point_error), 0.0), 1.0)
+
+    def __repr__(self):
+        return ("SweepCostModel(overhead_s=" + format(self.overhead_s, ".4g") +
+                ", point_s=" + format(self.point_s, ".4g") +
+                ", value_s=" + format(self.value_s, ".4g") +
+                (", point_error=" + format(self.point_error, ".3g")
+                 if self.point_error else "") + ", " + self.source + ")")
+
+    def scan_time(self, pts, outmask):
+        return self.overhead_s + int(pts) * (self.point_s +
+                                             outmask_columns(outmask) * self.value_s)
+
+    def expected_scan_time(self, pts, outmask):
+        # scan_time including the expected retries; pts may be an array
+        pts = np.asarray(pts, dtype=np.float64)
+        once = self.overhead_s + pts * (self.point_s + outmask_columns(outmask) * self.value_s)
+        if not self.point_error:
+            return once
+        with np.errstate(divide="ignore", over="ignore"):
+            return once / (1.0 - self.point_error) ** pts
+
+    @classmethod
+    def from_model(cls, model_dict):
+        # defaults from a constants.MODELS entry
+        return cls(model_dict["scan_overhead_s"], model_dict["scan_point_s"],
+                   model_dict["scan_value_s"], "defaults")
+
+    @classmethod
+    def fit(cls, samples, fallback):
+        """
+        Least-squares fit to timed scans, samples = [(pts, outmask, seconds)].
+        Separating all three costs needs at least two point counts and two
+        outmasks; with less, `fallback` (a SweepCostModel) is scaled to match
+        the measured total instead. Negative fitted costs are clamped to 0.
+        """
+        if not samples:
+            raise ValueError("no timed scans to fit")
+        pts = np.array([s[0] for s in samples], dtype=np.float64)
+        values = np.array([outmask_columns(s[1]) for s in samples], dtype=np.float64)
+        seconds = np.array([s[2] for s in samples], dtype=np.float64)
+        design = np.column_stack([np.ones_like(pts), pts, pts * values])
+        if np.linalg.matrix_rank(design) == 3:
+            coef = np.clip(np.linalg.lstsq(design, seconds, rcond=None)[0], 0.0, None)
+            return cls(coef[0], coef[1], coef[2], "measured")
+        predicted = sum(fallback.scan_time(s[0], s[1]) for s in samples)
+        k = seconds.sum() / predicted
+        return cls(fallback.overhead_s * k, fallback.point_s * k,
+                   fallback.value_s * k, "measured")
+
+
+def point_error_rate(outcomes):
+    # per-point error rate from [(pts, ok)] scan outcomes: failed scans per
+    # point scanned (the small-rate estimate of point_error)
+    points = sum(int(pts) for pts, _ in outcomes)
+    failed = sum(1 for _, ok in outcomes if not ok)
+    return failed / float(points) if points else 0.0
+
+
+def cached_cost_model(model, serial):
+    # calibrated SweepCostModel for this device, or None
+    return _COST_MODELS.get((str(model), str(serial)))
+
+
+def remember_cost_model(model, serial, cost):
+    _COST_MODELS[(str(model), str(serial))] = cost
+
+
+class SweepPlan:
+    """A segmented sweep: `pts` points from start to stop, as `segments`
+    [(start_hz, stop_hz, points), ...] scanned with `outmask`. estimate_s is
+    the cost model's expected wall time, retries included.
+
+    Segment edges sit on the overall linear grid, rounded to whole Hz (the
+    device takes integer frequencies).
+    """
+
+    def __init__(self, start, stop, pts, outmask, segments, cost):
+        self.start = start
+        self.stop = stop
+        self.pts = pts
+        self.outmask = outmask
+        self.segments = segments
+        self.cost = cost
+        self.estimate_s = float(sum(cost.expected_scan_time(n, outmask)
+                                    for _, _, n in segments))
+
+    def __len__(self):
+        return len(self.segments)
+
+    def __iter__(self):
+        return iter(self.segments)
+
+    def __repr__(self):
+        return ("SweepPlan(" + str(self.pts) + " pts in " + str(len(self.segments)) +
+                " x <=" + str(max(n for _, _, n in self.segments)) + ", outmask " +
+                str(self.outmask) + ", ~" + format(self.estimate_s, ".2f") + " s)")
+
+
+def plan_sweep(start, stop, pts=None, resolution_hz=None, params=("s11",),
+               max_points=201, cost=None, min_points=2):
+    """
+    Plan a sweep of start..stop Hz with `pts` points in total, or with a step
+    of at most `resolution_hz`. max_points is the largest valid point count
+    for one scan; min_points the smallest. cost defaults to the F V2 model
+    defaults; the segment count is the one with the lowest expected wall
+    time under it (module header). Returns a SweepPlan.
+    """
+    start, stop = int(start), int(stop)
+    if start >= stop:
+        raise ValueError("start must be less than stop")
+    if (pts is None) == (resolution_hz is None):
+        raise ValueError("give exactly one of pts and resolution_hz")
+    if pts is None:
+        if resolution_hz <= 0:
+            raise ValueError("resolution_hz must be positive")
+        pts = int(math.ceil((stop - start) / float(resolution_hz))) + 1
+    pts = int(pts)
+    max_points = int(max_points)
+    if pts < min_points or max_points < min_points:
+        raise ValueError("pts must be at least " + str(min_points))
+    if (stop - start) < pts - 1:
+        raise ValueError("resolution finer than 1 Hz: at most " + str(stop - start + 1) +
+                         " points between " + str(start) + " and " + str(stop))
+    if cost is None:
+        from .constants import MODELS, DEFAULT_MODEL
+        cost = SweepCostModel.from_model(MODELS[DEFAULT_MODEL])
+    outmask = outmask_for(params)
+
+    # cheapest segment count from the fewest that fit to the most that keep
+    # min_points each, points spread evenly (see module header)
+    counts = np.arange(int(math.ceil(pts / float(max_points))), pts // min_points + 1)
+    if not len(counts):
+        raise ValueError("cannot split " + str(pts) + " points into segments of " +
+                         str(min_points) + ".." + str(max_points))
+    bases, extras = np.divmod(pts, counts)
+    totals = (extras * cost.expected_scan_time(bases + 1, outmask) +
+              (counts - extras) * cost.expected_scan_time(bases, outmask))
+    segs = int(counts[np.argmin(totals)])            # ties go to fewer segments
+    base, extra = divmod(pts, segs)
+    grid = np.linspace(start, stop, pts)
+    segments = []
+    first = 0
+    for i in range(segs):
+        n = base + (1 if i < extra else 0)
+        last = first + n - 1
+        segments.append((int(round(grid[first])), int(round(grid[last])), n))
+        first = last + 1
+    return SweepPlan(start, stop, pts, outmask, segments, cost)
+
+
+def check_segment(sweep, ceiling_hz=None):
+    """
+    Validate one parsed segment (None = the reply failed parse_scan).
+
+    Returns 'malformed' or 'zero' (all-zero samples at or below `ceiling_hz`)
+    for a segment worth retrying, else 'ok' or 'above_ceiling'. In the
+    'above_ceiling' case the zero samples above the ceiling are set to NaN
+    in place, so they can't pass for a perfect match downstream.
+    """
+    if sweep is None:
+        return "malformed"
+    zero = zero_samples(sweep)
+    if not zero.any():
+        return "ok"
+    above = zero if ceiling_hz is None else zero & (sweep.freq > ceiling_hz)
+    if ceiling_hz is None or (zero & ~above).any():
+        return "zero"
+    for param in ("s11", "s21"):
+        data = sweep.get(param)
+        if data is not None:
+            data[above] = np.nan
+    return "above_ceiling"
+
+
+def failed_segment(start, stop, pts, outmask):
+    # NaN stand-in for a segment that never came back valid
+    freq = sweep_frequencies(start, stop, pts)
+    nan = np.full(len(freq), np.nan + 1j * np.nan)
+    return SweepResult(freq, s11=nan.copy() if outmask & OUTMASK_S11 else None,
+                       s21=nan.copy() if outmask & OUTMASK_S21 else None,
+                       start=start, stop=stop, points=pts, outmask=outmask)
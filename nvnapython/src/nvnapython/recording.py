@@ -0,0 +1,252 @@
+#! /usr/bin/python3
+
+##------------------------------------------------------------------------------------------------\
+#   nanoVNA_python (nvnapython)
+#   'src/nvnapython/recording.py'
+#
+#   Record and replay of the serial traffic with a device.
+#
+#   RecordingPort wraps the open serial port and logs every write and every
+#   non-empty read chunk, with its time, to a compact binary file. ReplayPort
+#   reads that file back as a stand-in port: each write releases the reply
+#   chunks recorded after the matching write, one chunk per read() -- the
+#   same chunking the library saw -- either at the recorded times (realtime,
+#   optionally scaled by `speed`) or as fast as the library asks for them.
+#   A problem seen in the field can then be reproduced and benchmarked on a
+#   dev machine without the instrument, through the normal nanoVNA calls:
+#
+#       nvna.start_recording("rig7.nvrec")       # on site
+#       ... the failing acquisition ...
+#       nvna.stop_recording()
+#
+#       nvna.replay("rig7.nvrec", realtime=False)   # later, no device
+#       ... the same acquisition ...
+#
+#   FILE LAYOUT (little-endian): magic 'NVNAREC1', then one record per event:
+#       kind uint8 ('w' write / 'r' read), time float64 (seconds since the
+#       recording started), length uint32, then the bytes
+#
+#   A replay is only faithful while the library sends the same commands in
+#   the same order; ReplayPort checks each write against the recording
+#   (strict=True raises ValueError on the first difference, otherwise it is
+#   counted in .mismatches and the replay carries on).
+#
+#   Only the standard library is needed.
+#
+#   Author(s): Lauren Linkous
+##--------------------------------------------------------------------------------------------------\
+
+import struct
+import time
+
+
+RECORDING_MAGIC = b"NVNAREC1"
+
+_EVENT = struct.Struct("<cdI")
+
+WRITE = b"w"
+READ = b"r"
+
+
+def load_recording(path):
+    # [(kind, seconds, data)] of a recording file; a torn final event from a
+    # crash mid-write is dropped
+    with open(path, "rb") as fh:
+        blob = fh.read()
+    if blob[:len(RECORDING_MAGIC)] != RECORDING_MAGIC:
+        raise ValueError(str(path) + " is not an nvnapython serial recording")
+    events = []
+    offset = len(RECORDING_MAGIC)
+    while offset + _EVENT.size <= len(blob):
+        kind, t, length = _EVENT.unpack_from(blob, offset)
+        start = offset + _EVENT.size
+        if start + length > len(blob):
+            break
+        events.append((kind, t, blob[start:start + length]))
+        offset = start + length
+    return events
+
+
+class RecordingPort:
+    """A serial port wrapper that logs the traffic to `path`.
+
+    Everything not logged (is_open, port, timeout, ...) is passed through to
+    the wrapped port. close() closes the recording AND the port; detach()
+    closes only the recording and returns the port.
+    """
+
+    def __init__(self, port, path):
+        self.__dict__["_port"] = port
+        self._fh = open(path, "wb")
+        self._fh.write(RECORDING_MAGIC)
+        self._t0 = time.time()
+        self.events = 0
+
+    def __getattr__(self, name):
+        return getattr(self._port, name)
+
+    def __setattr__(self, name, value):
+        if name in ("_fh", "_t0", "events"):
+            self.__dict__[name] = value
+        else:
+            setattr(self._port, name, value)
+
+    def _log(self, kind, data):
+        if data and not self._fh.closed:
+            self._fh.write(_EVENT.pack(kind, time.time() - self._t0, len(data)) + bytes(data))
+            self.events += 1
+
+    @property
+    def in_waiting(self):
+        return self._port.in_waiting
+
+    def write(self, data):
+        self._log(WRITE, data)
+        self._fh.flush()                    # one flush per command, not per chunk
+        return self._port.write(data)
+
+    def read(self, size=1):
+        data = self._port.read(size)
+        self._log(READ, data)
+        return data
+
+    def read_until(self, expected=b"\n", size=None):
+        data = self._port.read_until(expected, size)
+        self._log(READ, data)
+        return data
+
+    def readline(self):
+        data = self._port.readline()
+        self._log(READ, data)
+        return data
+
+    def reset_input_buffer(self):
+        self._port.reset_input_buffer()
+
+    def reset_output_buffer(self):
+        self._port.reset_output_buffer()
+
+    def detach(self):
+        if not self._fh.closed:
+            self._fh.close()
+        return self._port
+
+    def close(self):
+        self.detach()
+        self._port.close()
+
+
+class ReplayPort:
+    """A stand-in serial port that plays back a recording (module header).
+
+    realtime=True releases each reply chunk at its recorded delay after the
+    write (divided by `speed`); realtime=False releases all of a write's
+    reply chunks at once. Either way each read() returns one recorded chunk.
+
+    Counters: replayed (writes matched to the recording), mismatches,
+    and .exhausted once every recorded write has been used.
+    """
+
+    def __init__(self, path, realtime=True, speed=1.0, strict=False):
+        if speed <= 0:
+            raise ValueError("speed must be positive")
+        self.events = load_recording(path)
+        self.realtime = realtime
+        self.speed = float(speed)
+        self.strict = strict
+        self.is_open = True
+        self.port = "REPLAY:" + str(path)
+        self.timeout = 1
+        self.replayed = 0
+        self.mismatches = 0
+        self._next = 0                       # index of the next unused event
+        self._scheduled = []                 # [(release time, chunk)]
+        self._chunk = b""
+        self._t_write = time.time()
+        self._release_reads(0.0)             # chunks recorded before any write
+
+    @property
+    def exhausted(self):
+        return not any(kind == WRITE for kind, _, _ in self.events[self._next:])
+
+    def _release_reads(self, t_write):
+        # schedule the read events up to the next write, relative to a write
+        # recorded at t_write and sent (now) at self._t_write
+        while self._next < len(self.events) and self.events[self._next][0] == READ:
+            _, t, data = self.events[self._next]
+            delay = (t - t_write) / self.speed if self.realtime else 0.0
+            self._scheduled.append((self._t_write + max(delay, 0.0), data))
+            self._next += 1
+
+    def _ready(self):
+        # make the next due chunk current
+        if not self._chunk and self._scheduled and time.time() >= self._scheduled[0][0]:
+            self._chunk = self._scheduled.pop(0)[1]
+
+    @property
+    def in_waiting(self):
+        self._ready()
+        return len(self._chunk)
+
+    def read(self, size=1):
+        out = b""
+        while len(out) < size:
+            self._ready()
+            if not self._chunk:
+                break
+            take = size - len(out)
+            out += self._chunk[:take]
+            self._chunk = self._chunk[take:]
+        return out
+
+    def read_until(self, expected=b"\n", size=None):
+        out = b""
+        while not out.endswith(expected) and (size is None or len(out) < size):
+            byte = self.read(1)
+            if not byte:
+                break
+            out += byte
+        return out
+
+    def readline(self):
+        return self.read_until(b"\n")
+
+    def write(self, data):
+        data = bytes(data)
+        while self._next < len(self.events) and self.events[self._next][0] != WRITE:
+            self._next += 1
+        if self._next >= len(self.events):
+            self.mismatches += 1
+            if self.strict:
+                raise ValueError("replay exhausted; unexpected write " + repr(data))
+            return len(data)
+        _, t, recorded = self.events[self._next]
+        if recorded != data:
+            self.mismatches += 1
+            if self.strict:
+                raise ValueError("replay expected " + repr(recorded) + ", got " + repr(data))
+        self._next += 1
+        self.replayed += 1
+        self._t_write = time.time()
+        self._release_reads(t)
+        return len(data)
+
+    def reset_input_buffer(self):
+        # drop what is already due; chunks still "in flight" are kept, as on
+        # a real port
+        self._ready()
+        self._chunk = b""
+        now = time.time()
+        self._scheduled = [(at, data) for at, data in self._scheduled if at > now]
+
+    def reset_output_buffer(self):
+        pass
+
+    def flush(self):
+        pass
+
+    def open(self):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
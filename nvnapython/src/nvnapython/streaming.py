@@ -0,0 +1,231 @@
+#! /usr/bin/python3
+
+##------------------------------------------------------------------------------------------------\
+#   nanoVNA_python (nvnapython)
+#   'src/nvnapython/streaming.py'
+#
+#   Double-buffered (pipelined) repeated acquisition.
+#
+#   The plain loop  scan -> parse -> process -> scan  leaves the device idle
+#   while Python parses and post-processes each reply. ScanPipeline splits the
+#   loop across two threads:
+#
+#       acquisition thread : scan -> hand raw bytes off -> scan -> ...
+#                            (issues the next 'scan' the moment the previous
+#                             reply has fully arrived)
+#       worker thread      : parse_scan() + the caller's stages, on the PREVIOUS
+#                            sweep, while the device measures the next one
+#
+#   The two are joined by small bounded queues (`depth` sweeps each), so a slow
+#   consumer applies back-pressure instead of letting memory grow. The serial
+#   read loop spends its time in time.sleep()/in_waiting, which releases the
+#   GIL, so NumPy parsing in the worker genuinely overlaps the sweep.
+#
+#   STAGES: each stage is a callable taking a SweepResult and returning a
+#   SweepResult (the same one or a new one), or None to swallow the sweep (e.g.
+#   an averager that only emits every Nth sweep). Stages run in order, in the
+#   worker thread, so their cost is hidden behind the device sweep time as long
+#   as it stays below it.
+#
+#   THREAD SAFETY: the pipeline owns the serial port while it runs. Do not call
+#   other nanoVNA methods until the stream has been exhausted or close()d.
+#
+#   Author(s): Lauren Linkous
+##--------------------------------------------------------------------------------------------------\
+
+import queue
+import threading
+import time
+
+from .sweep import parse_scan
+
+
+_END = object()     # end-of-stream sentinel passed through the queues
+
+
+class ScanPipeline:
+    """Iterable of parsed (and optionally processed) sweeps.
+
+    Normally created by nanoVNA.stream_scan(); iterate it to run it:
+
+        with nvna.stream_scan(int(1e9), int(2e9), 201, 2, count=100) as stream:
+            for sweep in stream:
+                ...
+
+    Stats (readable at any time): issued, parsed, dropped, emitted, elapsed,
+    and sweep_rate().
+
+    close() may be called from any thread, e.g. a GUI thread stopping a
+    stream another thread is iterating: the iterating thread sees the end of
+    the stream.
+    """
+
+    def __init__(self, nvna, start, stop, pts, outmask=2, count=None,
+                 stages=None, depth=2):
+        self.nvna = nvna
+        self.start = start
+        self.stop = stop
+        self.pts = int(pts)
+        self.outmask = int(outmask)
+        self.count = count
+        self.stages = list(stages) if stages else []
+        self.depth = max(1, int(depth))
+
+        self.issued = 0        # scans sent to the device
+        self.parsed = 0        # replies that parsed cleanly
+        self.dropped = 0       # replies rejected by parse_scan (empty/malformed)
+        self.emitted = 0       # sweeps handed to the consumer
+        self.error = None      # exception raised inside a pipeline thread
+
+        self._raw_q = queue.Queue(maxsize=self.depth)
+        self._out_q = queue.Queue(maxsize=self.depth)
+        self._stop_evt = threading.Event()
+        self._threads = []
+        self._t_start = None
+        self._t_end = None
+
+    # ---- context manager / iteration -------------------------------------
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def __iter__(self):
+        self._start_threads()
+        # keep our own reference: close() from another thread clears _threads
+        worker = self._threads[1] if self._threads else None
+        try:
+            while True:
+                try:
+                    item = self._out_q.get(timeout=0.05)
+                except queue.Empty:
+                    # stopped by close(), or worker gone without managing to
+                    # queue the end marker (it stopped on an error while the
+                    # queue was full)
+                    if self._stop_evt.is_set() or worker is None or not worker.is_alive():
+                        break
+                    continue
+                if item is _END:
+                    break
+                self.emitted += 1
+                yield item
+        finally:
+            self.close()
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        # Stop both threads and wait for them. Safe to call more than once.
+        self._stop_evt.set()
+        for q in (self._raw_q, self._out_q):
+            try:
+                while True:
+                    q.get_nowait()
+            except queue.Empty:
+                pass
+        for t in self._threads:
+            if t is not threading.current_thread():
+                t.join()
+        self._threads = []
+        # wake a consumer blocked in __iter__ on another thread
+        try:
+            self._out_q.put_nowait(_END)
+        except queue.Full:
+            pass
+        if self._t_start is not None and self._t_end is None:
+            self._t_end = time.time()
+
+    # ---- stats ------------------------------------------------------------
+
+    @property
+    def elapsed(self):
+        if self._t_start is None:
+            return 0.0
+        end = self._t_end if self._t_end is not None else time.time()
+        return end - self._t_start
+
+    def sweep_rate(self):
+        # parsed sweeps per second since the stream started
+        elapsed = self.elapsed
+        return self.parsed / elapsed if elapsed > 0 else 0.0
+
+    # ---- internals ----------------------------------------------------------
+
+    def _start_threads(self):
+        if self._threads or self._t_start is not None:
+            return
+        self._t_start = time.time()
+        self._threads = [
+            threading.Thread(target=self._acquire_loop, daemon=True,
+                             name="nvna-acquire"),
+            threading.Thread(target=self._process_loop, daemon=True,
+                             name="nvna-process"),
+        ]
+        for t in self._threads:
+            t.start()
+
+    def _put(self, q, item):
+        # blocking put that still notices close()
+        while not self._stop_evt.is_set():
+            try:
+                q.put(item, timeout=0.05)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _acquire_loop(self):
+        try:
+            while not self._stop_evt.is_set():
+                if self.count is not None and self.issued >= self.count:
+                    break
+                raw = self.nvna.scan(self.start, self.stop, self.pts, self.outmask)
+                t_done = time.time()
+                self.issued += 1
+                if not self._put(self._raw_q, (raw, t_done)):
+                    break
+        except Exception as err:
+            self.error = err
+            self.nvna.print_message("ERROR: stream acquisition stopped: " + str(err))
+        finally:
+            self._put(self._raw_q, _END)
+
+    def _process_loop(self):
+        try:
+            while True:
+                try:
+                    item = self._raw_q.get(timeout=0.05)
+                except queue.Empty:
+                    if self._stop_evt.is_set():
+                        break
+                    continue
+                if item is _END:
+                    break
+                raw, t_done = item
+                parsing = time.time()
+                sweep = parse_scan(raw, self.start, self.stop, self.pts,
+                                   self.outmask, timestamp=t_done)
+                stats = self.nvna._stats
+                if stats is not None:
+                    stats.record_phase("scan", "parse", time.time() - parsing)
+                if sweep is None:
+                    self.dropped += 1
+                    self.nvna.print_message("WARNING: stream dropped a malformed scan reply")
+                    continue
+                self.parsed += 1
+                for stage in self.stages:
+                    sweep = stage(sweep)
+                    if sweep is None:
+                        break
+                if sweep is not None and not self._put(self._out_q, sweep):
+                    break
+        except Exception as err:
+            self.error = err
+            self._stop_evt.set()
+            self.nvna.print_message("ERROR: stream processing stopped: " + str(err))
+        finally:
+            self._t_end = time.time()
+            self._put(self._out_q, _END)
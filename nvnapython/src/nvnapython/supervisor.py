@@ -0,0 +1,286 @@
+#! /usr/bin/python3
+
+##------------------------------------------------------------------------------------------------\
+#   nanoVNA_python (nvnapython)
+#   'src/nvnapython/supervisor.py'
+#
+#   Automatic reconnect supervisor for unattended rigs.
+#
+#   After a device reset or a USB re-enumeration the open serial handle is
+#   dead: every read/write raises, and without help the script has to be
+#   restarted by hand. With the supervisor enabled (nanoVNA.enable_supervisor)
+#   every command that goes through nanoVNA_serial is watched:
+#
+#     1. DETECT: a closed port or a pyserial / OS error during the exchange,
+#        or a port that has gone silent: after `max_timeouts` consecutive
+#        exchanges that timed out without a prompt, the device is asked for
+#        its 'SN' (probe_timeout_s); no matching answer counts as a dead
+#        port. (A unit that hangs, or a USB/TCP link that drops without an
+#        error, just stops answering.)
+#     2. REDISCOVER: list the ports with a NanoVNA-class VID:PID
+#        (constants.USB_VID_PID), open each and ask for its 'SN'; only the
+#        unit with the supervised serial number is accepted, so a second
+#        analyzer on the same host is never picked up by mistake. Repeats
+#        every `interval_s` until `timeout_s`.
+#     3. RESTORE: replay the shadowed configuration -- the last sweep, trace,
+#        marker, edelay, cal on/off, cwfreq, pause/resume and recall commands
+#        that succeeded -- so the device is back in the state the script
+#        left it in.
+#     4. RETRY: re-send the command that was in flight if it is idempotent
+#        (queries, scans, setters). Commands that change stored state or step
+#        a procedure (save, clearconfig, reset, cal steps, touch cal/test)
+#        are NOT re-sent: it's unknown whether the device ran them, so the
+#        call returns the error return instead.
+#
+#   Only pyserial is needed.
+#
+#   Author(s): Lauren Linkous
+##--------------------------------------------------------------------------------------------------\
+
+import time
+
+import serial
+import serial.tools.list_ports
+
+from .constants import USB_VID_PID
+from .transports import open_transport
+
+
+# first words of commands that are NOT safe to re-send blindly
+NON_IDEMPOTENT = ("save", "saveconfig", "clearconfig", "reset", "touchcal", "touchtest")
+
+# 'cal' sub-commands that only switch correction on/off (safe; shadowed)
+_CAL_SWITCHES = ("on", "off")
+
+# 'trace {id} {arg}' arguments that set a value rather than the trace format
+_TRACE_VALUES = ("refpos", "scale", "channel")
+
+
+def shadow_key(command):
+    """
+    Key under which a configuration command is shadowed, or None for commands
+    that don't change persistent sweep/display state. A later command with the
+    same key replaces the earlier one.
+    """
+    words = command.split()
+    if not words:
+        return None
+    head, args = words[0], words[1:]
+    if head == "sweep":
+        if not args:
+            return None                        # query
+        if args[0] in ("start", "stop", "center", "span", "cw"):
+            return ("sweep", args[0])
+        return ("sweep",)
+    if head == "trace" and len(args) >= 2:
+        return ("trace", args[0], args[1] if args[1] in _TRACE_VALUES else "format")
+    if head == "marker" and len(args) >= 2:
+        return ("marker", args[0])
+    if head in ("edelay", "cwfreq", "pwm") and args:
+        return (head,)
+    if head == "cal" and args and args[0] in _CAL_SWITCHES:
+        return ("cal",)
+    if head in ("pause", "resume"):
+        return ("run",)
+    if head == "recall" and args:
+        return ("recall",)
+    return None
+
+
+def is_idempotent(command):
+    # whether re-sending `command` after a reconnect is safe
+    words = command.split()
+    if not words:
+        return False
+    if words[0] in NON_IDEMPOTENT:
+        return False
+    if words[0] == "cal" and len(words) > 1 and words[1] not in _CAL_SWITCHES:
+        return False
+    return True
+
+
+def nanovna_ports():
+    # device names of the serial ports with a NanoVNA-class VID:PID
+    return [p.device for p in serial.tools.list_ports.comports()
+            if p.vid is not None and (p.vid, p.pid) in USB_VID_PID]
+
+
+class ConnectionSupervisor:
+    """Watches a nanoVNA's serial exchanges and recovers from a dead port.
+
+    Normally created with nanoVNA.enable_supervisor(). find_ports() returns
+    candidate port names and open_port(name) an open pyserial-like port;
+    both default to real serial discovery and are there for tests and
+    unusual setups. Names go through transports.open_transport, so a
+    device behind a TCP bridge is supervised with
+    find_ports=lambda: ["tcp://bridge:2000"].
+
+    Counters: reconnects, replayed (config commands re-sent), retried
+    (in-flight commands re-sent), failures (recoveries that gave up), stalls
+    (silent ports detected by timeouts); consecutive_timeouts is the current
+    run of timed-out exchanges.
+    """
+
+    def __init__(self, nvna, serial_number, timeout_s=30.0, interval_s=0.5,
+                 probe_timeout_s=1.0, find_ports=None, open_port=None,
+                 max_timeouts=2):
+        self.nvna = nvna
+        self.serial_number = str(serial_number)
+        self.timeout_s = float(timeout_s)
+        self.interval_s = float(interval_s)
+        self.probe_timeout_s = float(probe_timeout_s)
+        self.find_ports = nanovna_ports if find_ports is None else find_ports
+        self.open_port = ((lambda port: open_transport(port, timeout=1))
+                          if open_port is None else open_port)
+        self.max_timeouts = max(1, int(max_timeouts))
+        self.shadow = {}
+        self.active = False
+        self.reconnects = 0
+        self.replayed = 0
+        self.retried = 0
+        self.failures = 0
+        self.stalls = 0
+        self.consecutive_timeouts = 0
+        self.last_error = None
+
+    def record(self, command):
+        # remember a successful configuration command for replay
+        key = shadow_key(command)
+        if key is None:
+            return
+        if key == ("recall",):
+            self.shadow.clear()            # a preset replaces the whole setup
+        if key == ("sweep",):
+            for k in [k for k in self.shadow if k[0] == "sweep"]:
+                del self.shadow[k]
+        self.shadow.pop(key, None)         # re-insert at the end: replay order
+        self.shadow[key] = command
+
+    def call(self, writebyte, printBool=False, pts=None, timeout_s=None):
+        # Run one exchange under supervision. Called by nanoVNA_serial.
+        self.active = True
+        try:
+            try:
+                reply = self._exchange(writebyte, printBool, pts, timeout_s)
+            except (serial.SerialException, OSError) as err:
+                self.last_error = err
+                self.nvna.print_message("WARNING: serial port lost (" + str(err) +
+                                        "); reconnecting")
+                return self._recover(writebyte, printBool, pts, timeout_s)
+            if not self.nvna.lastReadTimedOut:
+                self.consecutive_timeouts = 0
+            else:
+                self.consecutive_timeouts += 1
+                if self.consecutive_timeouts >= self.max_timeouts and not self._probe():
+                    self.stalls += 1
+                    self.last_error = TimeoutError(str(self.consecutive_timeouts) +
+                                                   " timeouts, no answer to SN")
+                    self.consecutive_timeouts = 0
+                    self.nvna.print_message("WARNING: device stopped answering (" +
+                                            str(self.last_error) + "); reconnecting")
+                    return self._recover(writebyte, printBool, pts, timeout_s)
+            self.record(writebyte.strip())
+            return reply
+        finally:
+            self.active = False
+
+    def _exchange(self, writebyte, printBool, pts, timeout_s=None):
+        ser = self.nvna.ser
+        if ser is None or not getattr(ser, "is_open", True):
+            raise serial.SerialException("port is not open")
+        return self.nvna.nanoVNA_serial(writebyte, printBool, pts, timeout_s)
+
+    def _recover(self, writebyte, printBool, pts, timeout_s=None):
+        if not self.reconnect():
+            self.failures += 1
+            self.nvna.print_message("ERROR: could not find device " + self.serial_number +
+                                    " again within " + str(self.timeout_s) + " s")
+            return self.nvna.error_byte_return()
+        command = writebyte.strip()
+        if not is_idempotent(command):
+            self.nvna.print_message("WARNING: reconnected, but '" + command + "' is not "
+                                    "safe to repeat and was not re-sent")
+            return self.nvna.error_byte_return()
+        try:
+            reply = self._exchange(writebyte, printBool, pts, timeout_s)
+        except (serial.SerialException, OSError) as err:
+            self.last_error = err
+            self.failures += 1
+            self.nvna.print_message("ERROR: '" + command + "' failed again after "
+                                    "reconnecting: " + str(err))
+            return self.nvna.error_byte_return()
+        self.retried += 1
+        self.record(command)
+        return reply
+
+    def reconnect(self):
+        """
+        Find the supervised device again, reopen it and replay the shadowed
+        configuration. Returns True on success. Also usable directly, e.g.
+        after a deliberate reset().
+        """
+        was_active, self.active = self.active, True
+        try:
+            self._drop_port()
+            deadline = time.time() + self.timeout_s
+            while True:
+                for name in self.find_ports():
+                    if self._try_port(name):
+                        self.reconnects += 1
+                        self.nvna.print_message("reconnected to " + self.serial_number +
+                                                " at " + str(name))
+                        self._replay()
+                        return True
+                if time.time() + self.interval_s > deadline:
+                    return False
+                time.sleep(self.interval_s)
+        finally:
+            self.active = was_active
+
+    def _drop_port(self):
+        ser, self.nvna.ser = self.nvna.ser, None
+        if ser is not None:
+            try:
+                ser.close()
+            except Exception:
+                pass
+
+    def _try_port(self, name):
+        # open `name` and keep it if it answers with the supervised SN
+        try:
+            port = self.open_port(name)
+        except (serial.SerialException, OSError, ValueError):
+            return False
+        self.nvna.ser = port
+        if self._probe():
+            return True
+        self._drop_port()
+        return False
+
+    def _probe(self):
+        # Whether the open port answers 'SN' with the supervised serial
+        # number. A prompt-terminated reply that doesn't match may be the late
+        # reply to a command that timed out, so SN is asked once more; a
+        # timeout fails at once. probe_timeout_s is passed per call, so it
+        # also holds with adaptive timeouts and a failed probe doesn't widen
+        # the learned SN budget.
+        try:
+            for _ in range(2):
+                sn = bytes(self.nvna.nanoVNA_serial("SN\r\n", timeout_s=self.probe_timeout_s))
+                sn = sn.decode("utf-8", "replace")
+                if self.nvna.lastReadTimedOut:
+                    return False
+                if sn.strip() == self.serial_number:
+                    return True
+            return False
+        except (serial.SerialException, OSError):
+            return False
+
+    def _replay(self):
+        for command in list(self.shadow.values()):
+            try:
+                self.nvna.nanoVNA_serial(command + "\r\n")
+                self.replayed += 1
+            except (serial.SerialException, OSError) as err:
+                self.nvna.print_message("WARNING: could not restore '" + command + "': " +
+                                        str(err))
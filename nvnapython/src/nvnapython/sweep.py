@@ -0,0 +1,189 @@
+#! /usr/bin/python3
+
+##------------------------------------------------------------------------------------------------\
+#   nanoVNA_python (nvnapython)
+#   'src/nvnapython/sweep.py'
+#
+#   Parsed sweep data: the SweepResult container and the vectorized parser that
+#   turns a raw 'scan' reply (the bytearray returned by nanoVNA.scan()) into
+#   NumPy arrays.
+#
+#   The command methods keep returning raw bytes -- that's the library's
+#   contract and it stays. This module is the ONE place the text payload is
+#   turned into numbers, so the streaming, averaging, storage and analysis
+#   modules all share the same parse and the same array layout:
+#
+#       freq : float64 (points,)    Hz
+#       s11  : complex128 (points,) or None if the outmask didn't request it
+#       s21  : complex128 (points,) or None
+#
+#   Requires numpy (the [analysis] or [plotting] extra).
+#
+#   Author(s): Lauren Linkous
+##--------------------------------------------------------------------------------------------------\
+
+import time
+
+import numpy as np
+
+
+# scan() outmask bits (see AcquisitionMixin.scan)
+OUTMASK_FREQ = 1
+OUTMASK_S11 = 2
+OUTMASK_S21 = 4
+
+
+class SweepResult:
+    """One parsed sweep.
+
+    Attributes:
+        freq      : float64 array of sweep frequencies in Hz
+        s11, s21  : complex128 arrays, or None when not requested by the outmask
+        start, stop, points, outmask : the scan arguments that produced it
+        timestamp : time.time() when the reply finished arriving
+        cache     : scratch dict for derived results (metrics, verdicts, ...)
+                    so downstream stages compute each quantity once per sweep
+    """
+
+    def __init__(self, freq, s11=None, s21=None, start=None, stop=None,
+                 points=None, outmask=None, timestamp=None):
+        self.freq = freq
+        self.s11 = s11
+        self.s21 = s21
+        self.start = start
+        self.stop = stop
+        self.points = len(freq) if points is None else points
+        self.outmask = outmask
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.cache = {}
+
+    def __len__(self):
+        return len(self.freq)
+
+    def __repr__(self):
+        parts = [p for p, v in (("s11", self.s11), ("s21", self.s21)) if v is not None]
+        return ("SweepResult(" + str(len(self.freq)) + " pts, " +
+                (", ".join(parts) if parts else "no data") + ")")
+
+    def get(self, param):
+        # return the named S-parameter array ('s11' / 's21')
+        return getattr(self, str(param).lower())
+
+
+def sweep_frequencies(start, stop, pts):
+    # The linearly spaced frequency grid the device sweeps for
+    # 'scan start stop pts'. Used when the outmask does not include the
+    # frequency column.
+    if int(pts) == 1:
+        return np.array([float(start)])
+    return np.linspace(float(start), float(stop), int(pts))
+
+
+def grid_key(freq):
+    # hashable identity of a frequency grid, for per-plan caches
+    freq = np.asarray(freq, dtype=np.float64)
+    return (len(freq), float(freq[0]), float(freq[-1]), hash(freq.tobytes()))
+
+
+def outmask_columns(outmask):
+    # number of whitespace-separated values per line for a given outmask
+    outmask = int(outmask)
+    cols = 0
+    if outmask & OUTMASK_FREQ:
+        cols += 1
+    if outmask & OUTMASK_S11:
+        cols += 2
+    if outmask & OUTMASK_S21:
+        cols += 2
+    return cols
+
+
+def parse_scan(data, start, stop, pts, outmask, timestamp=None):
+    """
+    Parse a raw 'scan' reply into a SweepResult.
+
+    `data` is the cleaned payload returned by nanoVNA.scan() (bytes or
+    bytearray). The whole payload is split and converted in one NumPy call,
+    then reshaped to (pts, columns) -- no per-line Python loop.
+
+    Returns None if the reply is empty, b'ERROR', non-numeric, or does not
+    hold exactly pts rows for the outmask. That makes this the validation gate
+    for any retry logic: a raced/truncated read fails it.
+    """
+    cols = outmask_columns(outmask)
+    if cols == 0 or not data:
+        return None
+    tokens = bytes(data).split()
+    if len(tokens) != int(pts) * cols:
+        return None
+    try:
+        values = np.array(tokens, dtype=np.float64).reshape(int(pts), cols)
+    except ValueError:
+        return None
+
+    col = 0
+    if int(outmask) & OUTMASK_FREQ:
+        freq = values[:, col].copy()
+        col += 1
+    else:
+        freq = sweep_frequencies(start, stop, pts)
+    s11 = s21 = None
+    if int(outmask) & OUTMASK_S11:
+        s11 = values[:, col] + 1j * values[:, col + 1]
+        col += 2
+    if int(outmask) & OUTMASK_S21:
+        s21 = values[:, col] + 1j * values[:, col + 1]
+
+    return SweepResult(freq, s11=s11, s21=s21, start=start, stop=stop,
+                       points=int(pts), outmask=int(outmask), timestamp=timestamp)
+
+
+def stack_sweeps(sweeps, param="s11"):
+    # Stack a list of SweepResults into a (sweeps x points) complex matrix for
+    # the batched analysis modules. All sweeps must share one frequency grid.
+    return np.vstack([s.get(param) for s in sweeps])
+
+
+def merge_sweeps(sweeps):
+    """
+    Merge SweepResults taken on different (possibly overlapping) grids into
+    one SweepResult on the sorted union of their frequencies. Where two sweeps
+    share a frequency the later one in the list wins, so pass a coarse sweep
+    first and its refinements after it.
+
+    The result is generally NOT linearly spaced. An S-parameter is kept only
+    if every sweep carries it; start / stop span all inputs and the timestamp
+    is the latest one.
+    """
+    if not sweeps:
+        raise ValueError("merge_sweeps() needs at least one sweep")
+    freq = np.concatenate([s.freq for s in sweeps])
+    order = np.argsort(freq, kind="stable")
+    ordered = freq[order]
+    # stable sort keeps list order within equal frequencies: take the last
+    last = np.append(ordered[1:] != ordered[:-1], True)
+    take = order[last]
+
+    def merged(param):
+        arrays = [s.get(param) for s in sweeps]
+        if any(a is None for a in arrays):
+            return None
+        return np.concatenate(arrays)[take]
+
+    starts = [s.start for s in sweeps if s.start is not None]
+    stops = [s.stop for s in sweeps if s.stop is not None]
+    return SweepResult(freq[take], s11=merged("s11"), s21=merged("s21"),
+                       start=min(starts) if starts else float(freq[take][0]),
+                       stop=max(stops) if stops else float(freq[take][-1]),
+                       outmask=sweeps[0].outmask,
+                       timestamp=max(s.timestamp for s in sweeps))
+
+
+def zero_samples(sweep):
+    # (points,) bool mask of points where every S-parameter the sweep carries
+    # is exactly 0+0j -- what the F V3 returns above its ~6 GHz hardware
+    # ceiling, and what a glitched read can look like
+    arrays = [a for a in (sweep.s11, sweep.s21) if a is not None]
+    if not arrays:
+        return np.zeros(len(sweep.freq), dtype=bool)
+    return np.logical_and.reduce([a == 0 for a in arrays])
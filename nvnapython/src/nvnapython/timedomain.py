@@ -0,0 +1,486 @@
+#! /usr/bin/python3
+
+##------------------------------------------------------------------------------------------------\
+#   nanoVNA_python (nvnapython)
+#   'src/nvnapython/timedomain.py'
+#
+#   Time-domain (TDR) transforms of S11 sweeps, for fault location.
+#
+#   MODES:
+#       lowpass_impulse  real impulse response. Needs a harmonic grid
+#                        (f_k = k * step, see harmonic_grid()); the DC term is
+#                        extrapolated and the spectrum mirrored so the result
+#                        is real and shows the sign of each discontinuity.
+#       lowpass_step     running sum of the lowpass impulse: the classic TDR
+#                        step, settling to the reflection coefficient of the
+#                        load (e.g. -1 for a short, +1 for an open).
+#       bandpass         complex impulse from any sweep range (no DC needed);
+#                        use the magnitude. Half the time resolution of lowpass
+#                        for the same span.
+#
+#   Distance is one-way: d = c * velocity_factor * t / 2.
+#
+#   ZOOM: ZoomPlan evaluates the response over a chosen distance window only,
+#   with a chirp-Z (Bluestein) transform -- cost scales with the output points,
+#   not with the zero-padding a fine FFT grid would need.
+#
+#   GATING: GatePlan runs transform -> time gate -> inverse transform to
+#   remove (or isolate) reflections, e.g. a test fixture, returning corrected
+#   frequency data on the same grid. All of it is two batched FFTs and two
+#   multiplies with arrays precomputed per plan.
+#
+#   PLANS: everything that depends only on the sweep grid and the options --
+#   the window, the zero-padded FFT length, DC extrapolation weights, the
+#   normalization and the time/distance axes -- lives in a TDRPlan, built once
+#   and cached per (grid, options). A transform is then one windowed copy
+#   into the padded spectrum and ONE batched FFT over all rows, so a stream
+#   of sweeps costs one FFT per sweep (or one per batch).
+#
+#   Author(s): Lauren Linkous
+##--------------------------------------------------------------------------------------------------\
+
+from collections import OrderedDict
+
+import numpy as np
+
+from .sweep import grid_key
+
+
+SPEED_OF_LIGHT = 299792458.0
+TDR_MODES = ("lowpass_impulse", "lowpass_step", "bandpass")
+WINDOWS = ("rect", "hann", "hamming", "blackman", "kaiser")
+GATE_SHAPES = ("rect", "hann", "tukey", "kaiser")
+
+# smallest window value (relative to its peak) a gate divides back out
+UNWINDOW_FLOOR = 0.05
+
+_PLAN_CACHE = OrderedDict()
+_PLAN_CACHE_SIZE = 32
+
+
+def window_array(name, n, beta=6.0):
+    # symmetric window of length n
+    if name == "rect":
+        return np.ones(n)
+    if name == "hann":
+        return np.hanning(n)
+    if name == "hamming":
+        return np.hamming(n)
+    if name == "blackman":
+        return np.blackman(n)
+    if name == "kaiser":
+        return np.kaiser(n, beta)
+    raise ValueError("window must be one of " + ", ".join(WINDOWS))
+
+
+def harmonic_grid(stop, pts):
+    # (start, stop) for a lowpass-capable scan: start = step = stop / pts
+    step = float(stop) / int(pts)
+    return int(round(step)), int(round(step * int(pts)))
+
+
+def _next_pow2(n):
+    return 1 << max(0, int(n - 1).bit_length())
+
+
+class TDRPlan:
+    """Precomputed frequency-to-time setup for one sweep grid.
+
+        plan = get_plan(sweep.freq, mode="lowpass_step", window="kaiser")
+        resp = plan.transform(batch)      # (sweeps, n_time)
+        plan.distance                     # (n_time,) metres, one way
+
+    Attributes: mode, n_fft, step (Hz), time (s), distance (m), window
+    (per sweep point), time_range (s; the response repeats after this).
+    Build through get_plan() to share plans between callers.
+    """
+
+    def __init__(self, freq, mode="lowpass_impulse", window="kaiser", beta=6.0,
+                 pad=4, n_fft=None, velocity_factor=0.66):
+        if mode not in TDR_MODES:
+            raise ValueError("mode must be one of " + ", ".join(TDR_MODES))
+        freq = np.asarray(freq, dtype=np.float64)
+        if len(freq) < 2:
+            raise ValueError("time-domain transforms need at least 2 sweep points")
+        steps = np.diff(freq)
+        step = float(steps.mean())
+        if step <= 0 or np.max(np.abs(steps - step)) > 1e-6 * step + 1e-3:
+            raise ValueError("time-domain transforms need a uniform, increasing grid")
+        self.freq = freq
+        self.mode = mode
+        self.step = step
+        self.velocity_factor = float(velocity_factor)
+        n = len(freq)
+
+        if mode == "bandpass":
+            self.offset = 0
+            self.window = window_array(window, n, beta)
+            need = n
+        else:
+            ratio = freq[0] / step
+            offset = int(round(ratio))
+            if abs(ratio - offset) > 1e-6 * max(1.0, ratio):
+                raise ValueError("lowpass modes need a harmonic grid (start = k * step); "
+                                 "see harmonic_grid()")
+            self.offset = offset
+            # right half of a symmetric window centred on DC: one weight per
+            # bin from DC to the last sweep point
+            half = window_array(window, 2 * (offset + n) - 1, beta)[offset + n - 1:]
+            self._dc_window = half[:offset]
+            self.window = half[offset:]
+            self._half_window = half
+            need = 2 * (offset + n)
+        self.n_fft = max(int(n_fft) if n_fft else _next_pow2(need * int(pad)), need)
+
+        dt = 1.0 / (self.n_fft * step)
+        self.time = np.arange(self.n_fft) * dt
+        self.time_range = 1.0 / step
+        self.distance = self.time * SPEED_OF_LIGHT * self.velocity_factor / 2.0
+
+        if mode == "bandpass":
+            # a flat reflection gives a peak of that magnitude
+            self._scale = self.n_fft / self.window.sum()
+        else:
+            # mirrored spectrum: DC once, every other bin twice
+            half = self._half_window
+            self._scale = self.n_fft / (2.0 * half.sum() - half[0])
+
+    def _lowpass_spectrum(self, batch):
+        # one-sided spectrum (DC .. n_fft/2) with extrapolated DC and
+        # interpolated sub-start bins
+        rows = batch.shape[0]
+        spec = np.zeros((rows, self.n_fft // 2 + 1), dtype=np.complex128)
+        m, n = self.offset, batch.shape[1]
+        spec[:, m:m + n] = batch * self.window
+        if m > 0:
+            # bins below the first point: extrapolate magnitude and unwrapped
+            # phase linearly from the first two points (a delay is a phase
+            # ramp, so this lands on the right DC value for a line), then keep
+            # only the real part at DC
+            mag, ph = np.abs(batch[:, :2]), np.unwrap(np.angle(batch[:, :2]), axis=1)
+            k = np.arange(m) - m
+            fill_mag = mag[:, :1] + k * (mag[:, 1:2] - mag[:, :1])
+            fill_ph = ph[:, :1] + k * (ph[:, 1:2] - ph[:, :1])
+            fill = fill_mag * np.exp(1j * fill_ph)
+            fill[:, 0] = fill[:, 0].real
+            spec[:, :m] = fill * self._dc_window
+        else:
+            spec[:, 0] = spec[:, 0].real
+        return spec
+
+    def transform(self, data):
+        """
+        Time-domain response of `data`, (points,) or (sweeps, points) complex
+        S11 on this plan's grid. Real for lowpass modes, complex for bandpass.
+        """
+        data = np.asarray(data)
+        single = data.ndim == 1
+        batch = np.atleast_2d(data)
+        if batch.shape[1] != len(self.freq):
+            raise ValueError("data has " + str(batch.shape[1]) + " points, plan has " +
+                             str(len(self.freq)))
+        if self.mode == "bandpass":
+            spec = np.zeros((batch.shape[0], self.n_fft), dtype=np.complex128)
+            spec[:, :batch.shape[1]] = batch * self.window
+            out = np.fft.ifft(spec, axis=1) * self._scale
+        else:
+            out = np.fft.irfft(self._lowpass_spectrum(batch), n=self.n_fft, axis=1)
+            if self.mode == "lowpass_step":
+                # the raw impulse sums to the DC bin, so its running sum
+                # settles to the load's reflection coefficient
+                out = np.cumsum(out, axis=1)
+            else:
+                out *= self._scale
+        return out[0] if single else out
+
+
+def _cached_plan(key, build):
+    # small LRU shared by the TDR and zoom plans
+    plan = _PLAN_CACHE.get(key)
+    if plan is None:
+        plan = build()
+        _PLAN_CACHE[key] = plan
+        if len(_PLAN_CACHE) > _PLAN_CACHE_SIZE:
+            _PLAN_CACHE.popitem(last=False)
+    else:
+        _PLAN_CACHE.move_to_end(key)
+    return plan
+
+
+def get_plan(freq, mode="lowpass_impulse", window="kaiser", beta=6.0, pad=4,
+             n_fft=None, velocity_factor=0.66):
+    # TDRPlan for this grid and options, from the plan cache
+    key = ("tdr", grid_key(freq), mode, window, float(beta), int(pad), n_fft,
+           float(velocity_factor))
+    return _cached_plan(key, lambda: TDRPlan(freq, mode, window, beta, pad, n_fft,
+                                             velocity_factor))
+
+
+def tdr(freq, data, mode="lowpass_impulse", window="kaiser", beta=6.0, pad=4,
+        n_fft=None, velocity_factor=0.66):
+    """
+    One-call transform. Returns (distance, response): distance in metres
+    (one way) and the response for each row of `data`.
+    """
+    plan = get_plan(freq, mode, window, beta, pad, n_fft, velocity_factor)
+    return plan.distance, plan.transform(data)
+
+
+class ZoomPlan:
+    """Chirp-Z (Bluestein) evaluation of the time-domain response over one
+    distance window only, for zooming into e.g. a connector region.
+
+        zp = get_zoom_plan(sweep.freq, 1.8, 2.4, points=400, mode="bandpass")
+        resp = zp.transform(batch)        # (sweeps, 400)
+        zp.distance                       # (400,) metres, one way
+
+    Gives the same samples a zero-padded FFT would at those distances, but
+    the cost is one FFT of length >= sweep points + output points, however
+    fine the resolution. Modes: 'bandpass' and 'lowpass_impulse' (a step is
+    a running sum over the whole time range, so it has no zoomed form).
+
+    The chirp pre/post factors and the kernel spectrum depend only on the
+    grid and the window, so they are computed once per plan.
+    """
+
+    def __init__(self, freq, d_start, d_stop, points=512, mode="bandpass",
+                 window="kaiser", beta=6.0, velocity_factor=0.66):
+        if mode not in ("bandpass", "lowpass_impulse"):
+            raise ValueError("zoom mode must be 'bandpass' or 'lowpass_impulse'")
+        points = int(points)
+        if points < 2 or not float(d_stop) > float(d_start):
+            raise ValueError("zoom needs d_stop > d_start and at least 2 points")
+        # reuse the plain plan's grid checks, window and DC extrapolation
+        self.base = TDRPlan(freq, mode, window, beta, pad=1,
+                            velocity_factor=velocity_factor)
+        self.mode = mode
+        self.freq = self.base.freq
+        self.distance = np.linspace(float(d_start), float(d_stop), points)
+        self.time = 2.0 * self.distance / (SPEED_OF_LIGHT * self.base.velocity_factor)
+        if mode == "bandpass":
+            n_in = len(self.freq)
+            weights = self.base.window
+            self._scale = 1.0 / weights.sum()
+        else:
+            n_in = self.base.offset + len(self.freq)
+            weights = np.ones(n_in)            # window applied by the base plan
+            self._scale = 1.0 / (2.0 * self.base._half_window.sum() -
+                                 self.base._half_window[0])
+        self.n_in = n_in
+
+        # y_n = sum_k x_k exp(j 2 pi k step t_n), t_n = t0 + n dt, by Bluestein:
+        # nk = (n^2 + k^2 - (n-k)^2) / 2
+        step = self.base.step
+        t0, dt = self.time[0], self.time[1] - self.time[0]
+        k = np.arange(n_in)
+        n = np.arange(points)
+        theta = np.pi * step * dt                      # W^(m^2/2) = exp(j theta m^2)
+        self._pre = weights * np.exp(2j * np.pi * step * t0 * k + 1j * theta * k * k)
+        self._post = np.exp(1j * theta * n * n)
+        self.n_conv = _next_pow2(n_in + points - 1)
+        kernel = np.zeros(self.n_conv, dtype=np.complex128)
+        m = np.arange(points)
+        kernel[:points] = np.exp(-1j * theta * m * m)
+        m = np.arange(1, n_in)
+        kernel[self.n_conv - m] = np.exp(-1j * theta * m * m)
+        self._kernel_fft = np.fft.fft(kernel)
+
+    def transform(self, data):
+        """
+        Response at self.distance for `data`, (points,) or (sweeps, points)
+        complex S11 on this plan's grid. Complex for bandpass, real for
+        lowpass_impulse; same scaling as TDRPlan.transform.
+        """
+        data = np.asarray(data)
+        single = data.ndim == 1
+        batch = np.atleast_2d(data)
+        if batch.shape[1] != len(self.freq):
+            raise ValueError("data has " + str(batch.shape[1]) + " points, plan has " +
+                             str(len(self.freq)))
+        if self.mode == "bandpass":
+            x = batch
+        else:
+            x = self.base._lowpass_spectrum(batch)[:, :self.n_in]
+        buf = np.zeros((batch.shape[0], self.n_conv), dtype=np.complex128)
+        buf[:, :self.n_in] = x * self._pre
+        y = np.fft.ifft(np.fft.fft(buf, axis=1) * self._kernel_fft, axis=1)
+        y = y[:, :len(self.distance)] * self._post
+        if self.mode == "bandpass":
+            out = y * self._scale
+        else:
+            # real signal from the one-sided sum: DC once, other bins twice
+            out = (2.0 * y.real - x[:, :1].real) * self._scale
+        return out[0] if single else out
+
+
+def get_zoom_plan(freq, d_start, d_stop, points=512, mode="bandpass",
+                  window="kaiser", beta=6.0, velocity_factor=0.66):
+    # ZoomPlan for this grid, distance window and options, from the plan cache
+    key = ("zoom", grid_key(freq), float(d_start), float(d_stop), int(points), mode,
+           window, float(beta), float(velocity_factor))
+    return _cached_plan(key, lambda: ZoomPlan(freq, d_start, d_stop, points, mode,
+                                              window, beta, velocity_factor))
+
+
+def zoom_tdr(freq, data, d_start, d_stop, points=512, mode="bandpass",
+             window="kaiser", beta=6.0, velocity_factor=0.66):
+    """
+    One-call zoomed transform over [d_start, d_stop] metres (one way).
+    Returns (distance, response).
+    """
+    plan = get_zoom_plan(freq, d_start, d_stop, points, mode, window, beta,
+                         velocity_factor)
+    return plan.distance, plan.transform(data)
+
+
+class TDRStage:
+    """Stream stage that adds the time-domain response of each sweep's S11
+    to sweep.cache['tdr'] (with the plan in sweep.cache['tdr_plan'])."""
+
+    def __init__(self, mode="lowpass_step", window="kaiser", beta=6.0, pad=4,
+                 n_fft=None, velocity_factor=0.66, param="s11"):
+        if mode not in TDR_MODES:
+            raise ValueError("mode must be one of " + ", ".join(TDR_MODES))
+        self.options = (mode, window, beta, pad, n_fft, velocity_factor)
+        self.param = param
+
+    def __call__(self, sweep):
+        data = sweep.get(self.param)
+        if data is not None:
+            plan = get_plan(sweep.freq, *self.options)
+            sweep.cache["tdr_plan"] = plan
+            sweep.cache["tdr"] = plan.transform(data)
+        return sweep
+
+
+def gate_array(shape, u, edge=0.25, beta=6.0):
+    # gate weight at relative position u (0..1 across the span; 0 outside)
+    inside = (u >= 0.0) & (u <= 1.0)
+    uc = np.clip(u, 0.0, 1.0)
+    if shape == "rect":
+        g = np.ones_like(uc)
+    elif shape == "hann":
+        g = 0.5 - 0.5 * np.cos(2.0 * np.pi * uc)
+    elif shape == "tukey":
+        half = max(float(edge), 1e-12) / 2.0
+        ramp = np.minimum(uc, 1.0 - uc) / half
+        g = np.where(ramp >= 1.0, 1.0, 0.5 - 0.5 * np.cos(np.pi * np.minimum(ramp, 1.0)))
+    elif shape == "kaiser":
+        g = np.i0(beta * np.sqrt(np.maximum(0.0, 1.0 - (2.0 * uc - 1.0) ** 2))) / np.i0(beta)
+    else:
+        raise ValueError("gate shape must be one of " + ", ".join(GATE_SHAPES))
+    return np.where(inside, g, 0.0)
+
+
+class GatePlan:
+    """Time-domain gate for one sweep grid.
+
+        gp = get_gate_plan(sweep.freq, center=0.05, span=0.1, keep=False)
+        clean = gp.apply(batch)           # (sweeps, points) gated S-data
+
+    center / span are one-way distances in metres (via velocity_factor).
+    keep=True passes only the gated region; keep=False removes it (e.g. to
+    cut out a fixture or connector reflection). shape is rect, hann, tukey
+    (flat top, `edge` fraction tapered) or kaiser.
+
+    The data is windowed, zero-padded and transformed with the complex
+    (bandpass-style) transform, which works on any grid; after gating and
+    transforming back the window is divided out again, so ungated content
+    is returned unchanged. Expect some error in the first and last few
+    points, where the gate's frequency-domain smoothing runs off the band.
+    Windows that fall below UNWINDOW_FLOOR of their peak there (hann,
+    blackman) are only divided out down to that floor, so those edge points
+    come back attenuated rather than inf.
+    """
+
+    def __init__(self, freq, center, span, shape="tukey", keep=True, edge=0.25,
+                 beta=6.0, window="kaiser", window_beta=3.0, pad=4,
+                 velocity_factor=0.66):
+        if not float(span) > 0:
+            raise ValueError("gate span must be > 0")
+        self.base = TDRPlan(freq, "bandpass", window, window_beta, pad,
+                            velocity_factor=velocity_factor)
+        self.freq = self.base.freq
+        self.center = float(center)
+        self.span = float(span)
+        self.keep = bool(keep)
+        to_time = 2.0 / (SPEED_OF_LIGHT * self.base.velocity_factor)
+        period = self.base.time_range
+        # signed time offset from the gate centre, wrapped onto the FFT period
+        delta = (self.base.time - self.center * to_time + period / 2.0) % period - period / 2.0
+        g = gate_array(shape, delta / (self.span * to_time) + 0.5, edge, beta)
+        self.gate = g if self.keep else 1.0 - g
+        self._window = self.base.window
+        # hann / blackman go to (nearly) zero at the band edges: divide by
+        # at most 1 / UNWINDOW_FLOOR there instead of blowing up to inf
+        self._unwindow = 1.0 / np.maximum(self._window,
+                                          UNWINDOW_FLOOR * self._window.max())
+
+    def apply(self, data):
+        """
+        Gated version of `data`, (points,) or (sweeps, points) complex, on
+        the same grid. Two batched FFTs for the whole stack.
+        """
+        data = np.asarray(data)
+        single = data.ndim == 1
+        batch = np.atleast_2d(data)
+        n = len(self.freq)
+        if batch.shape[1] != n:
+            raise ValueError("data has " + str(batch.shape[1]) + " points, plan has " +
+                             str(n))
+        buf = np.zeros((batch.shape[0], self.base.n_fft), dtype=np.complex128)
+        buf[:, :n] = batch * self._window
+        t = np.fft.ifft(buf, axis=1)
+        t *= self.gate
+        out = np.fft.fft(t, axis=1)[:, :n] * self._unwindow
+        return out[0] if single else out
+
+
+def get_gate_plan(freq, center, span, shape="tukey", keep=True, edge=0.25,
+                  beta=6.0, window="kaiser", window_beta=3.0, pad=4,
+                  velocity_factor=0.66):
+    # GatePlan for this grid and gate, from the plan cache
+    key = ("gate", grid_key(freq), float(center), float(span), shape, bool(keep),
+           float(edge), float(beta), window, float(window_beta), int(pad),
+           float(velocity_factor))
+    return _cached_plan(key, lambda: GatePlan(freq, center, span, shape, keep, edge,
+                                              beta, window, window_beta, pad,
+                                              velocity_factor))
+
+
+def gate(freq, data, center, span, shape="tukey", keep=True, **options):
+    # one-call gate; options as for GatePlan
+    return get_gate_plan(freq, center, span, shape, keep, **options).apply(data)
+
+
+class GateStage:
+    """Stream stage that gates each sweep's `param` data.
+
+    With replace=True (default) the sweep's array is swapped for the gated
+    one -- so later stages (metrics, masks, Touchstone) see gated data --
+    and the original goes to sweep.cache['ungated']. Any metrics already
+    cached for the sweep are dropped. With replace=False the gated data is
+    only stored in sweep.cache['gated'].
+    """
+
+    def __init__(self, center, span, shape="tukey", keep=True, param="s11",
+                 replace=True, **options):
+        if shape not in GATE_SHAPES:
+            raise ValueError("gate shape must be one of " + ", ".join(GATE_SHAPES))
+        self.args = (center, span, shape, keep)
+        self.options = options
+        self.param = param
+        self.replace = replace
+
+    def __call__(self, sweep):
+        data = sweep.get(self.param)
+        if data is None:
+            return sweep
+        gated = get_gate_plan(sweep.freq, *self.args, **self.options).apply(data)
+        if self.replace:
+            sweep.cache["ungated"] = data
+            setattr(sweep, self.param, gated)
+            sweep.cache.pop("metrics", None)
+        else:
+            sweep.cache["gated"] = gated
+        return sweep
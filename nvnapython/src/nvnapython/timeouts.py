@@ -0,0 +1,216 @@
+#! /usr/bin/python3
+
+##------------------------------------------------------------------------------------------------\
+#   nanoVNA_python (nvnapython)
+#   'src/nvnapython/timeouts.py'
+#
+#   Adaptive per-command read timeouts.
+#
+#   The fixed serialTimeout (5 s idle) is a compromise: a dead or hung device
+#   takes the full 5 s to detect even on a 'version' call that normally
+#   answers in a few milliseconds, while a long scan on a slow low-IF unit
+#   can sit silent for longer than that while it sweeps. With adaptive
+#   timeouts enabled (nanoVNA.enable_adaptive_timeouts) every exchange gets
+#   its own budget instead:
+#
+#     scan      margin * (overhead + pts * (point_s + values * value_s)),
+#               with point_s the LEARNED per-point sweep time (seeded from
+#               the constants.MODELS cost defaults, or a calibrated cost
+#               model) plus `k` mean deviations
+#     capture   (binary) a short budget for the first byte, then
+#               margin * bytes * learned per-byte time for the whole frame
+#     others    the learned duration of that command plus `k` mean
+#               deviations, times margin (quick queries start from QUICK_S)
+#     touchcal, touchtest
+#               max_s: they wait for someone to touch the screen, which no
+#               device timing predicts, and are never learned from
+#
+#   every budget clamped to min_s..max_s. The estimates are refined from each
+#   successful exchange with the smoothed mean / mean deviation update TCP
+#   uses for its retransmit timer (Jacobson/Karels), so jitter widens the
+#   budget and a steady device tightens it. A read that times out doubles the
+#   estimate it was budgeted from, so a device that is genuinely slower than
+#   the prior gets enough time on the next try instead of timing out forever.
+#
+#   The read loops treat the budget as an IDLE timeout, as they do
+#   serialTimeout; the estimates are of whole exchange time, which bounds
+#   the longest idle gap from above.
+#
+#   Only the standard library is needed.
+#
+#   Author(s): Lauren Linkous
+##--------------------------------------------------------------------------------------------------\
+
+
+# seed duration for a command nothing has been learned about yet
+QUICK_S = 0.05
+
+# seed per-byte time of a binary transfer (an 800x480 RGB565 capture
+# measured ~2.5 s for 768000 bytes on the F V2)
+BINARY_BYTE_S = 4.0e-6
+
+# commands that run a device sweep before replying: their seed is one
+# full-length sweep rather than QUICK_S
+_SWEEPING = ("cal", "recall")
+
+# commands that wait for a person at the touch screen: always max_s
+_INTERACTIVE = ("touchcal", "touchtest")
+
+
+def command_key(command):
+    # estimator key for a command line: its first word ('cal' keeps its step)
+    words = command.split()
+    if not words:
+        return ""
+    if words[0] == "cal" and len(words) > 1:
+        return "cal " + words[1]
+    return words[0]
+
+
+def _scan_shape(command, default_points):
+    # (points, values per point) of a 'scan start stop [pts [outmask]]' line
+    words = command.split()
+    try:
+        pts = int(words[3]) if len(words) > 3 else int(default_points)
+        outmask = int(words[4]) if len(words) > 4 else 0
+    except ValueError:
+        return int(default_points), 0
+    values = (outmask & 1) + 2 * ((outmask >> 1) & 1) + 2 * ((outmask >> 2) & 1)
+    return max(pts, 1), values
+
+
+class _Estimate:
+    # smoothed mean and mean deviation of a duration (TCP RTO style). The
+    # seed is only a prior: the first real sample replaces it.
+
+    def __init__(self, seed, alpha=0.125, beta=0.25):
+        self.mean = float(seed)
+        self.dev = float(seed) / 2.0
+        self.alpha = alpha
+        self.beta = beta
+        self.samples = 0
+
+    def update(self, x):
+        x = float(x)
+        if self.samples == 0:
+            self.mean, self.dev = x, x / 2.0
+        else:
+            self.dev = (1.0 - self.beta) * self.dev + self.beta * abs(x - self.mean)
+            self.mean = (1.0 - self.alpha) * self.mean + self.alpha * x
+        self.samples += 1
+
+    def widen(self, factor=2.0):
+        self.mean *= factor
+        self.dev *= factor
+
+    def bound(self, k):
+        return self.mean + k * self.dev
+
+
+class TimeoutBudget:
+    """Per-command timeout budgets, refined from observed durations.
+
+        tb = TimeoutBudget(MODELS["NANOVNA_F_V3"], max_points=801)
+        tb.budget("version\\r\\n")           # ~min_s
+        tb.budget("scan 1000000 2000000 801 3")  # grows with points
+        tb.observe("scan 1000000 2000000 801 3", elapsed_s, ok=True)
+
+    model_dict is a constants.MODELS entry (or anything with the scan_*
+    cost keys); cost, if given, is a SweepCostModel-like object whose
+    overhead_s / point_s / value_s replace the model defaults.
+
+    Counters: observed (exchanges learned from), timeouts (exchanges that ran
+    out of budget).
+    """
+
+    def __init__(self, model_dict, max_points=101, cost=None, margin=2.0, k=4.0,
+                 min_s=0.5, max_s=120.0):
+        if cost is not None:
+            overhead_s, point_s, value_s = cost.overhead_s, cost.point_s, cost.value_s
+        else:
+            overhead_s = model_dict["scan_overhead_s"]
+            point_s = model_dict["scan_point_s"]
+            value_s = model_dict["scan_value_s"]
+        if min_s <= 0 or max_s < min_s:
+            raise ValueError("need 0 < min_s <= max_s")
+        self.overhead_s = float(overhead_s)
+        self.value_s = float(value_s)
+        self.max_points = int(max_points)
+        self.margin = float(margin)
+        self.k = float(k)
+        self.min_s = float(min_s)
+        self.max_s = float(max_s)
+        self.point = _Estimate(point_s)
+        self.byte = _Estimate(BINARY_BYTE_S)
+        self.commands = {}
+        self.observed = 0
+        self.timeouts = 0
+
+    def __repr__(self):
+        return ("TimeoutBudget(point_s=" + format(self.point.mean, ".4g") +
+                ", byte_s=" + format(self.byte.mean, ".4g") + ", " +
+                str(len(self.commands)) + " commands, " + str(self.observed) +
+                " observed, " + str(self.timeouts) + " timeouts)")
+
+    def _clamp(self, seconds):
+        return min(self.max_s, max(self.min_s, seconds))
+
+    def _command(self, key):
+        est = self.commands.get(key)
+        if est is None:
+            seed = QUICK_S
+            if key.split(" ")[0] in _SWEEPING and key not in ("cal on", "cal off"):
+                seed = self.overhead_s + self.max_points * self.point.mean
+            est = self.commands[key] = _Estimate(seed)
+        return est
+
+    def budget(self, command):
+        # idle timeout in seconds for one text exchange of `command`
+        command = command.strip()
+        key = command_key(command)
+        if key in _INTERACTIVE:
+            return self.max_s
+        if key == "scan":
+            pts, values = _scan_shape(command, self.max_points)
+            expected = self.overhead_s + pts * (self.point.bound(self.k) +
+                                                values * self.value_s)
+        else:
+            expected = self._command(key).bound(self.k)
+        return self._clamp(self.margin * expected)
+
+    def observe(self, command, elapsed_s, ok=True):
+        # learn from one finished exchange; ok=False means it ran out of budget
+        command = command.strip()
+        key = command_key(command)
+        if key in _INTERACTIVE:
+            return                      # human reaction time, nothing to learn
+        if key == "scan":
+            pts, values = _scan_shape(command, self.max_points)
+            if not ok:
+                self.timeouts += 1
+                self.point.widen()
+                return
+            per_point = (elapsed_s - self.overhead_s) / pts - values * self.value_s
+            self.point.update(max(per_point, 0.0))
+        else:
+            est = self._command(key)
+            if not ok:
+                self.timeouts += 1
+                est.widen()
+                return
+            est.update(elapsed_s)
+        self.observed += 1
+
+    def binary_budget(self, nbytes):
+        # (first-byte timeout, whole-transfer timeout) for a binary read
+        start_s = self.budget("capture")
+        total_s = start_s + self.margin * nbytes * self.byte.bound(self.k)
+        return start_s, self._clamp(total_s)
+
+    def observe_binary(self, nbytes, elapsed_s, ok=True):
+        if not ok:
+            self.timeouts += 1
+            self.byte.widen()
+            return
+        self.byte.update(elapsed_s / max(int(nbytes), 1))
+        self.observed += 1
@@ -0,0 +1,295 @@
+#! /usr/bin/python3
+
+##------------------------------------------------------------------------------------------------\
+#   nanoVNA_python (nvnapython)
+#   'src/nvnapython/transports.py'
+#
+#   Pluggable transports: the byte pipe between a nanoVNA and the device.
+#
+#   The library reads and writes through nanoVNA.ser using a small subset of
+#   the pyserial Serial API. Transport spells that subset out; anything that
+#   provides it -- a Transport subclass, a pyserial Serial, the test fakes --
+#   can carry the traffic:
+#
+#       is_open               True while usable
+#       port                  a name for messages
+#       in_waiting            bytes readable right now, without blocking
+#       read(size)            up to size bytes, waiting at most .timeout
+#       write(data)
+#       reset_input_buffer()  discard unread input
+#       reset_output_buffer()
+#       close()
+#
+#   Implementations, each reading in the way that suits the medium:
+#
+#       SerialTransport   a local USB/serial port. A thin layer over pyserial,
+#                         whose in_waiting/read already map onto the driver's
+#                         buffer.
+#       TcpTransport      a raw TCP bridge (ser2net in raw mode, or any
+#                         serial-to-socket server) so a VNA on a small bridge
+#                         host can be driven from a central machine. The
+#                         socket is non-blocking; in_waiting drains whatever
+#                         the kernel holds in 64 KB recvs into one buffer, so
+#                         a scan reply split over many TCP segments is read
+#                         in a few calls. Nagle is off: commands are tiny and
+#                         latency-bound.
+#       MemoryTransport   an in-process fake device: responder(command)
+#                         returns the reply payload and the transport adds
+#                         the NanoVNA framing (echo, payload, doubled
+#                         prompt). For tests and demos without hardware.
+#
+#   open_transport(name) picks one from the name nanoVNA.connect() is given:
+#   'tcp://host:port' or 'socket://host:port' for TcpTransport, anything
+#   else is a serial port name.
+#
+#   Only pyserial and the standard library are needed.
+#
+#   Author(s): Lauren Linkous
+##--------------------------------------------------------------------------------------------------\
+
+import select
+import socket
+import time
+
+import serial
+
+
+TCP_SCHEMES = ("tcp://", "socket://")
+
+_RECV_SIZE = 65536
+
+
+class Transport:
+    """Interface of a byte pipe to the device (see the module header).
+
+    Subclasses implement in_waiting, read, write, reset_input_buffer and
+    close; read_until and readline are built on read.
+    """
+
+    is_open = False
+    port = ""
+    timeout = 1.0
+
+    @property
+    def in_waiting(self):
+        raise NotImplementedError
+
+    def read(self, size=1):
+        raise NotImplementedError
+
+    def write(self, data):
+        raise NotImplementedError
+
+    def reset_input_buffer(self):
+        raise NotImplementedError
+
+    def reset_output_buffer(self):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        raise NotImplementedError
+
+    def read_until(self, expected=b"\n", size=None):
+        out = bytearray()
+        while not out.endswith(expected) and (size is None or len(out) < size):
+            byte = self.read(1)
+            if not byte:
+                break
+            out += byte
+        return bytes(out)
+
+    def readline(self):
+        return self.read_until(b"\n")
+
+    def __repr__(self):
+        return type(self).__name__ + "(" + str(self.port) + ")"
+
+
+class SerialTransport(Transport):
+    """A local serial port through pyserial. Attributes the transport doesn't
+    define (baudrate, dtr, ...) are passed through to the Serial object."""
+
+    def __init__(self, port, timeout=1.0):
+        self.ser = serial.Serial(port=port, timeout=timeout)
+        self.port = port
+        self.timeout = timeout
+
+    def __getattr__(self, name):
+        ser = self.__dict__.get("ser")
+        if ser is None:
+            raise AttributeError(name)
+        return getattr(ser, name)
+
+    @property
+    def is_open(self):
+        return getattr(self.ser, "is_open", True)
+
+    @property
+    def in_waiting(self):
+        return self.ser.in_waiting
+
+    def read(self, size=1):
+        return self.ser.read(size)
+
+    def write(self, data):
+        return self.ser.write(data)
+
+    def reset_input_buffer(self):
+        self.ser.reset_input_buffer()
+
+    def reset_output_buffer(self):
+        self.ser.reset_output_buffer()
+
+    def close(self):
+        self.ser.close()
+
+
+class TcpTransport(Transport):
+    """A raw TCP connection to a serial bridge.
+
+    A closed connection reads as ConnectionError (an OSError, so the
+    reconnect supervisor treats it like a dead serial port).
+    """
+
+    def __init__(self, host, port, timeout=1.0, connect_timeout=5.0):
+        self.sock = socket.create_connection((host, int(port)), timeout=connect_timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.setblocking(False)
+        self.port = "tcp://" + str(host) + ":" + str(port)
+        self.timeout = timeout
+        self.is_open = True
+        self._buf = bytearray()
+        self._eof = False
+
+    def _fill(self):
+        # move everything the kernel has into _buf, without blocking
+        while not self._eof:
+            try:
+                chunk = self.sock.recv(_RECV_SIZE)
+            except (BlockingIOError, InterruptedError):
+                return
+            if not chunk:
+                self._eof = True
+                return
+            self._buf += chunk
+
+    def _check_open(self):
+        if self._eof and not self._buf:
+            self.is_open = False
+            raise ConnectionError("bridge " + self.port + " closed the connection")
+
+    @property
+    def in_waiting(self):
+        self._fill()
+        self._check_open()
+        return len(self._buf)
+
+    def read(self, size=1):
+        self._fill()
+        deadline = time.time() + (self.timeout or 0.0)
+        while len(self._buf) < size and not self._eof:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            if select.select([self.sock], [], [], remaining)[0]:
+                self._fill()
+        self._check_open()
+        out = bytes(self._buf[:size])
+        del self._buf[:size]
+        return out
+
+    def write(self, data):
+        self.sock.settimeout(self.timeout)
+        try:
+            self.sock.sendall(bytes(data))
+        finally:
+            self.sock.setblocking(False)
+        return len(data)
+
+    def reset_input_buffer(self):
+        self._fill()
+        self._buf.clear()
+
+    def close(self):
+        self.is_open = False
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class MemoryTransport(Transport):
+    """An in-process fake device.
+
+        def responder(command):            # command without '\\r\\n'
+            if command == "version":
+                return b"1.2.00"
+            return b""
+        nvna.connect_transport(MemoryTransport(responder))
+
+    A responder returning None sends nothing at all (a hung device).
+    delay_s holds each reply back, standing in for the device's sweep time.
+    written lists every write.
+    """
+
+    PROMPT = b"ch> \r\nch> "
+
+    def __init__(self, responder, delay_s=0.0):
+        self.responder = responder
+        self.delay_s = delay_s
+        self.port = "MEMORY"
+        self.is_open = True
+        self.written = []
+        self._buf = bytearray()
+        self._pending = []                     # [(ready time, bytes)]
+
+    def _release(self):
+        now = time.time()
+        while self._pending and self._pending[0][0] <= now:
+            self._buf += self._pending.pop(0)[1]
+
+    @property
+    def in_waiting(self):
+        self._release()
+        return len(self._buf)
+
+    def read(self, size=1):
+        self._release()
+        out = bytes(self._buf[:size])
+        del self._buf[:size]
+        return out
+
+    def write(self, data):
+        data = bytes(data)
+        self.written.append(data)
+        command = data.decode("utf-8", errors="replace").strip()
+        payload = self.responder(command)
+        if payload is not None:
+            body = bytes(payload)
+            if body and not body.endswith(b"\r\n"):
+                body += b"\r\n"
+            self._pending.append((time.time() + self.delay_s,
+                                  data.rstrip(b"\r\n") + b"\r\n" + body + self.PROMPT))
+        return len(data)
+
+    def reset_input_buffer(self):
+        self._release()
+        self._buf.clear()
+
+    def close(self):
+        self.is_open = False
+
+
+def open_transport(name, timeout=1.0):
+    # the Transport for a port name: tcp:// or socket:// URLs go to a
+    # TcpTransport, anything else is a local serial port
+    for scheme in TCP_SCHEMES:
+        if str(name).startswith(scheme):
+            host, _, port = str(name)[len(scheme):].rstrip("/").rpartition(":")
+            if not host or not port.isdigit():
+                raise ValueError("expected " + scheme + "host:port, got '" + str(name) + "'")
+            return TcpTransport(host.strip("[]"), int(port), timeout)
+    return SerialTransport(name, timeout)
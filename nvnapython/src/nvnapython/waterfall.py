@@ -0,0 +1,117 @@
+#! /usr/bin/python3
+
+##------------------------------------------------------------------------------------------------\
+#   nanoVNA_python (nvnapython)
+#   'src/nvnapython/waterfall.py'
+#
+#   Fixed-size waterfall (sweep history) store for live displays.
+#
+#   The buffer is ONE preallocated (2 x history, points) array used as a
+#   mirrored ring: every row is written twice, at slot i and slot i + history.
+#   Because of the mirror, the last `history` rows in arrival order are always
+#   a single contiguous slice of the array, so view() is a plain NumPy slice --
+#   no np.roll, no restacking of a list of rows, no copy -- whatever the history
+#   length. Inserting a sweep costs two row copies (O(points)) and nothing is
+#   reallocated after construction.
+#
+#   Author(s): Lauren Linkous
+##--------------------------------------------------------------------------------------------------\
+
+import time
+
+import numpy as np
+
+
+def magnitude_db(values):
+    # 20*log10|x|, with exact zeros mapped to -240 dB instead of -inf
+    mag = np.abs(values)
+    with np.errstate(divide="ignore"):
+        return np.where(mag > 0, 20.0 * np.log10(np.where(mag > 0, mag, 1.0)), -240.0)
+
+
+class WaterfallBuffer:
+    """Ring buffer of the last `history` rows of `points` values.
+
+        wf = WaterfallBuffer(history=300, points=201)
+        wf.append(row, timestamp)
+        img = wf.view()               # (len(wf), points), oldest row first
+        t = wf.timestamps()           # (len(wf),), matching rows
+
+    Both views are slices of the preallocated storage: valid until the next
+    append (which may overwrite their oldest row), never copied.
+
+    As a stream stage it stores transform(sweep.get(param)) and passes the
+    sweep through; the default transform is magnitude in dB.
+    """
+
+    def __init__(self, history, points, dtype=np.float64, param="s11",
+                 transform=magnitude_db, fill=np.nan):
+        history, points = int(history), int(points)
+        if history < 1 or points < 1:
+            raise ValueError("history and points must be >= 1")
+        self.history = history
+        self.points = points
+        self.param = param
+        self.transform = transform
+        self.fill = fill
+        self._rows = np.full((2 * history, points), fill, dtype=dtype)
+        self._times = np.full(2 * history, np.nan)
+        self._cursor = 0          # slot the next row goes into, 0..history-1
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def __call__(self, sweep):
+        data = sweep.get(self.param)
+        if data is not None:
+            row = data if self.transform is None else self.transform(data)
+            self.append(row, sweep.timestamp)
+        return sweep
+
+    @property
+    def full(self):
+        return self._count == self.history
+
+    def append(self, row, timestamp=None):
+        row = np.asarray(row)
+        if row.shape != (self.points,):
+            raise ValueError("row has shape " + str(row.shape) + ", expected (" +
+                             str(self.points) + ",)")
+        t = time.time() if timestamp is None else timestamp
+        i = self._cursor
+        self._rows[i] = row
+        self._rows[i + self.history] = row
+        self._times[i] = t
+        self._times[i + self.history] = t
+        self._cursor = (i + 1) % self.history
+        if self._count < self.history:
+            self._count += 1
+
+    def _window(self):
+        # [lo, hi) of the ordered window in the mirrored storage
+        hi = self._cursor + (self.history if self.full else 0)
+        return hi - self._count, hi
+
+    def view(self, newest_first=False):
+        # (len, points) rows in arrival order (or reversed), as a view
+        lo, hi = self._window()
+        out = self._rows[lo:hi]
+        return out[::-1] if newest_first else out
+
+    def timestamps(self, newest_first=False):
+        lo, hi = self._window()
+        out = self._times[lo:hi]
+        return out[::-1] if newest_first else out
+
+    def latest(self):
+        # the most recent row (a view), or None when empty
+        if not self._count:
+            return None
+        return self._rows[(self._cursor - 1) % self.history]
+
+    def clear(self):
+        self._rows.fill(self.fill)
+        self._times.fill(np.nan)
+        self._cursor = 0
+        self._count = 0
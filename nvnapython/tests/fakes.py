@@ -85,4 +85,65 @@ class FakePort:
         self.is_open = True
 
     def close(self):
-        self.is_open = False
\ No newline at end of file
+        self.is_open = False
+
+class ScriptedPort(FakePort):
+    """A FakePort that ANSWERS each write, for multi-command flows (streams,
+    segmented sweeps) where one preloaded frame isn't enough.
+
+    `responder(cmd)` gets the decoded command line (without '\\r\\n') and
+    returns the payload bytes; the port queues the full device framing around
+    it -- echo, payload, doubled prompt:
+
+        def responder(cmd):
+            return b"0.5 0.1 \\r\\n" * 11
+        port = ScriptedPort(responder)
+
+    `delay_s` (optional) holds each reply back for that long after the write,
+    standing in for the device's sweep time.
+    """
+
+    def __init__(self, responder, delay_s=0.0):
+        super().__init__()
+        self.responder = responder
+        self.delay_s = delay_s
+        self._ready_at = 0.0
+        self._pending = bytearray()
+
+    @property
+    def in_waiting(self):
+        import time
+        if self._pending and time.time() >= self._ready_at:
+            self._buf = bytearray(self._buf) + self._pending
+            self._pending = bytearray()
+        return len(self._buf)
+
+    def write(self, data):
+        import time
+        self.written.append(bytes(data))
+        cmd = bytes(data).decode().strip()
+        payload = self.responder(cmd)
+        frame = cmd.encode() + b"\r\n"
+        if payload:
+            frame += payload.rstrip(b"\r\n") + b"\r\n"
+        frame += b"ch> \r\nch> "
+        self._pending += frame
+        self._ready_at = time.time() + self.delay_s
+        return len(data)
+
+
+def scan_payload(pts, outmask=2, value=(0.5, -0.25)):
+    """Device-style 'scan' payload: `pts` lines of the columns `outmask` asks
+    for (frequency as an integer Hz index, then real/imag pairs), each with the
+    trailing space the real firmware emits."""
+    lines = []
+    for i in range(pts):
+        cols = []
+        if outmask & 1:
+            cols.append(str(1_000_000 + i))
+        if outmask & 2:
+            cols += [f"{value[0]:.6f}", f"{value[1]:.6f}"]
+        if outmask & 4:
+            cols += [f"{value[1]:.6f}", f"{value[0]:.6f}"]
+        lines.append(" ".join(cols) + " ")
+    return ("\r\n".join(lines)).encode()
@@ -0,0 +1,99 @@
+#! /usr/bin/python3
+"""
+Tests for adaptive (coarse-then-zoom) acquisition: feature detection and
+window planning (src/nvnapython/adaptive.py), merge_sweeps, and
+nanoVNA.adaptive_scan against a ScriptedPort that answers each 'scan' with a
+synthetic resonator evaluated on the requested grid. No hardware required.
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from nvnapython import nanoVNA                                 # noqa: E402
+from nvnapython.adaptive import find_features, zoom_windows    # noqa: E402
+from nvnapython.sweep import SweepResult, merge_sweeps         # noqa: E402
+from tests.fakes import ScriptedPort                           # noqa: E402
+
+
+F0, Q = 433.92e6, 2000.0
+
+
+def _resonator(freq):
+    # series RLC to ground seen through 50 ohm: deep, narrow S11 null at F0
+    x = Q * (freq / F0 - F0 / freq)
+    z = 50.0 * (1.0 + 1j * x)
+    return (z - 50.0) / (z + 50.0) * 0.9 + 0.05
+
+
+def _resonator_dev():
+    dev = nanoVNA()
+    dev.set_serial_poll_interval(0.001)
+
+    def responder(cmd):
+        _, start, stop, pts, _mask = cmd.split()
+        freq = np.linspace(float(start), float(stop), int(pts))
+        s11 = _resonator(freq)
+        return "\r\n".join(f"{v.real:.6f} {v.imag:.6f} " for v in s11).encode()
+
+    dev.ser = ScriptedPort(responder)
+    return dev
+
+
+def test_find_features_ranks_null_and_phase():
+    freq = np.linspace(400e6, 470e6, 201)
+    feats = find_features(freq, _resonator(freq))
+    assert feats and feats[0]["score"] >= 1.0
+    kinds = {f["kind"] for f in feats}
+    assert "null" in kinds
+    null = next(f for f in feats if f["kind"] == "null")
+    assert abs(null["freq"] - F0) <= freq[1] - freq[0]
+    assert find_features(freq, _resonator(freq), kinds=("peak",)) == []
+    with pytest.raises(ValueError):
+        find_features(freq, _resonator(freq), kinds=("spur",))
+
+
+def test_zoom_windows_bracket_and_merge():
+    freq = np.arange(11, dtype=float)
+    feats = [{"index": 5}, {"index": 6}, {"index": 0}]
+    assert zoom_windows(freq, feats) == [(0.0, 1.0), (4.0, 7.0)]
+    assert zoom_windows(freq, feats, max_zooms=1) == [(4.0, 6.0)]
+    assert zoom_windows(freq, feats, span_steps=2)[1] == (3.0, 8.0)
+
+
+def test_merge_sweeps_sorts_and_later_wins():
+    a = SweepResult(np.array([1.0, 3.0, 5.0]), s11=np.array([1, 3, 5], dtype=complex),
+                    start=1, stop=5, timestamp=1.0)
+    b = SweepResult(np.array([2.0, 3.0]), s11=np.array([20, 30], dtype=complex),
+                    s21=np.ones(2, dtype=complex), start=2, stop=3, timestamp=2.0)
+    m = merge_sweeps([a, b])
+    assert np.array_equal(m.freq, [1, 2, 3, 5])
+    assert np.array_equal(m.s11, [1, 20, 30, 5])
+    assert m.s21 is None
+    assert (m.start, m.stop, m.timestamp) == (1, 5, 2.0)
+    with pytest.raises(ValueError):
+        merge_sweeps([])
+
+
+def test_adaptive_scan_refines_resonance():
+    dev = _resonator_dev()
+    sweep = dev.adaptive_scan(400_000_000, 470_000_000, 101, 2, zoom_pts=101, max_zooms=2)
+    info = sweep.cache["adaptive"]
+    assert info["scans"] == len(dev.ser.written) >= 2
+    assert dev.ser.written[0] == b"scan 400000000 470000000 101 2\r\n"
+    # dense around F0, coarse elsewhere
+    coarse_step = 70e6 / 100
+    near = np.abs(sweep.freq - F0) < coarse_step
+    assert near.sum() > 50
+    assert np.all(np.diff(sweep.freq) > 0)
+    # the null found in the merged sweep is far closer than one coarse step
+    best = sweep.freq[np.argmin(np.abs(sweep.s11))]
+    assert abs(best - F0) < coarse_step / 50
+
+
+def test_adaptive_scan_rejects_bad_args():
+    dev = _resonator_dev()
+    assert dev.adaptive_scan(470_000_000, 400_000_000, 101) is None
+    assert dev.adaptive_scan(400_000_000, 470_000_000, 101, 2, zoom_pts=999) is None
+    assert dev.adaptive_scan(400_000_000, 470_000_000, 101, 4, param="s11") is None
+    assert dev.ser.written == []
@@ -0,0 +1,122 @@
+#! /usr/bin/python3
+"""
+Tests for the append-only memory-mapped sweep archive
+(src/nvnapython/archive.py). Uses pytest's tmp_path; no hardware required.
+"""
+
+import os
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from nvnapython import nanoVNA                                    # noqa: E402
+from nvnapython.sweep import SweepResult, sweep_frequencies       # noqa: E402
+from nvnapython.archive import (                                  # noqa: E402
+    SweepArchive,
+    SweepArchiveWriter,
+    record_dtype,
+)
+from tests.fakes import ScriptedPort, scan_payload                # noqa: E402
+
+
+PTS = 21
+
+
+def _sweep(k, s21=False):
+    freq = sweep_frequencies(1e9, 2e9, PTS)
+    s11 = (np.arange(PTS) + 1j * k).astype(np.complex128)
+    return SweepResult(freq, s11=s11, s21=(s11 * 2 if s21 else None),
+                       timestamp=1000.0 + k)
+
+
+def test_roundtrip_random_access(tmp_path):
+    path = tmp_path / "a.nvsa"
+    with SweepArchiveWriter(path, 1e9, 2e9, PTS, 2, model="NANOVNA_F_V2",
+                            serial="ABC123") as w:
+        for k in range(10):
+            w.append(_sweep(k))
+        assert len(w) == 10
+
+    arc = SweepArchive(path)
+    assert len(arc) == 10
+    assert (arc.model, arc.serial, arc.points, arc.outmask) == \
+        ("NANOVNA_F_V2", "ABC123", PTS, 2)
+    assert np.allclose(arc.freq, sweep_frequencies(1e9, 2e9, PTS))
+    s = arc[7]
+    assert s.timestamp == 1007.0 and s.s21 is None
+    assert np.allclose(s.s11, np.arange(PTS) + 7j)
+    assert arc.array("s11").shape == (10, PTS)
+    assert arc.timestamps[-1] == 1009.0
+
+
+def test_record_size_is_fixed(tmp_path):
+    path = tmp_path / "b.nvsa"
+    with SweepArchiveWriter(path, 1e9, 2e9, PTS, 6, dtype="complex128") as w:
+        w.append(_sweep(0, s21=True))
+        one = os.path.getsize(path)
+        w.append(_sweep(1, s21=True))
+        two = os.path.getsize(path)
+    assert two - one == record_dtype(PTS, 6, "complex128").itemsize == 8 + 2 * 16 * PTS
+    assert np.allclose(SweepArchive(path)[1].s21, 2 * (np.arange(PTS) + 1j))
+
+
+def test_read_while_write_and_torn_record(tmp_path):
+    path = tmp_path / "c.nvsa"
+    w = SweepArchiveWriter(path, 1e9, 2e9, PTS, 2)
+    w.append(_sweep(0))
+    reader = SweepArchive(path)
+    assert len(reader) == 1
+
+    w.append(_sweep(1))
+    w.append(_sweep(2))
+    # a half-written record from the writer is not counted yet
+    w._fh.write(b"\x00" * 10)
+    w.flush()
+    assert reader.refresh() == 3
+    assert reader[2].timestamp == 1002.0
+    w.close()
+
+    # re-opening for append trims the torn tail and keeps going
+    with SweepArchiveWriter(path, 1e9, 2e9, PTS, 2) as w2:
+        assert len(w2) == 3
+        w2.append(_sweep(3))
+    assert len(SweepArchive(path)) == 4
+
+
+def test_append_to_mismatched_plan_raises(tmp_path):
+    path = tmp_path / "d.nvsa"
+    SweepArchiveWriter(path, 1e9, 2e9, PTS, 2).close()
+    with pytest.raises(ValueError):
+        SweepArchiveWriter(path, 1e9, 2e9, PTS + 1, 2)
+
+
+def test_bad_file_and_args_raise(tmp_path):
+    junk = tmp_path / "junk.bin"
+    junk.write_bytes(b"not an archive" * 20)
+    with pytest.raises(ValueError):
+        SweepArchive(junk)
+    with pytest.raises(ValueError):
+        SweepArchiveWriter(tmp_path / "e.nvsa", 1e9, 2e9, PTS, 1)   # freq only
+    with pytest.raises(ValueError):
+        SweepArchiveWriter(tmp_path / "f.nvsa", 1e9, 2e9, PTS, 2, dtype="float32")
+
+
+def test_empty_archive_reads_zero(tmp_path):
+    path = tmp_path / "g.nvsa"
+    SweepArchiveWriter(path, 1e9, 2e9, PTS, 2).close()
+    assert len(SweepArchive(path)) == 0
+
+
+def test_open_sweep_archive_as_stream_stage(tmp_path):
+    dev = nanoVNA()
+    dev.set_serial_poll_interval(0.001)
+    dev.ser = ScriptedPort(lambda cmd: b"SN0001" if cmd == "SN"
+                           else scan_payload(11, 2))
+    path = tmp_path / "h.nvsa"
+    with dev.open_sweep_archive(path, 1_000_000, 2_000_000, 11, 2) as arc:
+        out = list(dev.stream_scan(1_000_000, 2_000_000, 11, 2, count=4,
+                                   stages=[arc]))
+    stored = SweepArchive(path)
+    assert len(out) == len(stored) == 4
+    assert stored.serial == "SN0001" and stored.model == "NANOVNA_F_V2"
+    assert np.allclose(stored[3].s11, 0.5 - 0.25j)
@@ -0,0 +1,92 @@
+#! /usr/bin/python3
+"""
+Tests for the time/frequency index over sweep archives
+(src/nvnapython/archive_index.py). No hardware required.
+"""
+
+from datetime import datetime, timezone
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from nvnapython.archive import SweepArchiveWriter, SweepArchive   # noqa: E402
+from nvnapython.archive_index import ArchiveIndex                  # noqa: E402
+
+
+PTS = 41
+
+
+def _write(path, times, start=1.0e9, stop=2.0e9):
+    with SweepArchiveWriter(path, start, stop, PTS, 2) as w:
+        for k, t in enumerate(times):
+            w.append_arrays(t, s11=np.full(PTS, k, dtype=np.complex128))
+    return path
+
+
+def test_time_and_freq_window_are_views(tmp_path):
+    path = _write(tmp_path / "a.nvsa", np.arange(100.0))
+    idx = ArchiveIndex([path])
+    (part,) = idx.query(10, 19, 1.25e9, 1.5e9)
+    assert part.rows == slice(10, 20)
+    assert part.timestamps[0] == 10 and part.timestamps[-1] == 19
+    assert part.freq[0] >= 1.25e9 and part.freq[-1] <= 1.5e9
+    assert part.get("s11").shape == (10, len(part.freq))
+    assert np.all(part.get("s11")[:, 0] == np.arange(10, 20))
+    # no copy: the slice shares memory with the archive's memory map
+    assert np.shares_memory(part.get("s11"), part.archive.records)
+
+
+def test_open_bounds_and_datetimes(tmp_path):
+    base = datetime(2026, 3, 3, 2, 0, tzinfo=timezone.utc).timestamp()
+    path = _write(tmp_path / "b.nvsa", base + 60.0 * np.arange(180))  # 3 hours
+    idx = ArchiveIndex([path])
+    (part,) = idx.query(datetime(2026, 3, 3, 3, 0, tzinfo=timezone.utc),
+                        datetime(2026, 3, 3, 4, 0, tzinfo=timezone.utc))
+    assert len(part) == 61
+    assert len(idx.query()[0]) == 180
+
+
+def test_non_overlapping_archives_are_skipped(tmp_path):
+    a = _write(tmp_path / "day1.nvsa", np.arange(0.0, 50.0))
+    b = _write(tmp_path / "day2.nvsa", np.arange(1000.0, 1050.0))
+    idx = ArchiveIndex([a, b])
+    parts = idx.query(1010, 1020)
+    assert len(parts) == 1 and parts[0].archive.path == b
+    assert len(idx) == 100
+    assert idx.query(500, 600) == []
+
+
+def test_freq_bins_cached_per_plan(tmp_path):
+    a = _write(tmp_path / "a.nvsa", [0.0])
+    b = _write(tmp_path / "b.nvsa", [1.0])
+    idx = ArchiveIndex([a, b])
+    arc_a, arc_b = idx.archives
+    first = idx.freq_bins(arc_a, 1.42e9, 1.44e9)
+    assert idx.freq_bins(arc_b, 1.42e9, 1.44e9) is first      # same plan
+    freq = arc_a.freq[first]
+    assert freq.min() >= 1.42e9 and freq.max() <= 1.44e9
+
+
+def test_empty_freq_window_returns_nothing(tmp_path):
+    path = _write(tmp_path / "a.nvsa", np.arange(10.0))
+    assert ArchiveIndex([path]).query(f_lo=3e9, f_hi=4e9) == []
+
+
+def test_unsorted_timestamps_fall_back_to_order(tmp_path):
+    path = _write(tmp_path / "a.nvsa", [0.0, 1.0, 2.0, 10.0, 3.0, 4.0])
+    idx = ArchiveIndex([path])
+    (part,) = idx.query(2.5, 10)
+    assert sorted(part.timestamps.tolist()) == [3.0, 4.0, 10.0]
+
+
+def test_refresh_picks_up_appended_records(tmp_path):
+    path = tmp_path / "live.nvsa"
+    w = SweepArchiveWriter(path, 1e9, 2e9, PTS, 2)
+    w.append_arrays(0.0, s11=np.zeros(PTS))
+    idx = ArchiveIndex([SweepArchive(path)])
+    w.append_arrays(5.0, s11=np.ones(PTS))
+    assert idx.query(4, 6) == []
+    idx.refresh()
+    assert len(idx.query(4, 6)[0]) == 1
+    w.close()
@@ -0,0 +1,172 @@
+#! /usr/bin/python3
+"""
+Tests for the vectorized averaging engine (src/nvnapython/averaging.py) and
+its stream_scan(avg=...) / scan_averaged() hooks. No hardware required.
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from nvnapython import nanoVNA                                    # noqa: E402
+from nvnapython.sweep import SweepResult                          # noqa: E402
+from nvnapython.averaging import (                                # noqa: E402
+    SweepAverager,
+    average_stack,
+    complex_median,
+    sigma_clipped_mean,
+)
+from tests.fakes import ScriptedPort, scan_payload                # noqa: E402
+
+
+def _sweep(s11, s21=None):
+    s11 = np.asarray(s11, dtype=np.complex128)
+    return SweepResult(np.arange(len(s11), dtype=float), s11=s11, s21=s21)
+
+
+def _noisy_stack(rows=16, pts=51, seed=1):
+    rng = np.random.default_rng(seed)
+    truth = np.exp(1j * np.linspace(0, np.pi, pts))
+    noise = 0.01 * (rng.standard_normal((rows, pts)) +
+                    1j * rng.standard_normal((rows, pts)))
+    return truth, truth + noise
+
+
+# --- array-level helpers ------------------------------------------------------
+
+def test_complex_median_is_componentwise():
+    block = np.array([[1 + 5j], [2 + 1j], [9 + 3j]])
+    assert complex_median(block)[0] == 2 + 3j
+
+
+def test_sigma_clip_rejects_single_glitch():
+    truth, block = _noisy_stack()
+    block[3, 10] = 50 + 50j                     # one wild sample
+    plain = block.mean(axis=0)
+    clipped = sigma_clipped_mean(block, sigma=3.0)
+    assert abs(plain[10] - truth[10]) > 1.0
+    assert abs(clipped[10] - truth[10]) < 0.02
+
+
+def test_sigma_clip_constant_block_returns_value():
+    block = np.full((4, 3), 0.5 - 0.5j)
+    assert np.allclose(sigma_clipped_mean(block), 0.5 - 0.5j)
+
+
+@pytest.mark.parametrize("mode", ["mean", "median", "sigma", "ema"])
+def test_average_stack_modes_converge(mode):
+    truth, block = _noisy_stack()
+    out = average_stack(block, mode=mode)
+    assert out.shape == truth.shape
+    assert np.max(np.abs(out - truth)) < 0.02
+
+
+def test_average_stack_bad_mode():
+    with pytest.raises(ValueError):
+        average_stack(np.zeros((2, 2)), mode="mode")
+
+
+# --- SweepAverager --------------------------------------------------------------
+
+def test_mean_averager_emits_every_n_and_matches_numpy():
+    _truth, block = _noisy_stack(rows=8)
+    avg = SweepAverager(4, mode="mean")
+    outs = [avg(_sweep(row)) for row in block]
+    assert [o is not None for o in outs] == [False, False, False, True] * 2
+    assert np.allclose(outs[3].s11, block[:4].mean(axis=0))
+    assert np.allclose(outs[7].s11, block[4:].mean(axis=0))
+    assert outs[7].cache["averages"] == 4
+
+
+def test_ema_averager_emits_every_sweep():
+    avg = SweepAverager(4, mode="ema")
+    first = avg(_sweep([1.0]))
+    second = avg(_sweep([0.0]))
+    assert first.s11[0] == 1.0
+    assert second.s11[0] == pytest.approx(0.75)
+
+
+def test_block_buffer_is_reused_between_blocks():
+    avg = SweepAverager(2, mode="median")
+    avg(_sweep([1, 2, 3]))
+    buf = avg._block["s11"]
+    avg(_sweep([1, 2, 3]))
+    avg(_sweep([4, 5, 6]))
+    assert avg._block["s11"] is buf
+
+
+def test_point_count_change_restarts_average():
+    avg = SweepAverager(2, mode="mean")
+    avg(_sweep([1.0, 1.0]))
+    assert avg(_sweep([3.0, 3.0, 3.0])) is None      # new plan -> fresh block
+    assert np.allclose(avg(_sweep([5.0, 5.0, 5.0])).s11, 4.0)
+
+
+def test_averager_handles_s11_and_s21():
+    avg = SweepAverager(2, mode="mean")
+    avg(_sweep([1.0], s21=np.array([2.0 + 0j])))
+    out = avg(_sweep([3.0], s21=np.array([4.0 + 0j])))
+    assert out.s11[0] == 2.0 and out.s21[0] == 3.0
+
+
+def test_averager_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        SweepAverager(4, mode="boxcar")
+
+
+# --- stream / scan hooks ----------------------------------------------------------
+
+def _dev():
+    dev = nanoVNA()
+    dev.set_serial_poll_interval(0.001)
+    dev.ser = ScriptedPort(lambda cmd: scan_payload(11, 2))
+    return dev
+
+
+def test_stream_scan_avg_yields_one_per_block():
+    dev = _dev()
+    out = list(dev.stream_scan(1_000_000, 2_000_000, 11, 2, count=8, avg=4))
+    assert len(out) == 2
+    assert len(dev.ser.written) == 8
+    assert np.allclose(out[0].s11, 0.5 - 0.25j)
+
+
+def test_scan_averaged_returns_single_result():
+    dev = _dev()
+    out = dev.scan_averaged(1_000_000, 2_000_000, 11, 2, avg=3, mode="sigma")
+    assert out.cache["averages"] == 3
+    assert len(dev.ser.written) == 3
+
+
+def _lossy_dev(bad):
+    # replies whose (1-based) number is in `bad` are truncated
+    dev = nanoVNA()
+    dev.set_serial_poll_interval(0.001)
+    state = {"n": 0}
+
+    def responder(cmd):
+        state["n"] += 1
+        return b"0.1 \r\n" if state["n"] in bad else scan_payload(11, 2)
+    dev.ser = ScriptedPort(responder)
+    return dev
+
+
+@pytest.mark.parametrize("mode", ["mean", "ema", "median", "sigma"])
+def test_scan_averaged_replaces_dropped_replies(mode):
+    dev = _lossy_dev(bad={2, 4})
+    out = dev.scan_averaged(1_000_000, 2_000_000, 11, 2, avg=3, mode=mode)
+    assert out is not None and out.cache["averages"] == 3
+    assert len(dev.ser.written) == 5
+    assert np.allclose(out.s11, 0.5 - 0.25j)
+
+
+def test_scan_averaged_gives_up_after_retries():
+    dev = _lossy_dev(bad=set(range(1, 100)))
+    assert dev.scan_averaged(1_000_000, 2_000_000, 11, 2, avg=3, retries=2) is None
+    assert len(dev.ser.written) == 5
+
+
+def test_scan_averaged_invalid_mode_sends_nothing():
+    dev = _dev()
+    assert dev.scan_averaged(1_000_000, 2_000_000, 11, 2, avg=3, mode="x") is None
+    assert dev.ser.written == []
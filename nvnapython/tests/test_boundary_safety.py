@@ -123,9 +123,10 @@ def test_b5_every_save_was_preceded_by_its_recall():
 # ---------------------------------------------------------------------------
 
 REQUIRED_KEYS = {
-    "min_freq_hz", "max_freq_hz", "max_points", "point_end_inclusive",
+    "min_freq_hz", "max_freq_hz", "max_points", "point_end_inclusive", "min_points",
     "screen_width", "screen_height", "num_markers", "num_traces",
     "num_cal_slots", "num_preset_slots",
+    "scan_overhead_s", "scan_point_s", "scan_value_s",
 }
 
 
@@ -147,11 +148,13 @@ def test_model_has_all_required_keys(name):
 def test_model_values_are_sane(name):
     m = MODELS[name]
     assert m["min_freq_hz"] < m["max_freq_hz"], f"{name}: min freq >= max freq"
-    assert m["max_points"] > 0
+    assert 0 < m["min_points"] <= m["max_points"]
     assert isinstance(m["point_end_inclusive"], bool)
     assert m["screen_width"] > 0 and m["screen_height"] > 0
     for k in ("num_markers", "num_traces", "num_cal_slots", "num_preset_slots"):
         assert m[k] > 0, f"{name}: {k} must be positive"
+    for k in ("scan_overhead_s", "scan_point_s", "scan_value_s"):
+        assert m[k] > 0, f"{name}: {k} must be positive"
 
 
 def test_outmask_and_data_value_sets_are_contiguous():
@@ -0,0 +1,138 @@
+#! /usr/bin/python3
+"""
+Tests for the keyframe + delta compressed sweep archive
+(src/nvnapython/codec.py). Uses pytest's tmp_path; no hardware required.
+"""
+
+import os
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from nvnapython import nanoVNA                                    # noqa: E402
+from nvnapython.sweep import SweepResult, sweep_frequencies       # noqa: E402
+from nvnapython.codec import (                                    # noqa: E402
+    CompressedSweepArchive,
+    CompressedSweepArchiveWriter,
+    pack_ints,
+    unpack_ints,
+)
+from tests.fakes import ScriptedPort, scan_payload                # noqa: E402
+
+
+PTS = 201
+
+
+def _stable_dut(n, seed=0, noise=3e-6):
+    # a fixed resonance plus a few counts of device-resolution noise
+    rng = np.random.default_rng(seed)
+    freq = sweep_frequencies(1e9, 2e9, PTS)
+    base = 0.9 * np.exp(-1j * freq / 1e8) / (1 + 1j * (freq - 1.5e9) / 2e7)
+    for k in range(n):
+        jitter = noise * (rng.standard_normal(PTS) + 1j * rng.standard_normal(PTS))
+        s11 = np.round((base + jitter).real, 6) + 1j * np.round((base + jitter).imag, 6)
+        yield SweepResult(freq, s11=s11, s21=s11 * 0.1, timestamp=1000.0 + k)
+
+
+def test_pack_ints_roundtrip_all_widths():
+    for top in (0, 100, 30000, 2_000_000_000, 2**40):
+        v = np.array([0, -1, 1, top, -top, top // 3], dtype=np.int64)
+        buf = pack_ints(v)
+        out, end = unpack_ints(buf, 0, len(v))
+        assert end == len(buf)
+        assert np.array_equal(out, v)
+
+
+def test_device_resolution_data_is_lossless(tmp_path):
+    path = tmp_path / "c.nvsz"
+    sweeps = list(_stable_dut(50))
+    with CompressedSweepArchiveWriter(path, 1e9, 2e9, PTS, 6,
+                                      keyframe_interval=16) as w:
+        for s in sweeps:
+            w(s)
+        assert len(w) == 50
+    arc = CompressedSweepArchive(path)
+    assert len(arc) == 50
+    for k in (0, 15, 16, 17, 49, -1):
+        got = arc[k]
+        assert np.max(np.abs(got.s11 - sweeps[k].s11)) < 1e-9
+        # s21 is not on the 1e-6 grid: within half a step per component
+        err = got.s21 - sweeps[k].s21
+        assert max(np.max(np.abs(err.real)), np.max(np.abs(err.imag))) <= 0.5e-6 + 1e-12
+        assert got.timestamp == sweeps[k].timestamp
+    assert arc.array("s11", slice(10, 20)).shape == (10, PTS)
+
+
+def test_non_finite_samples_are_refused(tmp_path):
+    path = tmp_path / "c.nvsz"
+    good, bad = list(_stable_dut(2))
+    bad.s11[50:60] = np.nan                   # a failed wide_scan segment
+    with CompressedSweepArchiveWriter(path, 1e9, 2e9, PTS, 6) as w:
+        w(good)
+        with pytest.raises(ValueError):
+            w(bad)
+        assert len(w) == 1
+    assert len(CompressedSweepArchive(path)) == 1
+
+
+def test_stable_dut_compresses_tenfold(tmp_path):
+    path = tmp_path / "r.nvsz"
+    with CompressedSweepArchiveWriter(path, 1e9, 2e9, PTS, 6) as w:
+        for s in _stable_dut(256):
+            w.append(s)
+    raw = 256 * (8 + 2 * 16 * PTS)           # complex128 records
+    stored = os.path.getsize(path) + os.path.getsize(str(path) + ".idx")
+    assert raw / stored >= 10
+
+
+def test_coarse_precision_error_bound(tmp_path):
+    path = tmp_path / "p.nvsz"
+    rng = np.random.default_rng(1)
+    data = rng.standard_normal((5, PTS)) + 1j * rng.standard_normal((5, PTS))
+    with CompressedSweepArchiveWriter(path, 1e9, 2e9, PTS, 2,
+                                      precision=1e-3) as w:
+        for k, row in enumerate(data):
+            w.append_arrays(float(k), s11=row)
+    got = CompressedSweepArchive(path).array("s11")
+    assert np.max(np.abs(got.real - data.real)) <= 0.5e-3 + 1e-12
+    assert np.max(np.abs(got.imag - data.imag)) <= 0.5e-3 + 1e-12
+
+
+def test_reader_follows_writer_and_reopen_appends(tmp_path):
+    path = tmp_path / "f.nvsz"
+    sweeps = list(_stable_dut(6))
+    w = CompressedSweepArchiveWriter(path, 1e9, 2e9, PTS, 2)
+    w.append(sweeps[0])
+    arc = CompressedSweepArchive(path)
+    assert len(arc) == 1
+    w.append(sweeps[1])
+    assert arc.refresh() == 2
+    w.close()
+
+    with open(str(path) + ".idx", "ab") as fh:
+        fh.write(b"\x01\x02\x03")            # torn index entry
+    with CompressedSweepArchiveWriter(path, 1e9, 2e9, PTS, 2) as w:
+        assert len(w) == 2
+        for s in sweeps[2:]:
+            w.append(s)
+    arc = CompressedSweepArchive(path)
+    assert len(arc) == 6
+    assert np.allclose(arc[4].s11, sweeps[4].s11, atol=1e-9)
+
+    with pytest.raises(ValueError):
+        CompressedSweepArchiveWriter(path, 1e9, 2e9, PTS, 2, precision=1e-3)
+
+
+def test_open_sweep_archive_compressed(tmp_path):
+    dev = nanoVNA()
+    dev.ser = ScriptedPort(lambda cmd: b"SN123" if cmd == "SN"
+                           else scan_payload(11, 2))
+    path = tmp_path / "s.nvsz"
+    with dev.open_sweep_archive(path, 1_000_000, 2_000_000, 11, 2,
+                                compress=True) as arc:
+        for _ in dev.stream_scan(1_000_000, 2_000_000, 11, 2, count=3,
+                                 stages=[arc]):
+            pass
+    got = CompressedSweepArchive(path)
+    assert len(got) == 3 and got.serial == "SN123"
+    assert np.allclose(got[2].s11, 0.5 - 0.25j)
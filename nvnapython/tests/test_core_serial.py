@@ -126,6 +126,65 @@ def test_nanoVNA_serial_printbool_echoes(capsys):
     assert "0.3.0" in captured.out
 
 
+# ---------------------------------------------------------------------------
+# nanoVNA_serial_no_wait: readiness probing after a flash write
+# ---------------------------------------------------------------------------
+
+class FlashPort(FakePort):
+    # 'save' echoes, then the console is busy for busy_s; probes written in
+    # the meantime are buffered and each answered with a prompt afterwards
+    def __init__(self, busy_s):
+        super().__init__()
+        self.busy_s = busy_s
+        self._free_at = 0.0
+        self._queued = bytearray()
+
+    def write(self, data):
+        super().write(data)
+        if data.startswith(b"save"):
+            self._buf = bytearray(self._buf) + data
+            self._free_at = time.time() + self.busy_s
+        else:
+            self._queued += b"\r\nch> "
+        return len(data)
+
+    @property
+    def in_waiting(self):
+        if self._queued and time.time() >= self._free_at:
+            self._buf = bytearray(self._buf) + self._queued
+            self._queued = bytearray()
+        return len(self._buf)
+
+
+def test_no_wait_returns_once_console_answers():
+    dev = nanoVNA()
+    dev.set_serial_poll_interval(0.001)
+    dev.ser = FlashPort(busy_s=0.15)
+    t0 = time.time()
+    out = dev.nanoVNA_serial_no_wait("save 1\r\n")
+    elapsed = time.time() - t0
+    assert 0.15 <= elapsed < 0.5                # not the old 0.6 s settle
+    assert 0.15 <= dev.get_last_flash_write_time() < elapsed
+    assert dev.ser.written[0] == b"save 1\r\n"
+    assert len(dev.ser.written) > 2             # probed more than once
+    assert bytes(out) == b""                    # prompts of every probe drained
+    assert dev.ser.in_waiting == 0
+
+
+def test_no_wait_gives_up_and_fixed_settle_still_works():
+    dev = nanoVNA()
+    dev.set_serial_poll_interval(0.001)
+    dev.ser = FlashPort(busy_s=10.0)
+    assert dev.nanoVNA_serial_no_wait("save 1\r\n", ready_timeout_s=0.2) == b""
+    assert dev.get_last_flash_write_time() is None
+
+    dev.ser = FakePort()
+    t0 = time.time()
+    dev.nanoVNA_serial_no_wait("save 1\r\n", settle_s=0.05)
+    assert time.time() - t0 >= 0.05
+    assert dev.ser.written == [b"save 1\r\n"]     # no probes
+
+
 # ---------------------------------------------------------------------------
 # connect / disconnect
 # ---------------------------------------------------------------------------
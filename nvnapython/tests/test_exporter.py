@@ -0,0 +1,100 @@
+#! /usr/bin/python3
+"""
+Tests for the Prometheus metrics exporter (src/nvnapython/exporter.py): the
+text exposition of serial statistics, supervisor / timeout / stream counters
+with serial and model labels, and the HTTP endpoint on a free local port.
+No hardware required.
+"""
+
+import urllib.error
+import urllib.request
+
+import pytest
+
+from nvnapython import nanoVNA
+from nvnapython.exporter import MetricsExporter
+from tests.fakes import ScriptedPort, scan_payload
+
+
+def _device(sn=b"SN-1"):
+    dev = nanoVNA()
+    dev.set_serial_poll_interval(0.001)
+
+    def responder(cmd):
+        if cmd == "SN":
+            return sn
+        if cmd.startswith("scan"):
+            return scan_payload(int(cmd.split()[3]), 2)
+        return b"1.0"
+    dev.ser = ScriptedPort(responder)
+    return dev
+
+
+class _Stream:
+    parsed = 12
+    dropped = 1
+
+    def sweep_rate(self):
+        return 4.5
+
+
+def _sample(text, prefix):
+    # value of the first sample line starting with `prefix`
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(prefix + " not in exposition")
+
+
+def test_exposition_of_device_counters():
+    dev = _device()
+    exporter = MetricsExporter(port=0)
+    exporter.add(dev)                               # reads SN, enables stats
+    assert dev.get_serial_stats() is not None
+    dev.select_existing_device("NANOVNA_F_V3")      # label is fixed at add()
+    dev.enable_adaptive_timeouts()
+    exporter.add_stream(dev, _Stream(), name="band")
+    dev.scan_sweep(1000000, 2000000, 11)
+    dev.scan_sweep(1000000, 2000000, 11)
+
+    text = exporter.render()
+    base = 'serial="SN-1",model="NANOVNA_F_V2"'
+    assert _sample(text, "nvnapython_up{" + base + "}") == 1.0
+    assert _sample(text, 'nvnapython_commands_total{' + base + ',command="scan"}') == 2.0
+    assert _sample(text, 'nvnapython_serial_bytes_total{' + base + ',command="scan"}') > 0
+    assert _sample(text, 'nvnapython_command_seconds_count{' + base +
+                   ',command="scan",phase="parse"}') == 2.0
+    assert 'phase="first_byte",quantile="0.99"}' in text
+    assert _sample(text, "nvnapython_adaptive_timeouts_total{" + base + "}") == 0.0
+    assert _sample(text, 'nvnapython_sweep_rate{' + base + ',stream="band"}') == 4.5
+    assert "# TYPE nvnapython_command_seconds summary" in text
+    assert text.count("# TYPE nvnapython_commands_total counter") == 1
+    assert "nvnapython_reconnects_total" not in text        # no supervisor
+
+    exporter.remove(dev)
+    assert exporter.render() == "\n"
+
+
+def test_labels_are_escaped_and_supervisor_counted():
+    dev = _device()
+    dev.enable_supervisor(serial_number='odd"sn', find_ports=lambda: [])
+    exporter = MetricsExporter(port=0)
+    exporter.add(dev)
+    dev.get_supervisor().reconnects = 3
+    text = exporter.render()
+    assert _sample(text, 'nvnapython_reconnects_total{serial="odd\\"sn",') == 3.0
+
+
+def test_http_endpoint():
+    dev = _device()
+    with MetricsExporter(port=0) as exporter:
+        exporter.add(dev)
+        dev.version()
+        url = "http://127.0.0.1:" + str(exporter.port)
+        with urllib.request.urlopen(url + "/metrics", timeout=5) as reply:
+            assert reply.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            body = reply.read().decode("utf-8")
+        assert 'command="version"' in body
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(url + "/nothing", timeout=5)
+    assert exporter._server is None
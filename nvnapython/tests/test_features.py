@@ -0,0 +1,106 @@
+#! /usr/bin/python3
+"""
+Tests for host-side marker / feature search (src/nvnapython/features.py).
+No hardware required.
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from nvnapython.sweep import SweepResult, sweep_frequencies       # noqa: E402
+from nvnapython.features import (                                 # noqa: E402
+    FeatureSet,
+    extremum,
+    ndb_bandwidth,
+    phase_zero_crossings,
+    resonance,
+    zero_crossings,
+)
+
+FREQ = sweep_frequencies(900e6, 1100e6, 401)
+
+
+def _bandpass(f0, q=50.0):
+    # single-resonator S21: peak at f0, 3 dB bandwidth f0 / q
+    return 1 / (1 + 1j * q * (FREQ / f0 - f0 / FREQ))
+
+
+def test_extremum_batch_with_subbin_refinement():
+    centers = np.array([950.3e6, 1000.0e6, 1049.7e6])
+    db = -((FREQ[np.newaxis, :] - centers[:, np.newaxis]) / 10e6) ** 2
+    out = extremum(FREQ, db, "max")
+    assert out["freq"].shape == (3,)
+    assert np.allclose(out["freq"], centers, atol=1.0)        # exact for a parabola
+    assert np.allclose(out["value"], 0.0, atol=1e-9)
+    banded = extremum(FREQ, db, "max", f_lo=1.02e9)
+    assert np.all(banded["index"] >= np.searchsorted(FREQ, 1.02e9))
+    one = extremum(FREQ, db[0], "min", interpolate=False)
+    assert isinstance(one["freq"], float) and one["index"] in (0, 400)
+    with pytest.raises(ValueError):
+        extremum(FREQ, db, "max", f_lo=2e9)
+
+
+def test_ndb_bandwidth_of_resonator():
+    rows = np.vstack([20 * np.log10(np.abs(_bandpass(f0))) for f0 in (990e6, 1010e6)])
+    out = ndb_bandwidth(FREQ, rows, 3.0103, "max")
+    assert np.allclose(out["bandwidth"], [990e6 / 50, 1010e6 / 50], rtol=5e-3)
+    assert np.allclose(out["center"], [990e6, 1010e6], atol=0.5e6)
+    # a 60 dB bandwidth runs off the sweep: NaN edges
+    assert np.all(np.isnan(ndb_bandwidth(FREQ, rows, 60.0)["bandwidth"]))
+
+
+def test_zero_crossings_padded_and_phase_wrap_ignored():
+    vals = np.vstack([np.sin(2 * np.pi * (FREQ - 900e6) / 50e6 + 0.1),
+                      np.cos(2 * np.pi * (FREQ - 900e6) / 100e6)])
+    out, counts = zero_crossings(FREQ, vals)
+    assert counts.tolist() == [8, 4] and out.shape == (2, 8)
+    assert np.isnan(out[1, 4:]).all()
+    expected = 900e6 + 25e6 * np.arange(1, 9) - 0.1 * 50e6 / (2 * np.pi)
+    assert np.allclose(out[0], expected, atol=20e3)
+    rising, n = zero_crossings(FREQ, vals[1], direction=+1)
+    assert n == 2 and np.allclose(rising, [975e6, 1075e6], atol=20e3)
+    # phase of a delay line wraps many times but crosses zero only between wraps
+    line = np.exp(-2j * np.pi * FREQ * 20e-9)
+    crossings, n = phase_zero_crossings(FREQ, line)
+    assert n >= 1
+    assert np.allclose(np.cos(2 * np.pi * crossings * 20e-9), 1.0, atol=1e-3)
+
+
+def test_resonance_and_feature_set():
+    s21 = np.vstack([_bandpass(f0) for f0 in (980e6, 1000e6, 1020e6)])
+    res = resonance(FREQ, s21, "s21")
+    assert np.allclose(res["freq"], [980e6, 1000e6, 1020e6], atol=0.2e6)
+    assert np.allclose(res["loaded_q"], 50.0, rtol=1e-2)
+
+    fs = (FeatureSet("s21")
+          .maximum("peak")
+          .minimum("floor", 1.08e9)
+          .bandwidth("bw3", 3.0103)
+          .phase_crossings("ph0", max_count=2)
+          .resonance("res"))
+    assert len(fs) == 5
+    out = fs.evaluate(FREQ, s21)
+    assert out["peak.freq"].shape == (3,) and out["ph0.freq"].shape == (3, 2)
+    assert np.allclose(out["ph0.freq"][:, 0], [980e6, 1000e6, 1020e6], atol=0.2e6)
+    assert np.allclose(out["bw3.bandwidth"], np.array([980e6, 1000e6, 1020e6]) / 50,
+                       rtol=5e-3)
+    with pytest.raises(ValueError):
+        fs.maximum("peak")
+
+    sweep = SweepResult(FREQ, s21=s21[1])
+    assert fs(sweep) is sweep
+    assert sweep.cache["features"]["res.freq"] == pytest.approx(1000e6, abs=0.2e6)
+
+
+def test_feature_set_shares_the_phase(monkeypatch):
+    s21 = np.vstack([_bandpass(f0) for f0 in (980e6, 1020e6)])
+    fs = (FeatureSet("s21")
+          .phase_crossings("rising", direction=1)
+          .phase_crossings("falling", direction=-1))
+    calls = []
+    angle = np.angle
+    monkeypatch.setattr(np, "angle", lambda z: calls.append(1) or angle(z))
+    out = fs.evaluate(FREQ, s21)
+    assert len(calls) == 1
+    assert np.allclose(out["falling.freq"][:, 0], [980e6, 1020e6], atol=0.2e6)
@@ -0,0 +1,95 @@
+#! /usr/bin/python3
+"""
+Tests for the serial statistics (src/nvnapython/instrumentation.py and the
+hooks in nanoVNA_serial, get_serial_return, get_binary_return and capture):
+histogram accuracy, per-command phase recording, timeouts, and nothing
+recorded while disabled. No hardware required.
+"""
+
+import pytest
+
+from nvnapython import nanoVNA
+from nvnapython.instrumentation import Histogram, SerialStats
+from tests.fakes import FakePort, ScriptedPort, scan_payload
+
+
+def test_histogram_percentiles_within_a_bucket():
+    hist = Histogram()
+    assert hist.percentile(50) is None and hist.mean is None
+    for value in range(1, 1001):
+        hist.add(value * 1e-3)
+    hist.add(0)
+    assert hist.count == 1001 and hist.min == 0.0 and hist.max == 1.0
+    assert hist.mean == pytest.approx(500.5 / 1001)
+    assert hist.percentile(50) == pytest.approx(0.5, rel=0.2)
+    assert hist.percentile(99) == pytest.approx(0.99, rel=0.2)
+    assert hist.percentile(100) <= 1.0
+    assert len(hist.buckets) < 50                   # constant memory
+
+
+def test_stats_group_by_command_and_report():
+    stats = SerialStats()
+    stats.record("version\r\n", {"write": 1e-4, "total": 2e-3}, nbytes=20, chunks=1)
+    stats.record("version", {"total": 5.0}, timed_out=True)
+    stats.record_phase("cal open", "parse", 1e-3)
+    summary = stats.summary()
+    assert list(summary) == ["cal open", "version"]
+    assert summary["version"]["calls"] == 2 and summary["version"]["timeouts"] == 1
+    assert summary["version"]["total"]["count"] == 2
+    assert summary["version"]["bytes"]["max"] == 20
+    assert "version" in stats.report()
+    stats.reset()
+    assert stats.summary() == {}
+
+
+def test_text_exchanges_record_phases():
+    dev = nanoVNA()
+    dev.set_serial_poll_interval(0.001)
+
+    def responder(cmd):
+        if cmd.startswith("scan"):
+            return scan_payload(int(cmd.split()[3]), 2)
+        return b"1.0"
+    dev.ser = ScriptedPort(responder, delay_s=0.01)
+    stats = dev.enable_serial_stats()
+    assert dev.get_serial_stats() is stats and dev.enable_serial_stats() is stats
+    dev.version()
+    assert dev.scan_sweep(1000000, 2000000, 11) is not None
+
+    scan = stats.summary()["scan"]
+    assert scan["calls"] == 1 and scan["timeouts"] == 0
+    for phase in ("write", "first_byte", "stream", "settle", "drain", "parse", "total"):
+        assert scan[phase]["count"] == 1
+    assert scan["first_byte"]["min"] >= 0.009        # the scripted sweep delay
+    assert scan["bytes"]["min"] > 11 * 10 and scan["chunks"]["min"] >= 1
+    assert stats.summary()["version"]["calls"] == 1
+
+
+def test_timeouts_and_binary_reads_are_recorded():
+    dev = nanoVNA()
+    dev.set_serial_timeout(0.02)
+    dev.set_serial_poll_interval(0.001)
+    stats = dev.enable_serial_stats()
+    dev.ser = FakePort()
+    dev.nanoVNA_serial("version\r\n")
+    assert stats.summary()["version"]["timeouts"] == 1
+    assert "first_byte" not in stats.summary()["version"]
+
+    dev.ser = FakePort(b"\x00" * 64)
+    dev.get_binary_return(64)
+    binary = stats.summary()["binary"]
+    assert binary["bytes"]["max"] == 64 and binary["timeouts"] == 0
+
+    dev.ser = FakePort(b"capture\r\n" + b"\x01" * 8 + b"ch> \r\nch> ")
+    assert len(dev.capture(2, 2)) == 8
+    capture = stats.summary()["capture"]
+    assert capture["calls"] == 1 and "drain" in capture
+
+
+def test_disabled_records_nothing():
+    dev = nanoVNA()
+    dev.enable_serial_stats()
+    dev.disable_serial_stats()
+    dev.ser = FakePort(b"version\r\n0.3.0\r\nch> \r\nch> ")
+    assert bytes(dev.nanoVNA_serial("version\r\n")) == b"0.3.0"
+    assert dev.get_serial_stats() is None and dev._lastRead is None
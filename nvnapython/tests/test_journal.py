@@ -0,0 +1,145 @@
+#! /usr/bin/python3
+"""
+Tests for the checkpoint journal (src/nvnapython/journal.py) and resuming an
+interrupted wide_scan from it, against a ScriptedPort that can be made to stop
+answering mid-campaign. No hardware required.
+"""
+
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from nvnapython import nanoVNA, planner              # noqa: E402
+from nvnapython.journal import SweepJournal, journal_plan   # noqa: E402
+from nvnapython.planner import SweepCostModel, plan_sweep   # noqa: E402
+from nvnapython.sweep import SweepResult             # noqa: E402
+from tests.fakes import ScriptedPort, scan_payload   # noqa: E402
+
+
+def _plan():
+    return plan_sweep(1_000_000, 2_000_000, 501, max_points=201)   # 3 x 167
+
+
+def _sweep(n, value):
+    return SweepResult(np.arange(n, dtype=float), s11=np.full(n, value, dtype=complex),
+                       timestamp=100.0 + value.real)
+
+
+def _device(serial=b"SN-0001", answer_until=None):
+    # answers 'scan' with a value that changes per call; after `answer_until`
+    # scans it goes silent (empty replies), like a dropped USB link
+    dev = nanoVNA()
+    dev.set_serial_poll_interval(0.001)
+    state = {"scans": 0}
+
+    def responder(cmd):
+        if cmd == "SN":
+            return serial
+        state["scans"] += 1
+        if answer_until is not None and state["scans"] > answer_until:
+            return b""
+        _, _start, _stop, pts, outmask = cmd.split()
+        return scan_payload(int(pts), int(outmask), value=(0.1 + 0.1 * (state["scans"] % 2), 0.0))
+
+    dev.ser = ScriptedPort(responder)
+    dev.state = state
+    return dev
+
+
+def test_journal_roundtrip_and_missing(tmp_path):
+    path = str(tmp_path / "c.nvjr")
+    plan = _plan()
+    with SweepJournal(path, plan, averages=2, model="NANOVNA_F_V2", serial="A") as jr:
+        assert len(jr.missing()) == 6 and not jr.complete
+        jr.record(0, 0, _sweep(167, 0.5 + 0j))
+        jr.record(2, 0, _sweep(167, 0.25 + 0j), status="above_ceiling")
+    with SweepJournal(path, plan, averages=2, model="NANOVNA_F_V2", serial="A") as jr:
+        assert jr.resumed == 2
+        assert jr.missing() == [(1, 0), (0, 1), (1, 1), (2, 1)]
+        status, stamp, data = jr.units()[(2, 0)]
+        assert status == "above_ceiling" and stamp == 100.25
+        assert np.allclose(data["s11"], 0.25) and len(data["s11"]) == 167
+
+
+def test_journal_rejects_other_plan_or_device(tmp_path):
+    path = str(tmp_path / "c.nvjr")
+    SweepJournal(path, _plan(), 2, "NANOVNA_F_V2", "A").close()
+    with pytest.raises(ValueError):
+        SweepJournal(path, _plan(), 2, "NANOVNA_F_V2", "B")
+    with pytest.raises(ValueError):
+        SweepJournal(path, _plan(), 3, "NANOVNA_F_V2", "A")
+    with pytest.raises(ValueError):
+        SweepJournal(path, plan_sweep(1_000_000, 2_000_000, 401), 2, "NANOVNA_F_V2", "A")
+    (tmp_path / "junk").write_bytes(b"not a journal at all")
+    with pytest.raises(ValueError):
+        SweepJournal(str(tmp_path / "junk"), _plan())
+
+
+def test_journal_drops_torn_record(tmp_path):
+    path = str(tmp_path / "c.nvjr")
+    with SweepJournal(path, _plan()) as jr:
+        jr.record(0, 0, _sweep(167, 0.5 + 0j))
+        jr.record(1, 0, _sweep(167, 0.5 + 0j))
+    with open(path, "r+b") as fh:
+        fh.truncate(os.path.getsize(path) - 10)
+    with SweepJournal(path, _plan()) as jr:
+        assert jr.resumed == 1 and jr.missing()[0] == (1, 0)
+
+
+def test_wide_scan_resumes_only_missing_work(tmp_path):
+    path = str(tmp_path / "band.nvjr")
+    # first run: the link dies after 4 of 6 scans (3 segments x 2 averages)
+    dev = _device(answer_until=4)
+    partial = dev.wide_scan(1_000_000, 2_000_000, 501, avg=2, retries=0, journal=path)
+    assert [s["averages"] for s in partial.cache["segments"]] == [2, 1, 1]
+
+    # restarted process, reconnected device: only the 2 missing scans run
+    dev = _device()
+    sweep = dev.wide_scan(1_000_000, 2_000_000, 501, avg=2, journal=path)
+    assert dev.state["scans"] == 2
+    info = sweep.cache["wide_scan"]
+    assert info["resumed"] == 4 and info["scans"] == 2 and info["failed"] == 0
+    assert [s["averages"] for s in sweep.cache["segments"]] == [2, 2, 2]
+    # each point is the mean of one 0.2 and one 0.1 scan
+    assert np.allclose(sweep.s11, 0.15) and len(sweep) == 501
+
+    # a complete journal gives the result with no scans at all
+    dev = _device()
+    again = dev.wide_scan(1_000_000, 2_000_000, 501, avg=2, journal=path)
+    assert dev.state["scans"] == 0
+    assert np.allclose(again.s11, sweep.s11)
+
+
+def test_wide_scan_resumes_with_the_journaled_segments(tmp_path, monkeypatch):
+    monkeypatch.setattr(planner, "_COST_MODELS", {})
+    path = str(tmp_path / "band.nvjr")
+    # first process: a calibrated model with a high error rate -> short segments
+    dev = _device(answer_until=3)
+    flaky = SweepCostModel(0.01, 1e-3, 1e-5, "measured", point_error=0.02)
+    planner.remember_cost_model(dev.deviceModel, "SN-0001", flaky)
+    dev.wide_scan(1_000_000, 2_000_000, 501, retries=0, journal=path)
+    segments = journal_plan(path, flaky).segments
+    assert len(segments) > 3
+
+    # restarted process: only the model defaults, which would plan 3 x 167
+    monkeypatch.setattr(planner, "_COST_MODELS", {})
+    dev = _device()
+    assert len(dev.plan_wide_scan(1_000_000, 2_000_000, 501)) == 3
+    sweep = dev.wide_scan(1_000_000, 2_000_000, 501, journal=path)
+    assert sweep is not None and sweep.cache["wide_scan"]["resumed"] == 3
+    assert sweep.cache["wide_scan"]["plan"].segments == segments
+    assert dev.state["scans"] == len(segments) - 3
+    # a different sweep still doesn't resume someone else's journal
+    assert dev.wide_scan(1_000_000, 2_000_000, 401, journal=path) is None
+    assert journal_plan(str(tmp_path / "none.nvjr"), flaky) is None
+
+
+def test_wide_scan_journal_for_other_device(tmp_path):
+    path = str(tmp_path / "band.nvjr")
+    _device().wide_scan(1_000_000, 2_000_000, 501, journal=path)
+    other = _device(serial=b"SN-0002")
+    assert other.wide_scan(1_000_000, 2_000_000, 501, journal=path) is None
+    assert other.state["scans"] == 0
+    assert other.wide_scan(1_000_000, 2_000_000, 501, avg=0) is None
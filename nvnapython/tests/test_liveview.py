@@ -0,0 +1,149 @@
+#! /usr/bin/python3
+"""
+Tests for the blitted live view and its decimation helpers
+(src/nvnapython/liveview.py). The figure test runs on the headless Agg
+backend and is skipped without matplotlib. No hardware required.
+"""
+
+import threading
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from nvnapython import nanoVNA                                     # noqa: E402
+from nvnapython.sweep import SweepResult, sweep_frequencies        # noqa: E402
+from nvnapython.liveview import (                                  # noqa: E402
+    LiveView,
+    decimate_columns,
+    minmax_decimate,
+)
+from tests.fakes import ScriptedPort, scan_payload                 # noqa: E402
+
+
+def test_minmax_decimate_keeps_envelope():
+    x = np.arange(20001, dtype=float)
+    y = np.sin(x / 500.0)
+    y[12345] = -50.0          # one-sample null
+    y[777] = 9.0              # one-sample spike
+    dx, dy = minmax_decimate(x, y, 500)
+    assert len(dy) <= 1000
+    assert dy.min() == -50.0 and dy.max() == 9.0
+    assert 12345.0 in dx and 777.0 in dx
+    assert np.all(np.diff(dx) >= 0)          # still in frequency order
+
+
+def test_minmax_decimate_passthrough_when_small():
+    x, y = np.arange(201.0), np.arange(201.0)
+    dx, dy = minmax_decimate(x, y, 1000)
+    assert dx is x and dy is y
+
+
+def test_decimate_columns():
+    img = np.arange(2 * 10, dtype=float).reshape(2, 10)
+    out = decimate_columns(img, 5)
+    assert out.shape == (2, 5)
+    assert out[1].tolist() == [10, 12, 14, 16, 18]
+    assert decimate_columns(img, 5, reduce="max")[0].tolist() == [1, 3, 5, 7, 9]
+    assert decimate_columns(img, 20) is img
+
+
+def _sweep(pts, k):
+    freq = sweep_frequencies(1e9, 2e9, pts)
+    return SweepResult(freq, s11=np.full(pts, 0.1 * (k + 1) + 0j), timestamp=float(k))
+
+
+def test_stage_collects_history_and_decimates():
+    view = LiveView(history=5)
+    assert view.frame_data() is None
+    for k in range(8):
+        assert view(_sweep(20000, k)) is not None
+    assert view.dirty and view.sweeps_received == 8
+    x, y, image = view.frame_data(width=400)
+    assert not view.dirty
+    assert len(x) == len(y) <= 800
+    assert image.shape == (5, 400)
+    # newest row first: sweep 7 is 0.8 -> about -1.9 dB
+    assert np.allclose(image[0], 20 * np.log10(0.8))
+    # a new sweep plan restarts the history
+    view(_sweep(201, 0))
+    assert view.frame_data(width=400)[2].shape == (1, 201)
+
+
+def test_consumer_stops_before_source_is_closed():
+    dev = nanoVNA()
+    dev.set_serial_poll_interval(0.001)
+    dev.ser = ScriptedPort(lambda cmd: scan_payload(11, 2), delay_s=0.005)
+    view = LiveView(history=5)
+    pipe = dev.stream_scan(1_000_000, 2_000_000, 11, 2, stages=[view])
+    closes = []
+    pipe_close = pipe.close
+
+    def close():
+        closes.append((threading.current_thread(), worker.is_alive()))
+        pipe_close()
+    pipe.close = close
+
+    worker, stop = view._start_consumer(pipe)
+    while view.sweeps_received < 3:
+        time.sleep(0.001)
+    view._stop_consumer(pipe, worker, stop)
+    assert not worker.is_alive() and pipe._threads == []
+    # the window's thread closed the source only after the consumer left it
+    assert (threading.current_thread(), False) in closes
+    assert all(not alive for thread, alive in closes if thread is not worker)
+
+
+def test_blitted_refresh_on_agg():
+    matplotlib = pytest.importorskip("matplotlib")
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    view = LiveView(history=10, fps=50)
+    fig = view.attach()
+    try:
+        fig.canvas.draw()
+        assert view.refresh() is False       # nothing new yet
+        view(_sweep(801, 0))
+        assert view.refresh() is True        # first frame sets limits
+        fig.canvas.draw()
+        redraws = view.full_redraws
+        for k in range(1, 5):
+            view(_sweep(801, 0))             # same range: blit only
+            assert view.refresh() is True
+        assert view.full_redraws == redraws
+        assert view.frames_drawn == 5
+    finally:
+        view._timer.stop()
+        plt.close(fig)
+
+
+def test_decimated_changing_sweeps_still_blit():
+    # the decimated trace rarely starts and ends on the band edges, and which
+    # samples survive changes with the data; the axes must not follow them
+    matplotlib = pytest.importorskip("matplotlib")
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    def sweep(k):
+        freq = sweep_frequencies(1e9, 2e9, 20000)
+        s11 = np.where((np.arange(20000) + k) % 7 == 0, 0.5, 0.1) + 0j
+        return SweepResult(freq, s11=s11, timestamp=float(k))
+
+    view = LiveView(history=10, fps=50)
+    fig = view.attach()
+    try:
+        fig.canvas.draw()
+        view(sweep(0))
+        assert view.refresh() is True
+        fig.canvas.draw()
+        redraws = view.full_redraws
+        assert view._ax_trace.get_xlim() == (1.0, 2.0)
+        for k in range(1, 6):
+            view(sweep(k))
+            assert view.refresh() is True
+        assert view.full_redraws == redraws
+    finally:
+        view._timer.stop()
+        plt.close(fig)
@@ -0,0 +1,94 @@
+#! /usr/bin/python3
+"""
+Tests for the limit-line / mask-test engine (src/nvnapython/masks.py).
+No hardware required.
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from nvnapython import nanoVNA                                    # noqa: E402
+from nvnapython.sweep import SweepResult, sweep_frequencies       # noqa: E402
+from nvnapython.masks import LimitLine, Mask                      # noqa: E402
+from tests.fakes import ScriptedPort, scan_payload                # noqa: E402
+
+FREQ = sweep_frequencies(1e9, 2e9, 101)          # 10 MHz steps
+
+
+def test_limit_line_interpolation_and_steps():
+    line = LimitLine([(1.2e9, -10), (1.4e9, -20), (1.4e9, -30), (1.6e9, -30)])
+    lim = line.on_grid(FREQ)
+    assert np.isnan(lim[:20]).all() and np.isnan(lim[61:]).all()
+    assert lim[20] == -10 and lim[30] == pytest.approx(-15)
+    assert lim[40] == -30                      # step: tighter upper limit wins
+    low = LimitLine([(1.4e9, -3), (1.4e9, -1)], kind="lower")
+    assert low.on_grid(FREQ)[40] == -1
+    with pytest.raises(ValueError):
+        LimitLine([(2e9, 0), (1e9, 0)])
+    with pytest.raises(ValueError):
+        LimitLine([(1e9, 0)], quantity="z")
+
+
+def _mask():
+    return (Mask("bpf")
+            .upper("s11", "db", [(1.4e9, -10), (1.6e9, -10)])
+            .lower("s21", "db", [(1.4e9, -3), (1.6e9, -3)])
+            .upper("s21", "db", [(1.0e9, -30), (1.2e9, -30)]))
+
+
+def _sweep(s11_db, s21_pass_db, s21_stop_db=-40.0):
+    s11 = np.full(len(FREQ), 10 ** (s11_db / 20) + 0j)
+    s21 = np.where(FREQ < 1.3e9, 10 ** (s21_stop_db / 20), 10 ** (s21_pass_db / 20)) + 0j
+    return SweepResult(FREQ, s11=s11, s21=s21)
+
+
+def test_single_sweep_verdicts():
+    mask = _mask()
+    good = mask.check(_sweep(-15.0, -1.0))
+    assert good.passed and bool(good)
+    assert good.margin == pytest.approx(2.0)            # s21 lower limit -3 vs -1
+    assert good.worst_limit == "s21.db lower"
+    assert 1.4e9 <= good.worst_freq <= 1.6e9
+
+    bad = mask.check(_sweep(-15.0, -1.0, s21_stop_db=-25.0))
+    assert not bad.passed and bad.margin == pytest.approx(-5.0)
+    assert bad.worst_limit == "s21.db upper" and bad.worst_freq <= 1.2e9
+    assert bad.point_margin.shape == (len(FREQ),)
+    assert np.isinf(bad.point_margin[FREQ > 1.65e9]).all()
+
+
+def test_batch_and_grid_cache():
+    mask = _mask()
+    sweeps = [_sweep(-15.0, -1.0), _sweep(-8.0, -1.0), _sweep(-15.0, -4.0)]
+    res = mask.check_batch(sweeps)
+    assert res.passed.tolist() == [True, False, False]
+    assert np.allclose(res.margin, [2.0, -2.0, -1.0])
+    assert res.worst_limit.tolist() == ["s21.db lower", "s11.db upper", "s21.db lower"]
+    assert len(mask._compiled) == 1
+    mask.check(sweeps[0])
+    assert len(mask._compiled) == 1                     # same grid: reused
+    mask.check(SweepResult(sweep_frequencies(1e9, 2e9, 51), s11=np.zeros(51),
+                           s21=np.ones(51)))
+    assert len(mask._compiled) == 2
+    # NaN data under a limit fails
+    nan = _sweep(-15.0, -1.0)
+    nan.s11[45] = np.nan
+    assert not mask.check(nan).passed
+    with pytest.raises(ValueError):
+        Mask("empty").check(sweeps[0])
+
+
+def test_mask_as_stream_stage():
+    failures = []
+    mask = Mask("s11", on_fail=lambda s, r: failures.append(r.margin)) \
+        .upper("s11", "vswr", [(1e6, 2.0), (2e6, 2.0)])
+    dev = nanoVNA()
+    dev.set_serial_poll_interval(0.001)
+    # scan_payload's S11 is 0.5 - 0.25j -> VSWR ~ 3.6: fails
+    dev.ser = ScriptedPort(lambda cmd: scan_payload(11, 2))
+    out = list(dev.stream_scan(1_000_000, 2_000_000, 11, 2, count=3, stages=[mask]))
+    assert len(out) == 3 and mask.failed == 3 and mask.passed == 0
+    assert not out[0].cache["mask"]["s11"].passed
+    assert len(failures) == 3
+    assert "vswr" in out[0].cache["metrics"][("s11", 50.0)]
@@ -0,0 +1,85 @@
+#! /usr/bin/python3
+"""
+Tests for the batched derived-metrics engine (src/nvnapython/metrics.py).
+No hardware required.
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from nvnapython.sweep import SweepResult, sweep_frequencies       # noqa: E402
+from nvnapython.metrics import (                                  # noqa: E402
+    METRICS,
+    MetricsStage,
+    batch_metrics,
+    compute_metrics,
+    sweep_metrics,
+)
+
+FREQ = sweep_frequencies(90e6, 110e6, 2001)
+L, C, R = 1e-6, 1 / ((2 * np.pi * 100e6) ** 2 * 1e-6), 10.0     # f0 = 100 MHz
+
+
+def _series_rlc(r=R):
+    w = 2 * np.pi * FREQ
+    z = r + 1j * w * L + 1 / (1j * w * C)
+    return z, (z - 50) / (z + 50)
+
+
+def test_reflection_metrics_match_closed_form():
+    z, gamma = _series_rlc()
+    m = compute_metrics(FREQ, gamma)
+    assert set(m) == set(METRICS)
+    assert np.allclose(m["z"], z)
+    assert np.allclose(m["y"], 1 / z)
+    assert np.allclose(m["q"], np.abs(z.imag) / z.real)
+    mag = np.abs(gamma)
+    assert np.allclose(m["vswr"], (1 + mag) / (1 - mag))
+    assert np.allclose(m["return_loss"], -20 * np.log10(mag))
+    assert np.allclose(m["phase"], np.degrees(np.angle(gamma)))
+    # series RLC in a 50 ohm system: Q_L = w0 L / (R + Z0)
+    assert m["loaded_q"] == pytest.approx(2 * np.pi * 100e6 * L / (R + 50), rel=1e-3)
+
+
+def test_group_delay_of_a_line():
+    tau = 3.3e-9
+    m = compute_metrics(FREQ, 0.5 * np.exp(-2j * np.pi * FREQ * tau), ("group_delay",))
+    assert np.allclose(m["group_delay"], tau)
+
+
+def test_transmission_loaded_q():
+    q = 250.0
+    s21 = 1 / (1 + 2j * q * (FREQ / 100e6 - 100e6 / FREQ) / 2)
+    m = compute_metrics(FREQ, s21, ("loaded_q",), param="s21")
+    assert m["loaded_q"] == pytest.approx(q, rel=1e-2)
+
+
+def test_batch_matches_rows_and_edge_cases():
+    rows = np.vstack([_series_rlc(r)[1] for r in (5.0, 10.0, 20.0)] +
+                     [np.full(len(FREQ), 1.0 + 0j)])        # open: |S| = 1
+    m = compute_metrics(FREQ, rows, ("vswr", "db", "loaded_q"))
+    assert m["vswr"].shape == (4, len(FREQ)) and m["loaded_q"].shape == (4,)
+    for i in range(3):
+        single = compute_metrics(FREQ, rows[i], ("vswr", "loaded_q"))
+        assert np.allclose(single["vswr"], m["vswr"][i])
+        assert single["loaded_q"] == pytest.approx(m["loaded_q"][i])
+    assert np.all(np.isinf(m["vswr"][3])) and np.isnan(m["loaded_q"][3])
+    with pytest.raises(ValueError):
+        compute_metrics(FREQ, rows, ("smith",))
+    with pytest.raises(ValueError):
+        compute_metrics(FREQ[:10], rows)
+
+
+def test_results_are_cached_on_the_sweep():
+    sweeps = [SweepResult(FREQ, s11=_series_rlc(r)[1]) for r in (5.0, 10.0)]
+    out = batch_metrics(sweeps, ("vswr", "z"))
+    slot = sweeps[1].cache["metrics"][("s11", 50.0)]
+    assert slot["vswr"] is not None and np.shares_memory(slot["vswr"], out["vswr"])
+    first = sweep_metrics(sweeps[1], ("vswr",))["vswr"]
+    assert first is slot["vswr"]                     # served from the cache
+    stage = MetricsStage(("return_loss",))
+    assert stage(sweeps[0]) is sweeps[0]
+    assert "return_loss" in sweeps[0].cache["metrics"][("s11", 50.0)]
+    with pytest.raises(ValueError):
+        MetricsStage(("nope",))
@@ -0,0 +1,252 @@
+#! /usr/bin/python3
+"""
+Tests for the cost-model sweep planner (src/nvnapython/planner.py) and the
+segmented wide_scan / calibrate_sweep_costs paths, run against a ScriptedPort
+that answers 'SN' and 'scan' like the device. No hardware required.
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from nvnapython import nanoVNA, planner                       # noqa: E402
+from nvnapython.constants import MODELS                       # noqa: E402
+from nvnapython.planner import (                              # noqa: E402
+    SweepCostModel,
+    outmask_for,
+    plan_sweep,
+)
+from tests.fakes import ScriptedPort, scan_payload            # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cost_cache(monkeypatch):
+    monkeypatch.setattr(planner, "_COST_MODELS", {})
+
+
+def _device(serial=b"SN-0001", delay_s=0.0):
+    dev = nanoVNA()
+    dev.set_serial_poll_interval(0.001)
+
+    def responder(cmd):
+        if cmd == "SN":
+            return serial
+        _, _start, _stop, pts, outmask = cmd.split()
+        return scan_payload(int(pts), int(outmask))
+
+    dev.ser = ScriptedPort(responder, delay_s=delay_s)
+    return dev
+
+
+def test_outmask_for_params():
+    assert outmask_for(("s11",)) == 2
+    assert outmask_for(("s11", "S21")) == 6
+    assert outmask_for(("s21",), freq=True) == 5
+    with pytest.raises(ValueError):
+        outmask_for(("s12",))
+
+
+def test_cost_model_scan_time_counts_values():
+    cost = SweepCostModel(0.1, 1e-3, 1e-5)
+    assert cost.scan_time(100, 2) == pytest.approx(0.1 + 100 * (1e-3 + 2e-5))
+    assert cost.scan_time(100, 7) > cost.scan_time(100, 6) > cost.scan_time(100, 2)
+    assert SweepCostModel.from_model(MODELS["NANOVNA_F_V3"]).source == "defaults"
+
+
+def test_plan_spreads_points_evenly():
+    plan = plan_sweep(1_000_000, 3_000_000_000, 2001, max_points=801)
+    assert len(plan) == 3
+    assert [n for _, _, n in plan] == [667, 667, 667]
+    assert plan.segments[0][0] == 1_000_000 and plan.segments[-1][1] == 3_000_000_000
+    # consecutive segments sit on one grid: next start is one step on
+    step = (3e9 - 1e6) / 2000
+    for (_, stop, _), (start, _, _) in zip(plan.segments[:-1], plan.segments[1:]):
+        assert abs((start - stop) - step) <= 1
+    assert plan.outmask == 2
+    assert plan.estimate_s == pytest.approx(sum(plan.cost.scan_time(667, 2)
+                                                for _ in range(3)))
+
+
+def test_plan_from_resolution_and_errors():
+    plan = plan_sweep(1_000_000, 2_000_000, resolution_hz=1000, max_points=201,
+                      params=("s11", "s21"))
+    assert plan.pts == 1001 and len(plan) == 5 and plan.outmask == 6
+    assert sum(n for _, _, n in plan) == 1001
+    with pytest.raises(ValueError):
+        plan_sweep(2_000_000, 1_000_000, 11)
+    with pytest.raises(ValueError):
+        plan_sweep(1_000_000, 2_000_000, 11, resolution_hz=10)
+    with pytest.raises(ValueError):
+        plan_sweep(1_000_000, 1_000_010, 50)          # finer than 1 Hz
+
+
+def test_plan_trades_overhead_against_retries():
+    clean = SweepCostModel(0.01, 1e-3, 1e-5)
+    flaky = SweepCostModel(0.01, 1e-3, 1e-5, point_error=1e-3)
+    assert flaky.expected_scan_time(667, 2) > flaky.scan_time(667, 2)
+    assert clean.expected_scan_time(667, 2) == pytest.approx(clean.scan_time(667, 2))
+    assert len(plan_sweep(1_000_000, 3_000_000_000, 2001, max_points=801,
+                          cost=clean)) == 3
+    plan = plan_sweep(1_000_000, 3_000_000_000, 2001, max_points=801, cost=flaky)
+    # shorter segments lose less to each retry than their overhead costs
+    assert len(plan) > 3 and sum(n for _, _, n in plan) == 2001
+    assert plan.estimate_s < 3 * flaky.expected_scan_time(667, 2)
+    assert plan.segments[0][0] == 1_000_000 and plan.segments[-1][1] == 3_000_000_000
+    # heavy per-scan overhead still wins over a small error rate
+    costly = SweepCostModel(5.0, 1e-3, 1e-5, point_error=1e-5)
+    assert len(plan_sweep(1_000_000, 3_000_000_000, 2001, max_points=801,
+                          cost=costly)) == 3
+
+
+def test_plan_keeps_the_model_minimum_points():
+    # a high error rate favours short scans, but never below what the
+    # firmware's scan command accepts
+    flaky = SweepCostModel(0.01, 1e-3, 1e-5, point_error=0.05)
+    assert min(n for _, _, n in plan_sweep(1_000_000, 3_000_000_000, 20_001,
+                                           max_points=201, cost=flaky)) < 11
+    for model in ("NANOVNA_F_V2", "NANOVNA_F_V3"):
+        dev = _device()
+        dev.select_existing_device(model)
+        plan = dev.plan_wide_scan(1_000_000, 3_000_000_000, 20_001, cost=flaky)
+        assert min(n for _, _, n in plan) >= MODELS[model]["min_points"]
+        assert sum(n for _, _, n in plan) == 20_001
+
+
+def test_fit_recovers_costs_and_falls_back():
+    true = SweepCostModel(0.05, 2e-3, 3e-5)
+    samples = [(n, m, true.scan_time(n, m)) for n in (50, 200) for m in (2, 7)]
+    fit = SweepCostModel.fit(samples, SweepCostModel(1, 1, 1))
+    assert fit.source == "measured"
+    assert fit.overhead_s == pytest.approx(0.05)
+    assert fit.point_s == pytest.approx(2e-3)
+    assert fit.value_s == pytest.approx(3e-5)
+    # one point count only: scale the fallback to the measured total
+    fallback = SweepCostModel(0.01, 1e-3, 1e-5)
+    scaled = SweepCostModel.fit([(101, 2, 2 * fallback.scan_time(101, 2))], fallback)
+    assert scaled.overhead_s == pytest.approx(0.02)
+    assert scaled.point_s == pytest.approx(2e-3)
+
+
+def test_wide_scan_merges_segments():
+    dev = _device()
+    sweep = dev.wide_scan(1_000_000, 2_000_000, 501)
+    scans = [w for w in dev.ser.written if w.startswith(b"scan")]
+    assert len(scans) == 3                         # 167 x 3 on the F V2
+    assert scans[0] == b"scan 1000000 1332000 167 2\r\n"
+    assert len(sweep) == 501 and np.all(np.diff(sweep.freq) > 0)
+    assert np.allclose(sweep.freq, np.linspace(1e6, 2e6, 501), atol=1)
+    assert sweep.cache["wide_scan"]["plan"].pts == 501
+    assert dev.wide_scan(2_000_000, 1_000_000, 501) is None
+
+
+def test_calibration_cached_per_serial():
+    dev = _device(delay_s=0.01)
+    assert dev.sweep_cost_model().source == "defaults"
+    cost = dev.calibrate_sweep_costs(1_000_000, 2_000_000, sizes=(11, 51), repeats=1)
+    assert cost.source == "measured"
+    assert cost.overhead_s >= 0 and cost.point_s >= 0 and cost.value_s >= 0
+    assert dev.sweep_cost_model() is cost
+    assert dev.plan_wide_scan(1_000_000, 2_000_000, 1001).cost is cost
+    # a different unit of the same model doesn't inherit it
+    other = _device(serial=b"SN-0002")
+    assert other.sweep_cost_model().source == "defaults"
+
+
+def test_calibration_estimates_point_error():
+    assert planner.point_error_rate([(100, True), (100, False)]) == pytest.approx(5e-3)
+    assert planner.point_error_rate([]) == 0.0
+    dev = _flaky_device(lambda start, stop, pts, count: b"0.1 \r\n" if count == 4 else None)
+    cost = dev.calibrate_sweep_costs(1_000_000, 2_000_000, sizes=(11, 51), repeats=1)
+    assert cost.point_error == pytest.approx(1.0 / (11 + 11 + 51 + 51))
+    assert "point_error" in repr(cost)
+
+
+def _flaky_device(fail, model=None):
+    # `fail(start, count)` -> payload override or None for a good reply;
+    # count is how many times that segment has been requested so far
+    dev = nanoVNA()
+    dev.set_serial_poll_interval(0.001)
+    if model:
+        dev.select_existing_device(model)
+    seen = {}
+
+    def responder(cmd):
+        if cmd == "SN":
+            return b"SN-0001"
+        _, start, stop, pts, outmask = cmd.split()
+        seen[start] = seen.get(start, 0) + 1
+        bad = fail(int(start), int(stop), int(pts), seen[start])
+        return scan_payload(int(pts), int(outmask)) if bad is None else bad
+
+    dev.ser = ScriptedPort(responder)
+    return dev
+
+
+def _scans(dev):
+    return [w.split()[1] for w in dev.ser.written if w.startswith(b"scan")]
+
+
+def test_check_segment_flags():
+    from nvnapython.planner import check_segment
+    from nvnapython.sweep import SweepResult
+    assert check_segment(None) == "malformed"
+    freq = np.array([5.9e9, 6.0e9, 6.1e9, 6.2e9])
+    ok = SweepResult(freq, s11=np.full(4, 0.1 + 0j))
+    assert check_segment(ok, 6e9) == "ok"
+    tail = SweepResult(freq, s11=np.array([0.1, 0.1, 0, 0], dtype=complex))
+    assert check_segment(tail, 6e9) == "above_ceiling"
+    assert np.isnan(tail.s11[2:]).all() and tail.s11[0] == 0.1
+    inside = SweepResult(freq, s11=np.array([0, 0.1, 0, 0], dtype=complex))
+    assert check_segment(inside, 6e9) == "zero"
+    # zero in one parameter only is real data
+    both = SweepResult(freq, s11=np.zeros(4, complex), s21=np.full(4, 0.1 + 0j))
+    assert check_segment(both, 6e9) == "ok"
+
+
+def test_wide_scan_retries_only_failed_segment():
+    def fail(start, stop, pts, count):
+        return b"0.1 \r\n" if start == 1_334_000 and count < 3 else None
+
+    dev = _flaky_device(fail)
+    sweep = dev.wide_scan(1_000_000, 2_000_000, 501, backoff_s=0.0)
+    assert _scans(dev) == [b"1000000", b"1334000", b"1668000", b"1334000", b"1334000"]
+    status = [s["status"] for s in sweep.cache["segments"]]
+    assert status == ["ok", "retried", "ok"]
+    assert [s["attempts"] for s in sweep.cache["segments"]] == [1, 3, 1]
+    assert sweep.cache["wide_scan"]["retried"] == 1
+    assert sweep.cache["wide_scan"]["failed"] == 0
+    assert len(sweep) == 501 and np.isfinite(sweep.s11).all()
+
+
+def test_wide_scan_gives_up_with_nan_segment():
+    def fail(start, stop, pts, count):
+        return b"" if start == 1_668_000 else None
+
+    dev = _flaky_device(fail)
+    sweep = dev.wide_scan(1_000_000, 2_000_000, 501, retries=1, backoff_s=0.0)
+    seg = sweep.cache["segments"][2]
+    assert seg["status"] == "failed" and seg["attempts"] == 2
+    assert len(sweep) == 501
+    assert np.isnan(sweep.s11[-167:]).all() and np.isfinite(sweep.s11[:-167]).all()
+    # every segment failing is no result at all
+    dev = _flaky_device(lambda *a: b"")
+    assert dev.wide_scan(1_000_000, 2_000_000, 501, retries=0) is None
+
+
+def test_wide_scan_zeros_above_fv3_ceiling():
+    def fail(start, stop, pts, count):
+        freq = np.linspace(start, stop, pts)
+        if stop <= 6e9:
+            return None
+        lines = ["0.000000 0.000000 " if f > 6e9 else "0.500000 -0.250000 "
+                 for f in freq]
+        return "\r\n".join(lines).encode()
+
+    dev = _flaky_device(fail, model="NANOVNA_F_V3")
+    sweep = dev.wide_scan(5_000_000_000, 6_300_000_000, 1301, backoff_s=0.0)
+    status = [s["status"] for s in sweep.cache["segments"]]
+    assert status == ["ok", "above_ceiling"]
+    assert len(_scans(dev)) == 2                     # not retried
+    above = sweep.freq > 6e9
+    assert np.isnan(sweep.s11[above]).all()
+    assert np.isfinite(sweep.s11[~above]).all()
@@ -0,0 +1,148 @@
+#! /usr/bin/python3
+"""
+Tests for the pipelined acquisition path (stream_scan / ScanPipeline and
+scan_sweep).
+
+The real nanoVNA_serial read loop runs against a ScriptedPort that answers
+every 'scan' with a device-framed reply, optionally after a delay standing in
+for the sweep time. No hardware required.
+"""
+
+import threading
+import time
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from nvnapython import nanoVNA                       # noqa: E402
+from tests.fakes import ScriptedPort, scan_payload   # noqa: E402
+
+
+def _stream_dev(pts=11, outmask=2, delay_s=0.0, bad_every=0):
+    dev = nanoVNA()
+    dev.set_serial_poll_interval(0.001)
+    state = {"n": 0}
+
+    def responder(cmd):
+        state["n"] += 1
+        if bad_every and state["n"] % bad_every == 0:
+            return b"0.1 \r\n"                       # truncated reply
+        return scan_payload(pts, outmask)
+
+    dev.ser = ScriptedPort(responder, delay_s=delay_s)
+    return dev
+
+
+def test_scan_sweep_returns_parsed_result():
+    dev = _stream_dev()
+    sweep = dev.scan_sweep(1_000_000, 2_000_000, 11, 2)
+    assert dev.ser.written == [b"scan 1000000 2000000 11 2\r\n"]
+    assert np.allclose(sweep.s11, 0.5 - 0.25j)
+
+
+def test_scan_sweep_invalid_args_send_nothing():
+    dev = _stream_dev()
+    assert dev.scan_sweep(2_000_000, 1_000_000, 11, 2) is None
+    assert dev.scan_sweep(1_000_000, 2_000_000, 999, 2) is None
+    assert dev.ser.written == []
+
+
+def test_stream_yields_count_sweeps_in_order():
+    dev = _stream_dev()
+    with dev.stream_scan(1_000_000, 2_000_000, 11, 2, count=5) as stream:
+        sweeps = list(stream)
+    assert len(sweeps) == 5
+    assert stream.issued == 5 and stream.parsed == 5 and stream.emitted == 5
+    stamps = [s.timestamp for s in sweeps]
+    assert stamps == sorted(stamps)
+
+
+def test_stream_stages_run_and_can_swallow():
+    dev = _stream_dev()
+    seen = []
+
+    def tag(sweep):
+        sweep.cache["tag"] = True
+        return sweep
+
+    def every_other(sweep):
+        seen.append(sweep)
+        return sweep if len(seen) % 2 == 0 else None
+
+    sweeps = list(dev.stream_scan(1_000_000, 2_000_000, 11, 2, count=6,
+                                  stages=[tag, every_other]))
+    assert len(sweeps) == 3
+    assert all(s.cache["tag"] for s in sweeps)
+
+
+def test_stream_drops_malformed_replies():
+    dev = _stream_dev(bad_every=3)
+    stream = dev.stream_scan(1_000_000, 2_000_000, 11, 2, count=6)
+    assert len(list(stream)) == 4
+    assert stream.dropped == 2
+
+
+def test_stream_overlaps_processing_with_sweep():
+    # each scan takes ~40 ms on the "device" and each sweep ~40 ms to process;
+    # sequential would be ~80 ms/sweep, pipelined stays close to ~40 ms.
+    dev = _stream_dev(delay_s=0.04)
+
+    def slow_stage(sweep):
+        time.sleep(0.04)
+        return sweep
+
+    n = 8
+    t0 = time.time()
+    sweeps = list(dev.stream_scan(1_000_000, 2_000_000, 11, 2, count=n,
+                                  stages=[slow_stage]))
+    elapsed = time.time() - t0
+    assert len(sweeps) == n
+    assert elapsed < n * 0.08 * 0.8
+
+
+def test_stream_break_early_stops_threads():
+    dev = _stream_dev()
+    stream = dev.stream_scan(1_000_000, 2_000_000, 11, 2)   # unbounded
+    for i, _ in enumerate(stream):
+        if i == 2:
+            break
+    assert stream._threads == []
+    assert stream.issued >= 3
+
+
+def test_stream_close_from_another_thread_ends_iteration():
+    dev = _stream_dev(delay_s=0.005)
+    stream = dev.stream_scan(1_000_000, 2_000_000, 11, 2)   # unbounded
+    seen, errors = [], []
+
+    def consume():
+        try:
+            for sweep in stream:
+                seen.append(sweep)
+        except Exception as e:                  # e.g. IndexError on _threads
+            errors.append(e)
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    while not seen:
+        time.sleep(0.001)
+    stream.close()
+    consumer.join(timeout=2.0)
+    assert not consumer.is_alive()
+    assert errors == [] and stream._threads == []
+
+
+def test_stream_stage_error_is_raised_to_consumer():
+    dev = _stream_dev()
+
+    def boom(sweep):
+        raise RuntimeError("stage failed")
+
+    with pytest.raises(RuntimeError, match="stage failed"):
+        list(dev.stream_scan(1_000_000, 2_000_000, 11, 2, count=3, stages=[boom]))
+
+
+def test_stream_invalid_args_is_empty():
+    dev = _stream_dev()
+    assert list(dev.stream_scan(1_000_000, 2_000_000, 11, 9)) == []
+    assert dev.ser.written == []
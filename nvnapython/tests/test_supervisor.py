@@ -0,0 +1,190 @@
+#! /usr/bin/python3
+"""
+Tests for the reconnect supervisor (src/nvnapython/supervisor.py): dead-port
+detection, rediscovery by serial number, replay of the shadowed
+configuration and retry of the in-flight command. Ports are ScriptedPorts;
+the "USB re-enumeration" is a port that starts raising SerialException.
+No hardware required.
+"""
+
+import pytest
+import serial
+
+from nvnapython import nanoVNA
+from nvnapython.supervisor import is_idempotent, shadow_key
+from tests.fakes import ScriptedPort, scan_payload
+
+
+class DyingPort(ScriptedPort):
+    # a ScriptedPort whose writes start failing once `dead` is set
+    dead = False
+
+    def write(self, data):
+        if self.dead:
+            raise serial.SerialException("device reports readiness to read but "
+                                         "returned no data")
+        return super().write(data)
+
+
+class HungPort(ScriptedPort):
+    # a ScriptedPort that goes silent (no error, no reply) once `hung` is set
+    hung = False
+
+    def write(self, data):
+        if self.hung:
+            self.written.append(bytes(data))
+            return len(data)
+        return super().write(data)
+
+
+def _port(sn, cls=ScriptedPort):
+    def responder(cmd):
+        if cmd == "SN":
+            return sn
+        if cmd.startswith("scan"):
+            return scan_payload(int(cmd.split()[3]), 2)
+        return b""
+    return cls(responder)
+
+
+def _supervised(ports=None, **options):
+    # device on a DyingPort with SN 'SN-A'; rediscovery offers `ports`
+    dev = nanoVNA()
+    dev.set_serial_poll_interval(0.001)
+    dev.ser = _port(b"SN-A", DyingPort)
+    ports = {"/dev/ttyACM1": _port(b"SN-B"), "/dev/ttyACM2": _port(b"SN-A")} \
+        if ports is None else ports
+    opened = []
+
+    def open_port(name):
+        opened.append(name)
+        return ports[name]
+
+    options.setdefault("interval_s", 0.01)
+    sup = dev.enable_supervisor(find_ports=lambda: list(ports), open_port=open_port,
+                                **options)
+    return dev, sup, ports, opened
+
+
+def test_shadow_keys_and_idempotence():
+    assert shadow_key("sweep 1000 2000 101") == ("sweep",)
+    assert shadow_key("sweep start 1000") == ("sweep", "start")
+    assert shadow_key("sweep") is None
+    assert shadow_key("trace 0 logmag") == ("trace", "0", "format")
+    assert shadow_key("trace 0 refpos 5") == ("trace", "0", "refpos")
+    assert shadow_key("cal on") == ("cal",)
+    assert shadow_key("cal open") is None
+    assert shadow_key("pause") == shadow_key("resume") == ("run",)
+    assert shadow_key("scan 1 2 11 2") is None
+    assert is_idempotent("scan 1 2 11 2") and is_idempotent("cal off")
+    assert not is_idempotent("clearconfig 1234")
+    assert not is_idempotent("cal short")
+
+
+def test_reconnect_restores_config_and_retries_scan():
+    dev, sup, ports, opened = _supervised()
+    assert sup.serial_number == "SN-A"
+    dev.pause()
+    dev.run_sweep(1_000_000, 2_000_000, 101)
+    dev.set_sweep_start(1_500_000)
+    dev.run_sweep(1_000_000, 3_000_000, 101)       # replaces both sweep entries
+    dev.set_trace_logmag(0)
+    dev.version()                                   # query: not shadowed
+
+    dev.ser.dead = True                             # USB re-enumeration
+    raw = dev.get_scan_s11(1_000_000, 2_000_000, 11)
+    assert raw == scan_payload(11, 2)
+
+    # the wrong unit was probed and dropped; the right one adopted
+    assert opened == ["/dev/ttyACM1", "/dev/ttyACM2"]
+    assert not ports["/dev/ttyACM1"].is_open
+    assert dev.ser is ports["/dev/ttyACM2"]
+    assert ports["/dev/ttyACM2"].written == [
+        b"SN\r\n",
+        b"pause\r\n",
+        b"sweep 1000000 3000000 101\r\n",
+        b"trace 0 logmag\r\n",
+        b"scan 1000000 2000000 11 2\r\n",
+    ]
+    assert (sup.reconnects, sup.replayed, sup.retried, sup.failures) == (1, 3, 1, 0)
+
+
+def test_non_idempotent_command_not_resent():
+    dev, sup, ports, _ = _supervised()
+    dev.set_error_byte_return(True)
+    dev.ser.dead = True
+    assert dev.clear_config() == bytearray(b"ERROR")
+    assert ports["/dev/ttyACM2"].written == [b"SN\r\n"]
+    assert sup.reconnects == 1 and sup.retried == 0
+    # the session carries on normally on the new port
+    assert dev.version() == bytearray(b"")
+    assert ports["/dev/ttyACM2"].written[-1] == b"version\r\n"
+
+
+def test_gives_up_when_device_never_returns():
+    dev, sup, _, _ = _supervised(ports={}, timeout_s=0.05)
+    dev.set_error_byte_return(True)
+    dev.ser.dead = True
+    assert dev.version() == bytearray(b"ERROR")
+    assert sup.failures == 1 and dev.ser is None
+    # later calls try again (the port is known dead) rather than crash
+    assert dev.version() == bytearray(b"ERROR")
+    assert sup.failures == 2
+
+
+def test_silent_port_detected_by_timeouts():
+    dev, sup, ports, opened = _supervised(
+        {"/dev/ttyACM2": _port(b"SN-A")}, max_timeouts=2, probe_timeout_s=0.02)
+    dev.ser = _port(b"SN-A", HungPort)
+    dev.set_serial_timeout(0.02)
+    dev.pause()
+    dev.ser.hung = True                             # link stalls without an error
+    dev.version()
+    assert sup.consecutive_timeouts == 1 and sup.reconnects == 0
+    raw = dev.get_scan_s11(1_000_000, 2_000_000, 11)
+    assert raw == scan_payload(11, 2)
+    assert sup.stalls == 1 and sup.reconnects == 1 and sup.retried == 1
+    assert isinstance(sup.last_error, TimeoutError)
+    assert dev.ser is ports["/dev/ttyACM2"] and sup.consecutive_timeouts == 0
+    assert ports["/dev/ttyACM2"].written == [
+        b"SN\r\n", b"pause\r\n", b"scan 1000000 2000000 11 2\r\n"]
+
+
+def test_probe_bypasses_adaptive_timeouts():
+    # the probe keeps its own short timeout and teaches the budget nothing
+    dev, sup, ports, _ = _supervised(
+        {"/dev/ttyACM2": _port(b"SN-A")}, max_timeouts=1, probe_timeout_s=0.02)
+    dev.ser = _port(b"SN-A", HungPort)
+    budget = dev.enable_adaptive_timeouts(min_s=0.1)
+    sn_budget = budget.budget("SN")
+    reads = []
+    read = dev.get_serial_return
+    dev.get_serial_return = lambda timeout_s=None: reads.append(timeout_s) or read(timeout_s)
+    dev.ser.hung = True
+    assert dev.version() == b""
+    assert sup.stalls == 1 and dev.ser is ports["/dev/ttyACM2"]
+    # version on budget, SN on the dead port and on the rediscovered one at
+    # probe_timeout_s, then version replayed on budget
+    assert reads[1:3] == [0.02, 0.02]
+    assert budget.budget("SN") == sn_budget
+    assert budget.timeouts == 1
+
+
+def test_slow_but_alive_port_is_kept():
+    dev, sup, _, opened = _supervised(max_timeouts=1, probe_timeout_s=0.5)
+    dev.set_serial_timeout(0.02)
+    dev.ser.delay_s = 0.05                          # one slow reply, then SN on time
+    dev.version()
+    dev.ser.delay_s = 0.0
+    assert sup.consecutive_timeouts == 1 and sup.stalls == 0 and opened == []
+    dev.version()
+    assert sup.consecutive_timeouts == 0
+
+
+def test_enable_supervisor_needs_serial_number():
+    dev = nanoVNA()
+    assert dev.enable_supervisor() is None
+    sup = dev.enable_supervisor("SN-X")
+    assert dev.get_supervisor() is sup and sup.serial_number == "SN-X"
+    dev.disable_supervisor()
+    assert dev.get_supervisor() is None
@@ -0,0 +1,70 @@
+#! /usr/bin/python3
+"""
+Tests for the vectorized scan parser (src/nvnapython/sweep.py).
+
+parse_scan() is the single place raw 'scan' payloads become NumPy arrays, so
+these pin the column layout for every outmask and the reject-on-malformed
+contract the streaming / retry paths rely on. No hardware required.
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from nvnapython.sweep import (          # noqa: E402
+    parse_scan,
+    outmask_columns,
+    sweep_frequencies,
+    stack_sweeps,
+)
+from tests.fakes import scan_payload   # noqa: E402
+
+
+@pytest.mark.parametrize("outmask,cols", [
+    (0, 0), (1, 1), (2, 2), (3, 3), (4, 2), (5, 3), (6, 4), (7, 5),
+])
+def test_outmask_columns(outmask, cols):
+    assert outmask_columns(outmask) == cols
+
+
+def test_parse_s11_only_uses_linear_grid():
+    sweep = parse_scan(scan_payload(11, 2), 1_000_000, 2_000_000, 11, 2)
+    assert sweep.s21 is None
+    assert sweep.s11.dtype == np.complex128
+    assert np.allclose(sweep.s11, 0.5 - 0.25j)
+    assert np.allclose(sweep.freq, np.linspace(1e6, 2e6, 11))
+
+
+def test_parse_freq_s11_s21_columns():
+    sweep = parse_scan(scan_payload(5, 7), 1, 2, 5, 7)
+    assert np.array_equal(sweep.freq, 1_000_000 + np.arange(5))
+    assert np.allclose(sweep.s11, 0.5 - 0.25j)
+    assert np.allclose(sweep.s21, -0.25 + 0.5j)
+
+
+def test_parse_real_capture_bytes():
+    # verbatim 'scan 1000000 2000000 5 2' reply from the README
+    raw = (b"0.414528 0.623509 \r\n0.512547 0.542835 \r\n0.552637 0.489537 \r\n"
+           b"0.602180 0.444314 \r\n0.674851 0.374883 \r")
+    sweep = parse_scan(raw, 1_000_000, 2_000_000, 5, 2)
+    assert len(sweep) == 5
+    assert sweep.s11[0] == pytest.approx(0.414528 + 0.623509j)
+
+
+@pytest.mark.parametrize("raw", [
+    b"",
+    b"ERROR",
+    b"0.1 0.2 \r\n0.3 \r\n",                 # truncated
+    b"0.1 0.2 \r\nxx 0.4 \r\n",              # non-numeric
+])
+def test_parse_rejects_malformed(raw):
+    assert parse_scan(raw, 1, 2, 2, 2) is None
+
+
+def test_sweep_frequencies_single_point():
+    assert sweep_frequencies(5e6, 6e6, 1).tolist() == [5e6]
+
+
+def test_stack_sweeps_shape():
+    sweeps = [parse_scan(scan_payload(11, 2), 1, 2, 11, 2) for _ in range(3)]
+    assert stack_sweeps(sweeps).shape == (3, 11)
@@ -0,0 +1,173 @@
+#! /usr/bin/python3
+"""
+Tests for the time-domain / TDR transforms (src/nvnapython/timedomain.py).
+No hardware required.
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from nvnapython.sweep import SweepResult, sweep_frequencies       # noqa: E402
+from nvnapython.timedomain import (                               # noqa: E402
+    SPEED_OF_LIGHT,
+    TDRStage,
+    get_plan,
+    harmonic_grid,
+    tdr,
+)
+
+VF = 0.66
+
+
+def _line(freq, distance, gamma=-1.0):
+    # load `gamma` at the end of `distance` metres of lossless line
+    return gamma * np.exp(-2j * np.pi * freq * 2 * distance / (SPEED_OF_LIGHT * VF))
+
+
+def test_harmonic_grid():
+    start, stop = harmonic_grid(1e9, 200)
+    assert (start, stop) == (5_000_000, 1_000_000_000)
+    freq = sweep_frequencies(start, stop, 200)
+    assert np.allclose(freq / freq[0], np.arange(1, 201))
+
+
+def test_lowpass_short_at_distance():
+    freq = sweep_frequencies(*harmonic_grid(1e9, 200), 200)
+    dist, imp = tdr(freq, _line(freq, 3.0), "lowpass_impulse", velocity_factor=VF)
+    peak = np.argmax(np.abs(imp))
+    assert dist[peak] == pytest.approx(3.0, abs=dist[1])
+    assert imp[peak] < -0.8                            # a short reflects negative
+    dist, step = tdr(freq, _line(freq, 3.0), "lowpass_step", velocity_factor=VF)
+    before, after = step[dist < 2.0], step[(dist > 4.0) & (dist < 10.0)]
+    assert np.all(np.abs(before[5:]) < 0.05)
+    assert np.allclose(after, -1.0, atol=0.05)
+    open_step = tdr(freq, _line(freq, 3.0, +1.0), "lowpass_step", velocity_factor=VF)[1]
+    assert np.allclose(open_step[(dist > 4.0) & (dist < 10.0)], 1.0, atol=0.05)
+
+
+def test_bandpass_any_range_and_batches():
+    freq = sweep_frequencies(1.3013e9, 2.1e9, 201)
+    rows = np.vstack([_line(freq, d, g) for d, g in ((1.0, -1.0), (2.5, 0.5))])
+    dist, resp = tdr(freq, rows, "bandpass", window="hann", velocity_factor=VF)
+    assert resp.shape == (2, len(dist))
+    peaks = dist[np.argmax(np.abs(resp), axis=1)]
+    assert np.allclose(peaks, [1.0, 2.5], atol=dist[1])
+    assert np.allclose(np.abs(resp).max(axis=1), [1.0, 0.5], rtol=0.05)
+    single = tdr(freq, rows[1], "bandpass", window="hann", velocity_factor=VF)[1]
+    assert np.allclose(single, resp[1])
+    with pytest.raises(ValueError):
+        tdr(freq, rows, "lowpass_step")                # not a harmonic grid
+
+
+def test_plans_are_cached_and_validated():
+    freq = sweep_frequencies(*harmonic_grid(1e9, 100), 100)
+    a = get_plan(freq, "lowpass_step")
+    assert get_plan(freq.copy(), "lowpass_step") is a
+    assert get_plan(freq, "lowpass_step", window="hann") is not a
+    assert a.n_fft >= 2 * 101 and a.n_fft & (a.n_fft - 1) == 0
+    assert a.time_range == pytest.approx(1 / freq[0])
+    with pytest.raises(ValueError):
+        get_plan(freq, "cepstrum")
+    with pytest.raises(ValueError):
+        get_plan(freq, window="gauss")
+    with pytest.raises(ValueError):
+        get_plan(np.array([1e6, 2e6, 4e6]), "bandpass")
+
+
+def test_tdr_stage():
+    freq = sweep_frequencies(*harmonic_grid(1e9, 100), 100)
+    sweep = SweepResult(freq, s11=_line(freq, 2.0))
+    stage = TDRStage("lowpass_impulse", velocity_factor=VF)
+    assert stage(sweep) is sweep
+    plan = sweep.cache["tdr_plan"]
+    assert plan.distance[np.argmax(np.abs(sweep.cache["tdr"]))] == \
+        pytest.approx(2.0, abs=plan.distance[1])
+
+
+def test_zoom_matches_padded_fft():
+    from nvnapython.timedomain import get_zoom_plan, zoom_tdr
+
+    for mode, freq in (("bandpass", sweep_frequencies(1.3013e9, 2.1e9, 201)),
+                       ("lowpass_impulse",
+                        sweep_frequencies(*harmonic_grid(1e9, 200), 200))):
+        data = np.vstack([_line(freq, 2.0), _line(freq, 2.07, 0.3)])
+        big = get_plan(freq, mode, n_fft=1 << 16, velocity_factor=VF)
+        ref = big.transform(data)
+        i0, i1 = np.searchsorted(big.distance, [1.8, 2.4])
+        dist, zoom = zoom_tdr(freq, data, big.distance[i0], big.distance[i1],
+                              points=i1 - i0 + 1, mode=mode, velocity_factor=VF)
+        assert np.allclose(dist, big.distance[i0:i1 + 1])
+        assert np.allclose(zoom, ref[:, i0:i1 + 1], atol=1e-9)
+        assert get_zoom_plan(freq, big.distance[i0], big.distance[i1], i1 - i0 + 1,
+                             mode, velocity_factor=VF).n_conv <= big.n_fft // 16
+
+
+def test_zoom_validation():
+    from nvnapython.timedomain import ZoomPlan
+
+    freq = sweep_frequencies(*harmonic_grid(1e9, 100), 100)
+    with pytest.raises(ValueError):
+        ZoomPlan(freq, 2.0, 1.0)
+    with pytest.raises(ValueError):
+        ZoomPlan(freq, 1.0, 2.0, mode="lowpass_step")
+
+
+def _two_reflections(freq):
+    return _line(freq, 1.0, 0.5) + _line(freq, 3.0, 0.2)
+
+
+def test_gate_keep_and_notch():
+    from nvnapython.timedomain import gate
+
+    freq = sweep_frequencies(1e9, 3e9, 401)
+    data = _two_reflections(freq)
+    mid = slice(60, 340)
+    kept = gate(freq, data, center=3.0, span=1.0, keep=True, velocity_factor=VF)
+    assert np.allclose(kept[mid], _line(freq, 3.0, 0.2)[mid], atol=5e-3)
+    removed = gate(freq, data, center=1.0, span=1.0, keep=False, velocity_factor=VF)
+    assert np.allclose(removed[mid], _line(freq, 3.0, 0.2)[mid], atol=5e-3)
+    # gating an empty region only removes the window sidelobes found there
+    nothing = gate(freq, data, center=6.0, span=0.5, shape="rect", keep=False,
+                   velocity_factor=VF)
+    assert np.allclose(nothing[mid], data[mid], atol=2e-2)
+
+
+@pytest.mark.parametrize("window", ["hann", "blackman"])
+def test_gate_with_zero_edged_window(window):
+    from nvnapython.timedomain import gate
+
+    freq = sweep_frequencies(1e9, 3e9, 401)
+    data = _two_reflections(freq)
+    removed = gate(freq, data, center=1.0, span=1.0, keep=False, window=window,
+                   velocity_factor=VF)
+    assert np.all(np.isfinite(removed))
+    assert np.abs(removed).max() <= np.abs(data).max()
+    mid = slice(60, 340)
+    assert np.allclose(removed[mid], _line(freq, 3.0, 0.2)[mid], atol=5e-3)
+
+
+def test_gate_batch_cache_and_stage():
+    from nvnapython.timedomain import GateStage, get_gate_plan
+
+    freq = sweep_frequencies(1e9, 3e9, 201)
+    rows = np.vstack([_two_reflections(freq), 2 * _two_reflections(freq)])
+    plan = get_gate_plan(freq, 1.0, 1.0, "hann", False, velocity_factor=VF)
+    assert get_gate_plan(freq, 1.0, 1.0, "hann", False, velocity_factor=VF) is plan
+    out = plan.apply(rows)
+    assert out.shape == rows.shape
+    assert np.allclose(out[1], 2 * out[0]) and np.allclose(plan.apply(rows[0]), out[0])
+    with pytest.raises(ValueError):
+        get_gate_plan(freq, 1.0, 0.0)
+    with pytest.raises(ValueError):
+        GateStage(1.0, 1.0, shape="square")
+
+    sweep = SweepResult(freq, s11=rows[0].copy())
+    sweep.cache["metrics"] = {"stale": True}
+    stage = GateStage(1.0, 1.0, "hann", keep=False, velocity_factor=VF)
+    assert stage(sweep) is sweep
+    assert np.allclose(sweep.s11, out[0]) and np.allclose(sweep.cache["ungated"], rows[0])
+    assert "metrics" not in sweep.cache
+    other = SweepResult(freq, s11=rows[0].copy())
+    GateStage(1.0, 1.0, "hann", keep=False, replace=False, velocity_factor=VF)(other)
+    assert np.allclose(other.s11, rows[0]) and np.allclose(other.cache["gated"], out[0])
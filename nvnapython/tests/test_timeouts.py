@@ -0,0 +1,118 @@
+#! /usr/bin/python3
+"""
+Tests for adaptive per-command timeouts (src/nvnapython/timeouts.py and the
+nanoVNA_serial / get_binary_return hooks): budgets scale with the command
+and point count, are refined from observed durations, widen after a
+timeout, and let a silent device be detected well inside serialTimeout.
+No hardware required.
+"""
+
+import time
+
+import pytest
+
+from nvnapython import nanoVNA
+from nvnapython.constants import MODELS
+from nvnapython.timeouts import TimeoutBudget, command_key
+from tests.fakes import FakePort, ScriptedPort, scan_payload
+
+
+def _budget(**options):
+    return TimeoutBudget(MODELS["NANOVNA_F_V2"], max_points=201, **options)
+
+
+def test_budgets_scale_with_command_and_points():
+    tb = _budget(min_s=0.05)
+    quick = tb.budget("version\r\n")
+    small = tb.budget("scan 1000000 2000000 11 2")
+    large = tb.budget("scan 1000000 2000000 201 7")
+    assert small < large and quick < large
+    assert tb.budget("version") == pytest.approx(quick)
+    # a cal step runs a device sweep; cal on/off doesn't
+    assert tb.budget("cal open") > tb.budget("cal on")
+    assert command_key("cal open\r\n") == "cal open"
+    assert command_key("marker 1 on") == "marker"
+    # never outside min_s..max_s
+    assert _budget(min_s=0.5).budget("version") == 0.5
+    assert _budget(max_s=0.6).budget("scan 1 2 201 7") == 0.6
+    with pytest.raises(ValueError):
+        _budget(min_s=0)
+
+
+def test_observations_refine_and_timeouts_widen():
+    tb = _budget(min_s=0.001)
+    before = tb.budget("scan 1000000 2000000 101 2")
+    for _ in range(5):
+        tb.observe("scan 1000000 2000000 101 2", 0.03 + 101 * 1.0e-4)
+    assert tb.point.mean < 2e-4                     # learned a faster device
+    assert tb.budget("scan 1000000 2000000 101 2") < before
+    learned = tb.point.mean
+    tb.observe("scan 1000000 2000000 101 2", 0.0, ok=False)
+    assert tb.timeouts == 1 and tb.point.mean == pytest.approx(2 * learned)
+
+    for _ in range(5):
+        tb.observe("version", 0.002)
+    tight = tb.budget("version")
+    tb.observe("version", 0.0, ok=False)
+    assert tb.budget("version") == pytest.approx(2 * tight)
+    assert tb.observed == 10
+
+
+def test_touch_commands_wait_for_a_person():
+    tb = _budget(max_s=90.0)
+    for command in ("touchcal\r\n", "touchtest\r\n"):
+        assert tb.budget(command) == 90.0
+        tb.observe(command, 0.01)                 # a quick touch teaches nothing
+        tb.observe(command, 90.0, ok=False)
+        assert tb.budget(command) == 90.0
+    assert tb.observed == 0 and tb.timeouts == 0
+    assert tb.budget("version") < 90.0
+
+
+def test_binary_budget_from_learned_rate():
+    tb = _budget()
+    start_s, total_s = tb.binary_budget(768000)
+    assert start_s == tb.budget("capture") and total_s > start_s
+    tb.observe_binary(768000, 1.0)
+    assert tb.byte.mean == pytest.approx(1.0 / 768000)
+    tb.observe_binary(768000, 0.0, ok=False)
+    assert tb.byte.mean == pytest.approx(2.0 / 768000)
+
+
+def test_silent_device_detected_within_budget():
+    dev = nanoVNA()
+    dev.set_serial_poll_interval(0.001)
+    dev.ser = FakePort()                            # never answers
+    tb = dev.enable_adaptive_timeouts(min_s=0.05)
+    assert dev.get_timeout_budget() is tb
+    started = time.time()
+    dev.nanoVNA_serial("version\r\n")
+    assert time.time() - started < 1.0              # serialTimeout is 5 s
+    assert tb.timeouts == 1
+
+    dev.disable_adaptive_timeouts()
+    assert dev.get_timeout_budget() is None
+
+
+def test_exchanges_feed_the_budget():
+    dev = nanoVNA()
+    dev.set_serial_poll_interval(0.001)
+
+    def responder(cmd):
+        if cmd.startswith("scan"):
+            return scan_payload(int(cmd.split()[3]), 2)
+        return b"1.0"
+    dev.ser = ScriptedPort(responder, delay_s=0.02)
+    tb = dev.enable_adaptive_timeouts(min_s=0.05)
+    # longer than min_s * margin allows for a seeded quick command, but
+    # inside the scan's point-count budget
+    reply = dev.nanoVNA_serial("scan 1000000 2000000 101 2\r\n")
+    assert len(bytes(reply).splitlines()) == 101
+    assert tb.point.samples == 1 and tb.timeouts == 0
+    dev.nanoVNA_serial("version\r\n")
+    assert tb.commands["version"].samples == 1
+
+    # binary reads learn the byte rate too
+    dev.ser = FakePort(b"\x01" * 64)
+    assert len(dev.get_binary_return(64)) == 64
+    assert tb.byte.samples == 1
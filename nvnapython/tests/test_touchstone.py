@@ -0,0 +1,112 @@
+#! /usr/bin/python3
+"""
+Tests for Touchstone export/import (src/nvnapython/touchstone.py).
+No hardware required.
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from nvnapython.sweep import SweepResult                # noqa: E402
+from nvnapython.touchstone import (                     # noqa: E402
+    format_touchstone,
+    read_touchstone,
+    write_touchstone,
+    TouchstoneStreamWriter,
+)
+
+
+def _sweep(n=101, two_port=False):
+    freq = np.linspace(1e6, 3e9, n)
+    s11 = 0.9 * np.exp(-1j * np.linspace(0, 6, n))
+    s21 = 0.1 * np.exp(1j * np.linspace(0, 3, n)) if two_port else None
+    return SweepResult(freq, s11=s11, s21=s21)
+
+
+@pytest.mark.parametrize("fmt", ["RI", "MA", "DB"])
+@pytest.mark.parametrize("unit", ["HZ", "MHZ", "GHZ"])
+def test_s1p_roundtrip(tmp_path, fmt, unit):
+    sweep = _sweep()
+    path = write_touchstone(tmp_path / "a.s1p", sweep, fmt=fmt, freq_unit=unit)
+    data = read_touchstone(path)
+    assert data.ports == 1 and data.z0 == 50.0
+    assert np.allclose(data.freq, sweep.freq, rtol=1e-11)
+    assert np.allclose(data.s[:, 0, 0], sweep.s11, atol=1e-8)
+
+
+def test_format_layout_is_exact():
+    sweep = SweepResult(np.array([1e6, 2.5e6]), s11=np.array([0.5 - 0.25j, -1e-9 + 0j]))
+    assert format_touchstone(sweep, freq_unit="MHZ", comments=["dut 1"]) == (
+        "! Touchstone file written by nvnapython\n"
+        "! dut 1\n"
+        "# MHZ S RI R 50\n"
+        "1 5.000000000e-01 -2.500000000e-01\n"
+        "2.5 -1.000000000e-09 0.000000000e+00\n")
+
+
+def test_s2p_roundtrip_and_parameter_order(tmp_path):
+    sweep = _sweep(two_port=True)
+    path = write_touchstone(tmp_path / "b.s2p", sweep)
+    text = path.read_text()
+    assert "S12 and S22 are not measured" in text
+    first = next(ln for ln in text.splitlines() if ln[0].isdigit()).split()
+    assert float(first[3]) == pytest.approx(sweep.s21[0].real)     # 2nd pair = S21
+    data = read_touchstone(path)
+    assert np.allclose(data.s[:, 1, 0], sweep.s21)
+    assert np.all(data.s[:, 0, 1] == 0) and np.all(data.s[:, 1, 1] == 0)
+    back = data.sweep()
+    assert np.allclose(back.s11, sweep.s11) and np.allclose(back.s21, sweep.s21)
+
+
+def test_reads_third_party_file_with_comments(tmp_path):
+    path = tmp_path / "vendor.s1p"
+    path.write_text(
+        "! exported elsewhere\n"
+        "# MHz S MA R 75\n"
+        "100 0.5 90 ! inline comment\n"
+        "\n"
+        "200 1.0 180\n")
+    data = read_touchstone(path)
+    assert data.z0 == 75.0
+    assert data.freq.tolist() == [100e6, 200e6]
+    assert np.allclose(data.s[:, 0, 0], [0.5j, -1.0])
+
+
+def test_default_option_values_when_missing(tmp_path):
+    path = tmp_path / "bare.s1p"
+    path.write_text("1.5 1.0 0\n")
+    data = read_touchstone(path)
+    assert data.freq[0] == 1.5e9                     # v1 default unit is GHz
+    assert data.s[0, 0, 0] == pytest.approx(1.0)
+
+
+def test_large_s2p_single_pass(tmp_path):
+    sweep = _sweep(n=10_000, two_port=True)
+    path = write_touchstone(tmp_path / "big.s2p", sweep)
+    data = read_touchstone(path)
+    assert data.s.shape == (10_000, 2, 2)
+
+
+@pytest.mark.parametrize("name,kwargs", [
+    ("x.txt", {}),
+    ("x.s3p", {}),
+    ("x.s1p", {"fmt": "XY"}),
+    ("x.s1p", {"freq_unit": "THZ"}),
+])
+def test_bad_arguments_raise(tmp_path, name, kwargs):
+    with pytest.raises(ValueError):
+        write_touchstone(tmp_path / name, _sweep(), **kwargs)
+
+
+def test_s2p_needs_s21():
+    with pytest.raises(ValueError):
+        format_touchstone(_sweep(), ports=2)
+
+
+def test_stream_writer_numbers_files(tmp_path):
+    ts = TouchstoneStreamWriter(str(tmp_path / "sweep_{n:03d}.s1p"))
+    for _ in range(3):
+        assert ts(_sweep()) is not None
+    assert ts.last_path.endswith("sweep_002.s1p")
+    assert len(list(tmp_path.glob("sweep_*.s1p"))) == 3
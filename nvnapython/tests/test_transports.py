@@ -0,0 +1,156 @@
+#! /usr/bin/python3
+"""
+Tests for the pluggable transports (src/nvnapython/transports.py): the
+in-memory fake device, a raw TCP bridge driven through nanoVNA.connect()
+against a local socket server, and open_transport's name handling.
+No hardware required.
+"""
+
+import socket
+import threading
+import time
+
+import pytest
+
+from nvnapython import nanoVNA
+from nvnapython.transports import (
+    MemoryTransport,
+    SerialTransport,
+    TcpTransport,
+    Transport,
+    open_transport,
+)
+from tests.fakes import scan_payload
+
+
+def _responder(cmd):
+    if cmd == "version":
+        return b"1.2.00"
+    if cmd == "SN":
+        return b"SN-TCP"
+    if cmd.startswith("scan"):
+        return scan_payload(int(cmd.split()[3]), 2)
+    if cmd == "hang":
+        return None
+    return b""
+
+
+class _Bridge:
+    # a local serial-to-TCP bridge: one client at a time, each reply sent in
+    # small segments with pauses, as a real bridge forwards the USB chunks
+    def __init__(self, segment=37):
+        self.segment = segment
+        self.server = socket.socket()
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen(1)
+        self.port = self.server.getsockname()[1]
+        self.connections = []
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            self.connections.append(conn)
+            device = MemoryTransport(_responder)
+            pending = b""
+            while True:
+                try:
+                    data = conn.recv(4096)
+                except OSError:
+                    break
+                if not data:
+                    break
+                pending += data
+                while b"\r\n" in pending:
+                    line, pending = pending.split(b"\r\n", 1)
+                    device.write(line + b"\r\n")
+                    reply = device.read(device.in_waiting)
+                    for i in range(0, len(reply), self.segment):
+                        conn.sendall(reply[i:i + self.segment])
+                        time.sleep(0.0005)
+
+    def close(self):
+        self.server.close()
+        for conn in self.connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+
+
+@pytest.fixture
+def bridge():
+    b = _Bridge()
+    yield b
+    b.close()
+
+
+def test_memory_transport_is_a_device():
+    dev = nanoVNA()
+    dev.set_serial_poll_interval(0.001)
+    port = MemoryTransport(_responder, delay_s=0.01)
+    assert dev.connect_transport(port) and dev.get_transport() is port
+    assert bytes(dev.version()) == b"1.2.00"
+    raw = bytes(dev.scan(1000000, 2000000, 11, 2))
+    assert len(raw.splitlines()) == 11
+    assert port.written[-1] == b"scan 1000000 2000000 11 2\r\n"
+    assert isinstance(port, Transport) and repr(port) == "MemoryTransport(MEMORY)"
+
+    dev.set_serial_timeout(0.05)
+    assert bytes(dev.command("hang")) == b""            # no reply at all
+    dev.disconnect()
+    assert dev.ser is None and not port.is_open
+
+
+def test_tcp_bridge_through_connect(bridge):
+    dev = nanoVNA()
+    dev.set_serial_poll_interval(0.001)
+    assert dev.connect("tcp://127.0.0.1:" + str(bridge.port)) is True
+    assert isinstance(dev.ser, TcpTransport)
+    assert bytes(dev.version()) == b"1.2.00"
+    raw = bytes(dev.scan(1000000, 2000000, 101, 2))   # ~40 TCP segments
+    assert len(raw.splitlines()) == 101
+    dev.disconnect()
+
+
+def test_tcp_read_and_closed_bridge(bridge):
+    port = open_transport("socket://127.0.0.1:" + str(bridge.port), timeout=0.5)
+    port.write(b"SN\r\n")
+    assert port.read_until(b"ch> \r\nch> ") == b"SN\r\nSN-TCP\r\nch> \r\nch> "
+    assert port.read(10) == b""                          # waited out the timeout
+    port.write(b"version\r\n")
+    time.sleep(0.05)
+    port.reset_input_buffer()
+    assert port.in_waiting == 0
+
+    bridge.close()
+    deadline = time.time() + 2
+    with pytest.raises(ConnectionError):
+        while time.time() < deadline:
+            port.in_waiting
+            time.sleep(0.01)
+    assert not port.is_open
+    port.close()
+
+
+def test_open_transport_names(monkeypatch):
+    import nvnapython.transports as transports
+
+    class _Serial:
+        def __init__(self, port, timeout):
+            self.port = port
+            self.baudrate = 115200
+            self.is_open = True
+
+    monkeypatch.setattr(transports.serial, "Serial", _Serial)
+    port = open_transport("/dev/ttyACM0")
+    assert isinstance(port, SerialTransport) and port.baudrate == 115200
+    assert port.is_open
+    for bad in ("tcp://nohost", "tcp://host:port", "socket://:2000"):
+        with pytest.raises(ValueError):
+            open_transport(bad)
+
@@ -0,0 +1,54 @@
+#! /usr/bin/python3
+"""
+Tests for the preallocated waterfall ring buffer (src/nvnapython/waterfall.py).
+No hardware required.
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from nvnapython.sweep import SweepResult, sweep_frequencies      # noqa: E402
+from nvnapython.waterfall import WaterfallBuffer, magnitude_db   # noqa: E402
+
+
+def test_ordered_view_before_and_after_wrap():
+    wf = WaterfallBuffer(history=4, points=3)
+    assert len(wf) == 0 and wf.view().shape == (0, 3) and wf.latest() is None
+    for k in range(3):
+        wf.append(np.full(3, k), timestamp=float(k))
+    assert wf.view()[:, 0].tolist() == [0, 1, 2]
+    for k in range(3, 10):
+        wf.append(np.full(3, k), timestamp=float(k))
+        assert wf.view()[:, 0].tolist() == list(range(k - 3, k + 1))
+        assert wf.timestamps().tolist() == [float(i) for i in range(k - 3, k + 1)]
+    assert wf.full and len(wf) == 4
+    assert wf.view(newest_first=True)[:, 0].tolist() == [9, 8, 7, 6]
+    assert wf.latest()[0] == 9
+
+
+def test_view_is_not_a_copy_and_storage_is_fixed():
+    wf = WaterfallBuffer(history=8, points=5)
+    storage = wf._rows
+    for k in range(20):
+        wf.append(np.arange(5) + k)
+    v = wf.view()
+    assert v.base is storage and v.flags["C_CONTIGUOUS"]
+    assert wf._rows is storage
+
+
+def test_rejects_wrong_row_length():
+    wf = WaterfallBuffer(history=2, points=5)
+    with pytest.raises(ValueError):
+        wf.append(np.zeros(4))
+    with pytest.raises(ValueError):
+        WaterfallBuffer(history=0, points=5)
+
+
+def test_stream_stage_stores_magnitude_db():
+    freq = sweep_frequencies(1e9, 2e9, 4)
+    wf = WaterfallBuffer(history=3, points=4)
+    s = SweepResult(freq, s11=np.array([0.1, 1.0, 0.0, 0.5j]), timestamp=5.0)
+    assert wf(s) is s
+    assert np.allclose(wf.latest(), magnitude_db(s.s11))
+    assert wf.latest()[2] == -240.0 and wf.timestamps()[-1] == 5.0